@@ -0,0 +1,472 @@
+"""
+asyncio engine for the quote automation run.
+
+Reading the Quotes sheet, grouping, writing GroupedQuotes and filling the quote documents
+run as concurrent stages connected by bounded queues: the documents of the first quotes
+are filled while later rows are still being read and grouped. All calls go straight to
+the Sheets v4 and Docs v1 REST APIs through one aiohttp session.
+
+Usage: python async_engine.py [--full] [--profile] [--trace PATH] [--metrics PATH]
+"""
+from google.oauth2 import service_account
+import google.auth.transport.requests
+from googleapiclient.errors import HttpError
+import aiohttp
+import httplib2
+import argparse
+import asyncio
+import json
+import time
+import urllib.parse
+
+from main import (
+    API_QUOTAS_PER_MINUTE, DOC_TABLE_FIELDS, DOCS_MAX_WORKERS, GROUPED_HEADER, HTTP_POOL_SIZE,
+    HTTP_TIMEOUT, RANGE_NAME, RATE_LIMIT_BURST_SECONDS, READ_CHUNK_ROWS, READ_WINDOWS_PER_CALL,
+    RETRY_BASE_DELAY, RETRY_MAX_ATTEMPTS, RETRY_MAX_DELAY, SCOPES, SERVICE_ACCOUNT_FILE,
+    SPREADSHEET_ID_SOURCE, STATE_DB_FILE, TRACER, WRITE_MAX_REQUEST_BYTES,
+    TokenBucket, build_grouped_rows, build_services_table_requests, chunk_row_updates,
+    column_letter, find_table, group_rows_by_quote_id, hash_grouped_entry, is_retryable,
+    jittered_backoff, open_state_store, print_generation_summary,
+    print_scheduler_report, record_processed_entries, report_trace, retry_after_seconds,
+    row_as_read_back, services_to_table_rows, sheet_window_ranges, split_a1_range, window_rows
+)
+
+
+# === CONFIGURATION ===
+DEFAULT_CONFIG = {
+    'service_account_file': SERVICE_ACCOUNT_FILE,
+    'scopes': SCOPES,
+    'spreadsheet_id': SPREADSHEET_ID_SOURCE,
+    'range_name': RANGE_NAME,
+    'target_sheet_name': 'GroupedQuotes',
+    'sheets_url': 'https://sheets.googleapis.com',  # Point both URLs at a fake server to test
+    'docs_url': 'https://docs.googleapis.com',
+    'chunk_rows': READ_CHUNK_ROWS,
+    'windows_per_call': READ_WINDOWS_PER_CALL,
+    'max_workers': DOCS_MAX_WORKERS,  # Documents filled concurrently
+    'queue_size': 100,  # Items a stage may get ahead of the next one
+    'write_flush_rows': 1000,  # Changed GroupedQuotes rows sent together
+    'max_request_bytes': WRITE_MAX_REQUEST_BYTES,
+    'pool_size': HTTP_POOL_SIZE,
+    'timeout': HTTP_TIMEOUT,
+    'quotas': API_QUOTAS_PER_MINUTE,
+    'burst_seconds': RATE_LIMIT_BURST_SECONDS,
+    'max_retries': RETRY_MAX_ATTEMPTS,
+    'base_delay': RETRY_BASE_DELAY,
+    'max_delay': RETRY_MAX_DELAY,
+    'state_db_file': STATE_DB_FILE,  # None to fill every quote without keeping state
+    'full': False,  # Ignore the local state and rebuild every quote
+}
+
+
+# === ASYNC HTTP CLIENT ===
+class AsyncGoogleClient:
+    """
+    Sends JSON requests to Google REST APIs from one aiohttp session.
+
+    Follows the rules of the RequestScheduler: each request waits for a token of its
+    (api, 'read' | 'write') quota bucket, throttled and failed requests are retried
+    with jittered backoff or after Retry-After, and connection errors are only retried
+    for GET requests. Counters are kept in `stats`, as in the RequestScheduler, and each
+    call is traced as an 'api' span of main.TRACER.
+    """
+
+    def __init__(self, credentials, session, quotas=None, max_retries=RETRY_MAX_ATTEMPTS,
+                 base_delay=RETRY_BASE_DELAY, max_delay=RETRY_MAX_DELAY,
+                 burst_seconds=RATE_LIMIT_BURST_SECONDS):
+        quotas = API_QUOTAS_PER_MINUTE if quotas is None else quotas
+        self.credentials = credentials
+        self.session = session
+        self.buckets = {key: TokenBucket(per_minute, burst_seconds) for key, per_minute in quotas.items()}
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.queue_depth = 0
+        self.stats = {'requests': 0, 'retries': 0, 'throttled_requests': 0, 'throttle_seconds': 0.0,
+                      'backoff_seconds': 0.0, 'max_queue_depth': 0}
+        self._token_lock = asyncio.Lock()
+
+    async def authorize(self, headers):
+        """Add a valid access token to `headers`; concurrent callers share one refresh."""
+        async with self._token_lock:
+            if not self.credentials.valid:
+                await asyncio.to_thread(self.credentials.refresh, google.auth.transport.requests.Request())
+        self.credentials.apply(headers)
+
+    async def acquire(self, key):
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            return
+        wait = bucket.reserve()
+        if wait > 0:
+            self.queue_depth += 1
+            self.stats['max_queue_depth'] = max(self.stats['max_queue_depth'], self.queue_depth)
+            self.stats['throttled_requests'] += 1
+            self.stats['throttle_seconds'] += wait
+            await asyncio.sleep(wait)
+            self.queue_depth -= 1
+
+    async def request(self, api, method, url, params=None, body=None):
+        """Send one API call and return its decoded JSON response; errors raise HttpError."""
+        key = (api, 'read' if method == 'GET' else 'write')
+        with TRACER.span('api', api='.'.join(key), method=method, path=urllib.parse.urlsplit(url).path,
+                         request_bytes=len(json.dumps(body).encode('utf-8')) if body is not None else 0,
+                         retries=0) as span:
+            return await self._send(key, method, url, params, body, span)
+
+    async def _send(self, key, method, url, params, body, span):
+        bucket = self.buckets.get(key)
+        attempt = 0
+        while True:
+            await self.acquire(key)
+            headers = {}
+            await self.authorize(headers)
+            self.stats['requests'] += 1
+            try:
+                async with self.session.request(method, url, params=params, json=body,
+                                                headers=headers) as response:
+                    content = await response.read()
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+                if method != 'GET' or attempt >= self.max_retries:
+                    raise
+                delay = jittered_backoff(attempt, self.base_delay, self.max_delay)
+            else:
+                span.set(status=response.status, response_bytes=len(content))
+                if response.status < 400:
+                    if bucket is not None:
+                        bucket.speed_up()
+                    return json.loads(content) if content else {}
+                resp = httplib2.Response({'status': response.status, **response.headers})
+                if not is_retryable(resp, content) or attempt >= self.max_retries:
+                    raise HttpError(resp, content, uri=url)
+                if bucket is not None and response.status in (403, 429):
+                    bucket.slow_down()
+                delay = retry_after_seconds(response.headers.get('Retry-After'))
+                if delay is None:
+                    delay = jittered_backoff(attempt, self.base_delay, self.max_delay)
+
+            self.stats['retries'] += 1
+            self.stats['backoff_seconds'] += delay
+            span.set(retries=attempt + 1)
+            await asyncio.sleep(delay)
+            attempt += 1
+
+
+# === STAGE 1 - Stream the rows of the Quotes sheet ===
+async def read_rows(client, config, out_queue):
+    """Put the rows of the source range on `out_queue`, one window at a time, then None."""
+    sheets_url = f"{config['sheets_url']}/v4/spreadsheets/{config['spreadsheet_id']}"
+    sheet_name = split_a1_range(config['range_name'])[0]
+    metadata = await client.request('sheets', 'GET', sheets_url, params={
+        'ranges': sheet_name, 'fields': 'sheets.properties.gridProperties.rowCount'})
+    row_count = metadata['sheets'][0]['properties']['gridProperties']['rowCount']
+
+    windows = sheet_window_ranges(config['range_name'], row_count, config['chunk_rows'])
+    pending_blank = 0
+    for i in range(0, len(windows), config['windows_per_call']):
+        result = await client.request('sheets', 'GET', f"{sheets_url}/values:batchGet", params=[
+            ('ranges', window) for window in windows[i:i + config['windows_per_call']]])
+        for value_range in result.get('valueRanges', []):
+            rows, pending_blank = window_rows(value_range.get('values', []), config['chunk_rows'],
+                                              pending_blank)
+            if rows:
+                await out_queue.put(rows)
+    await out_queue.put(None)
+
+
+# === STAGE 2 - Group the rows per Quote ID as they arrive ===
+class QuoteGrouper:
+    """
+    Groups streamed rows with group_rows_by_quote_id one Quote ID at a time.
+
+    A quote is complete as soon as a row with another Quote ID arrives, since the rows
+    of a quote are consecutive in the sheet. If a Quote ID shows up again further down,
+    the services of the new rows are added to its entry, which is sent once more. Only
+    the grouped entries are kept, not the rows they were read from.
+    """
+
+    def __init__(self, header):
+        self.header = header
+        self.quote_id_col = header.index('Quote ID') if 'Quote ID' in header else None
+        self.entries = {}  # Latest entry per Quote ID, in the order quotes were completed
+        self.first_rows = {}  # First row of the quotes none of whose rows had a valid service yet
+        self.invalid_totals = {}  # (Quote ID, value) pairs of the totals that could not be parsed, per Quote ID
+        self.current_raw_id = None
+        self.current_rows = []
+
+    def add(self, row):
+        """Add a row; returns the entry of the quote it completes, if any."""
+        if self.quote_id_col is None:
+            return None
+        raw_id = row[self.quote_id_col] if len(row) > self.quote_id_col else ''
+        completed = None
+        if raw_id != self.current_raw_id:
+            completed = self.finish()
+            self.current_raw_id = raw_id
+        self.current_rows.append(row)
+        return completed
+
+    def finish(self):
+        """Close the quote being read; returns its entry, or None if it has no valid service."""
+        raw_id, rows = self.current_raw_id, self.current_rows
+        self.current_raw_id, self.current_rows = None, []
+        quote_id = (raw_id or '').strip()
+        if not quote_id:
+            return None
+
+        # The quote's fields come from its first row, even if that row was skipped
+        first_row = self.first_rows.pop(quote_id, None)
+        if first_row is not None:
+            rows = [first_row] + rows
+        invalid = self.invalid_totals.setdefault(quote_id, [])
+        grouped = group_rows_by_quote_id([self.header] + rows, self.header, invalid)
+        entry = self.entries.get(quote_id)
+        if not grouped:
+            if entry is None:
+                self.first_rows[quote_id] = rows[0]
+            return None
+
+        if entry is None:
+            entry = self.entries[quote_id] = grouped[0]
+        else:
+            entry['rows'].extend(grouped[0]['rows'])
+            entry['Num Services'] = len(entry['rows'])
+            entry['Grand Total'] += grouped[0]['Grand Total']
+        return entry
+
+
+async def group_quotes(in_queue, write_queue, fill_queue, run):
+    """Turn row windows into grouped entries for the GroupedQuotes writer and the document fillers."""
+    grouper = None
+    while True:
+        rows = await in_queue.get()
+        if rows is None:
+            break
+        for row in rows:
+            if grouper is None:
+                grouper = run['grouper'] = QuoteGrouper(row)
+                continue
+            entry = grouper.add(row)
+            if entry is not None:
+                await dispatch_entry(entry, write_queue, fill_queue, run)
+
+    if grouper is not None:
+        entry = grouper.finish()
+        if entry is not None:
+            await dispatch_entry(entry, write_queue, fill_queue, run)
+    await write_queue.put(None)
+    for _ in range(run['max_workers']):
+        await fill_queue.put(None)
+
+
+async def dispatch_entry(entry, write_queue, fill_queue, run):
+    quote_id = entry['Quote ID']
+    run['versions'][quote_id] = run['versions'].get(quote_id, 0) + 1
+    await write_queue.put(entry)
+
+    # A quote already sent on this run is sent again, even if its final content was done before
+    if (not run['full'] and quote_id not in run['changed']
+            and run['stored'].get(quote_id) == hash_grouped_entry(entry)):
+        return
+    run['changed'].add(quote_id)
+    if not entry.get('Document ID'):
+        print(f"Skipping Quote ID {quote_id} (no doc ID found).")
+        return
+    await fill_queue.put((entry, run['versions'][quote_id]))
+
+
+# === STAGE 3 - Write the grouped data to GroupedQuotes ===
+async def write_grouped_rows(client, config, in_queue):
+    """
+    Keep GroupedQuotes in line with the grouped entries as they arrive.
+
+    The sheet is read once up front. Each quote keeps the row it was first written to,
+    only rows that differ from the sheet are sent, in batches of `write_flush_rows`, and
+    rows left over from a previous, longer run are cleared at the end.
+    """
+    sheet_name = config['target_sheet_name']
+    last_column = column_letter(len(GROUPED_HEADER))
+    values_url = f"{config['sheets_url']}/v4/spreadsheets/{config['spreadsheet_id']}/values"
+    sheet_range = urllib.parse.quote(f"{sheet_name}!A1:{last_column}", safe='')
+    result = await client.request('sheets', 'GET', f"{values_url}/{sheet_range}")
+    existing = result.get('values', [])
+
+    positions = {}
+    pending = {}
+    counts = {'updated': 0, 'requests': 0}
+
+    async def flush():
+        changed_rows = sorted(pending.items())
+        pending.clear()
+        for data in chunk_row_updates(sheet_name, changed_rows, len(GROUPED_HEADER),
+                                      config['max_request_bytes']):
+            await client.request('sheets', 'POST', f"{values_url}:batchUpdate",
+                                 body={'valueInputOption': 'RAW', 'data': data})
+            counts['requests'] += 1
+        counts['updated'] += len(changed_rows)
+
+    def stage(number, row):
+        if number > len(existing) or row_as_read_back(row) != existing[number - 1]:
+            pending[number] = row
+
+    stage(1, GROUPED_HEADER)
+    while True:
+        entry = await in_queue.get()
+        if entry is None:
+            break
+        number = positions.setdefault(entry['Quote ID'], len(positions) + 2)
+        stage(number, build_grouped_rows([entry])[1])
+        if len(pending) >= config['write_flush_rows']:
+            await flush()
+    await flush()
+
+    # Clear the rows of quotes that are gone
+    num_rows = len(positions) + 1
+    num_cleared = len(existing) - num_rows
+    if num_cleared > 0:
+        await client.request('sheets', 'POST', f"{values_url}:batchClear", body={
+            'ranges': [f"{sheet_name}!A{num_rows + 1}:{last_column}{len(existing)}"]})
+
+    print(f"Grouped data written to existing sheet '{sheet_name}': "
+          f"{counts['updated']} row(s) updated in {counts['requests']} request(s), "
+          f"{max(num_cleared, 0)} row(s) cleared.")
+
+
+# === STAGE 4 - Fill the quote documents ===
+async def fill_documents(client, config, in_queue, run):
+    """
+    Document worker: fill the services table of each queued entry with one read and at
+    most one batchUpdate. An entry superseded by a newer version of its quote is skipped.
+    """
+    docs_url = f"{config['docs_url']}/v1/documents"
+    while True:
+        item = await in_queue.get()
+        if item is None:
+            return
+        entry, version = item
+        quote_id = entry['Quote ID']
+        doc_id = entry['Document ID']
+        async with run['locks'].setdefault(quote_id, asyncio.Lock()):
+            if run['versions'][quote_id] != version:
+                continue
+            try:
+                with TRACER.span('fill', quote_id=quote_id):
+                    doc = await client.request('docs', 'GET', f"{docs_url}/{doc_id}",
+                                               params={'fields': DOC_TABLE_FIELDS})
+                    table = find_table(doc.get('body', {}).get('content', []))
+                    if table is None:
+                        raise ValueError(f"Table 0 not found in document {doc_id}.")
+                    requests = build_services_table_requests(table, services_to_table_rows(entry['rows']))
+                    if requests:
+                        await client.request('docs', 'POST', f"{docs_url}/{doc_id}:batchUpdate",
+                                             body={'requests': requests})
+            except Exception as e:
+                print(f"Failed to fill document for Quote ID {quote_id}: {e}")
+                run['failed'][quote_id] = str(e)
+                continue
+            run['failed'].pop(quote_id, None)
+            run['succeeded'][quote_id] = None
+            run.setdefault('first_document_seconds', time.perf_counter() - run['start'])
+
+
+# === ENTRY POINT ===
+def parse_args(argv=None):
+    """Options of the async engine; the other main.py options are not supported by it."""
+    parser = argparse.ArgumentParser(description="Group quotes and fill their documents with the asyncio engine.")
+    parser.add_argument('--full', action='store_true',
+                        help="Ignore the local state and rebuild every quote.")
+    parser.add_argument('--profile', action='store_true',
+                        help="Print the p50/p95/p99 latency of each stage and API at the end.")
+    parser.add_argument('--trace', metavar='PATH',
+                        help="Write a timing span per stage, quote fill and API call to this "
+                             "JSON-lines file.")
+    parser.add_argument('--metrics', metavar='PATH',
+                        help="Write the stage latencies and API call counters to this file in "
+                             "the Prometheus text format.")
+    return parser.parse_args(argv)
+
+
+async def run_async(config=None):
+    """
+    Run the whole quote automation with the settings of DEFAULT_CONFIG, overridden by
+    `config`. Returns the document report of print_generation_summary, with the
+    'grouped' entries, the client 'stats' and the 'elapsed' and 'first_document' times.
+    """
+    config = {**DEFAULT_CONFIG, **(config or {})}
+    credentials = service_account.Credentials.from_service_account_file(
+        config['service_account_file'], scopes=config['scopes'])
+
+    state = open_state_store(config['state_db_file']) if config['state_db_file'] else None
+    stored = dict(state.execute("SELECT quote_id, content_hash FROM quote_state")) if state else {}
+    run = {
+        'start': time.perf_counter(), 'full': config['full'] or state is None, 'stored': stored,
+        'max_workers': config['max_workers'], 'versions': {}, 'locks': {}, 'changed': set(),
+        'succeeded': {}, 'failed': {}, 'grouper': None,
+    }
+
+    rows_queue = asyncio.Queue(config['queue_size'])
+    write_queue = asyncio.Queue(config['queue_size'])
+    fill_queue = asyncio.Queue(config['queue_size'])
+    connector = aiohttp.TCPConnector(limit=config['pool_size'])
+    timeout = aiohttp.ClientTimeout(total=config['timeout'])
+    async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+        client = AsyncGoogleClient(credentials, session, config['quotas'], config['max_retries'],
+                                   config['base_delay'], config['max_delay'], config['burst_seconds'])
+        tasks = [
+            asyncio.create_task(read_rows(client, config, rows_queue)),
+            asyncio.create_task(group_quotes(rows_queue, write_queue, fill_queue, run)),
+            asyncio.create_task(write_grouped_rows(client, config, write_queue)),
+        ] + [
+            asyncio.create_task(fill_documents(client, config, fill_queue, run))
+            for _ in range(config['max_workers'])
+        ]
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    grouper = run['grouper']
+    grouped_data = list(grouper.entries.values()) if grouper else []
+    invalid_totals = [pair for pairs in (grouper.invalid_totals.values() if grouper else []) for pair in pairs]
+    if invalid_totals:
+        print(f"{len(invalid_totals)} Total value(s) could not be parsed and were left out of Grand Total:")
+        for quote_id, value in invalid_totals:
+            print(f"  Quote ID {quote_id}: {value!r}")
+
+    report = {
+        'succeeded': [quote_id for quote_id in run['succeeded'] if quote_id not in run['failed']],
+        'failed': run['failed'],
+        'skipped': [entry['Quote ID'] for entry in grouped_data
+                    if entry['Quote ID'] in run['changed'] and not entry.get('Document ID')],
+    }
+    print_generation_summary(report)
+
+    # Remember the quotes that are done; failed ones are retried next run
+    if state is not None:
+        removed = set(stored) - set(grouper.entries if grouper else ())
+        print(f"{len(run['changed'])} of {len(grouped_data)} quote(s) changed and {len(removed)} removed "
+              f"since the last run.")
+        record_processed_entries(
+            state,
+            [entry for entry in grouped_data
+             if entry['Quote ID'] in run['changed'] and entry['Quote ID'] not in run['failed']],
+            {entry['Quote ID'] for entry in grouped_data}
+        )
+        state.close()
+
+    print_scheduler_report(client)
+    report['grouped'] = grouped_data
+    report['stats'] = client.stats
+    report['elapsed'] = time.perf_counter() - run['start']
+    report['first_document'] = run.get('first_document_seconds')
+    return report
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    TRACER.enabled = bool(args.trace or args.metrics or args.profile)
+    try:
+        asyncio.run(run_async({'full': args.full}))
+    finally:
+        report_trace(args)
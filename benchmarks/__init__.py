@@ -0,0 +1 @@
+"""Offline benchmarks for the quote automation pipeline. Run from the repo root with `python -m benchmarks.<name>`."""
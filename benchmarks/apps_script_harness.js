@@ -0,0 +1,184 @@
+/*
+ * Run injectServicesColumn from google-app-script.js against an in-memory mock of
+ * SpreadsheetApp, next to the original one-setValue-per-row loop, and check and count
+ * what each writes to the sheet.
+ *
+ * Usage: node benchmarks/apps_script_harness.js [num_quotes]
+ */
+const assert = require('assert');
+const {execFileSync} = require('child_process');
+const fs = require('fs');
+const path = require('path');
+
+// The original implementation, for comparison: one setValue per row into a new column
+const ORIGINAL_SCRIPT = `
+function injectServicesColumn() {
+  const sheet = SpreadsheetApp.getActiveSpreadsheet().getSheetByName('GroupedQuotes');
+  const data = sheet.getDataRange().getValues();
+  const headers = data[0];
+  const servicesColIndex = headers.indexOf('Services');
+  for (let i = 1; i < data.length; i++) {
+    let parsedServices;
+    try {
+      parsedServices = JSON.parse(data[i][servicesColIndex]);
+    } catch (e) {
+      Logger.log('Invalid JSON in row ' + (i + 1));
+      continue;
+    }
+    const formatted = parsedServices.map(service => {
+      return \`• \${service.Service_Type} | \${service.Language_Pair} | \${service.Modality} | \${service.Word_Count} words | \${service.Duration_hrs} hrs | \${service.Rate} USD | Total: \${service.Total} USD\\n\${service.Details}\`;
+    }).join('\\n\\n');
+    sheet.getRange(i + 1, headers.length + 1).setValue(formatted);
+  }
+}`;
+
+// A cell value as Sheets stores it: numeric-looking strings become numbers
+function storedValue(value) {
+  return typeof value === 'string' && /^-?\d+(\.\d+)?$/.test(value) ? Number(value) : value;
+}
+
+class MockSheet {
+  constructor(rows) {
+    this.rows = rows.map(row => row.map(storedValue));
+    this.calls = {};
+  }
+
+  count(name) {
+    this.calls[name] = (this.calls[name] || 0) + 1;
+  }
+
+  width() {
+    return Math.max(...this.rows.map(row => row.length));
+  }
+
+  getDataRange() {
+    this.count('getDataRange');
+    return this.getRange(1, 1, this.rows.length, this.width(), false);
+  }
+
+  getRange(row, column, numRows = 1, numColumns = 1, counted = true) {
+    if (counted) this.count('getRange');
+    const sheet = this;
+    return {
+      getValues() {
+        sheet.count('getValues');
+        return Array.from({length: numRows}, (_, r) => Array.from({length: numColumns}, (_, c) => {
+          const value = (sheet.rows[row - 1 + r] || [])[column - 1 + c];
+          return value === undefined ? '' : value;
+        }));
+      },
+      setValue(value) {
+        sheet.count('setValue');
+        sheet.set(row, column, value);
+      },
+      setValues(values) {
+        sheet.count('setValues');
+        assert.strictEqual(values.length, numRows, 'setValues row count must match the range');
+        values.forEach((cells, r) => {
+          assert.strictEqual(cells.length, numColumns, 'setValues column count must match the range');
+          cells.forEach((value, c) => sheet.set(row + r, column + c, value));
+        });
+      },
+    };
+  }
+
+  set(row, column, value) {
+    while (this.rows.length < row) this.rows.push([]);
+    const cells = this.rows[row - 1];
+    while (cells.length < column) cells.push('');
+    cells[column - 1] = storedValue(value);
+  }
+
+  column(name) {
+    const index = this.rows[0].indexOf(name);
+    return this.rows.slice(1).map(row => row[index]);
+  }
+}
+
+function groupedQuotes(numQuotes) {
+  const rows = [['Quote ID', 'Date', 'Client Name', 'Email', 'Organization', 'Notes', 'Services',
+                 'Grand Total', 'Num Services']];
+  for (let i = 0; i < numQuotes; i++) {
+    const services = Array.from({length: 1 + i % 4}, (_, j) => ({
+      Service_Type: 'Translation', Language_Pair: 'English <> French', Modality: 'Written',
+      Word_Count: String(1000 + j), Duration_hrs: '', Rate: '0.12', Details: `Line item ${j}`,
+      Total: (0.12 * (1000 + j)).toFixed(2),
+    }));
+    rows.push([`Q${String(i).padStart(6, '0')}`, '2025-05-01', `Client ${i}`, `client${i}@example.com`,
+               'Example Ltd', '', JSON.stringify(services), '120.00', String(services.length)]);
+  }
+  return rows;
+}
+
+// Run `source`'s injectServicesColumn on `sheet`; returns the milliseconds it took. The
+// script is compiled as a function of the mocks rather than in a vm context, whose global
+// lookups (Math, JSON) are many times slower than in Apps Script.
+function run(source, sheet) {
+  const SpreadsheetApp = {getActiveSpreadsheet: () => ({getSheetByName: () => sheet})};
+  const Logger = {log: () => {}};
+  const injectServicesColumn = new Function('SpreadsheetApp', 'Logger',
+                                            `${source}\nreturn injectServicesColumn;`)(SpreadsheetApp, Logger);
+  sheet.calls = {};
+  const start = process.hrtime.bigint();
+  injectServicesColumn();
+  return Number(process.hrtime.bigint() - start) / 1e6;
+}
+
+function report(label, elapsed, sheet) {
+  const writes = (sheet.calls.setValue || 0) + (sheet.calls.setValues || 0);
+  console.log(`  ${label.padEnd(30)} ${elapsed.toFixed(1).padStart(8)} ms  ${String(writes).padStart(6)} write call(s)  ` +
+              `${sheet.width()} columns`);
+}
+
+const numQuotes = Number(process.argv[2] || 5000);
+const script = fs.readFileSync(path.join(__dirname, '..', 'google-app-script.js'), 'utf8');
+console.log(`${numQuotes} quotes in GroupedQuotes`);
+
+const original = new MockSheet(groupedQuotes(numQuotes));
+report('original, first run', run(ORIGINAL_SCRIPT, original), original);
+report('original, second run', run(ORIGINAL_SCRIPT, original), original);
+
+const batched = new MockSheet(groupedQuotes(numQuotes));
+report('batched, first run', run(script, batched), batched);
+assert.deepStrictEqual(batched.column('Formatted Services'), original.rows.slice(1).map(row => row[9]));
+assert.strictEqual(batched.calls.setValues, 2);  // The header cells, then the whole block
+assert.strictEqual(batched.rows[0].indexOf('Formatted Services'), 10);  // Column J is main.py's Document Link
+
+report('batched, nothing changed', run(script, batched), batched);
+assert.strictEqual(batched.calls.setValues, undefined);
+
+// The Python script rewrites one quote's Services JSON and drops the last quote
+const services = JSON.parse(batched.rows[1][6]);
+services[0].Details = 'Changed';
+batched.rows[1][6] = JSON.stringify(services);
+batched.rows[numQuotes].splice(0, 9, ...Array(9).fill(''));
+report('batched, 2 rows changed', run(script, batched), batched);
+assert.strictEqual(batched.calls.setValues, 1);
+assert.ok(batched.rows[1][10].endsWith('\nChanged') || batched.rows[1][10].includes('\nChanged\n'));
+assert.deepStrictEqual([batched.rows[numQuotes][10], batched.rows[numQuotes][11]], ['', '']);
+assert.strictEqual(batched.width(), 12);
+
+// main.py's Document Link column J is kept, and formatted columns left inside A:J refused
+const linked = new MockSheet(groupedQuotes(2));
+linked.rows[0].push('Document Link');
+linked.rows[1].push('https://docs.google.com/document/d/doc-1/edit');
+run(script, linked);
+assert.deepStrictEqual(linked.rows[0].slice(9), ['Document Link', 'Formatted Services', 'Services Hash']);
+assert.strictEqual(linked.rows[1][9], 'https://docs.google.com/document/d/doc-1/edit');
+const misplaced = new MockSheet(groupedQuotes(2));
+misplaced.rows[0].push('Formatted Services', 'Services Hash');
+assert.throws(() => run(script, misplaced), /right of column J/);
+
+// Rows written by main.py --normalized already hold the formatted text and its hash: nothing to do
+const pythonRows = JSON.parse(execFileSync('python3', ['-c', `
+import json, main
+header = ['Quote ID', 'Date', 'Client Name', 'Email', 'Organization', 'Notes'] + main.SERVICE_COLUMNS
+data = [header] + [['Q-1', '2025-05-01', 'Client', 'c@example.com', 'Example Ltd', '', 'Translation',
+                    'EN>FR', 'Written', '1000', '', '0.12', details, '120'] for details in ('Line 1', 'é — 😀')]
+print(json.dumps(main.build_grouped_rows(main.group_rows_by_quote_id(data, header), normalized=True)))
+`], {cwd: path.join(__dirname, '..'), encoding: 'utf8'}));
+const normalized = new MockSheet(pythonRows);
+run(script, normalized);
+assert.strictEqual(normalized.calls.setValues, undefined);
+assert.deepStrictEqual(normalized.rows, new MockSheet(pythonRows).rows);
+console.log('  Output identical to the original loop; unchanged rows are not rewritten.');
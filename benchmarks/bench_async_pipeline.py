@@ -0,0 +1,89 @@
+"""
+Run the whole quote automation against the local fake Sheets/Docs REST server, with the
+synchronous main.run_pipeline and with the asyncio engine, and compare the total time and
+the time until the first quote document is filled.
+
+Usage: python -m benchmarks.bench_async_pipeline [num_rows] [latency_seconds]
+"""
+import asyncio
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+
+from google.oauth2 import service_account
+from googleapiclient.discovery import build_from_document
+from googleapiclient.discovery_cache import get_static_doc
+
+import async_engine
+import main
+from benchmarks.fake_google import FakeTokenServer, quote_document_blocks
+from benchmarks.synthetic import synthetic_quote_rows
+
+
+def start_server(num_rows, latency):
+    server = FakeTokenServer(latency=latency)
+    rows = synthetic_quote_rows(num_rows)
+    server.add_sheet('Quotes', rows)
+    server.add_sheet('GroupedQuotes', [])
+    for doc_id in {row[-1].split('open?id=')[1] for row in rows[1:]}:
+        server.add_document(doc_id, quote_document_blocks())
+    return server
+
+
+def run_sync(server, credentials_file, directory):
+    credentials = service_account.Credentials.from_service_account_file(credentials_file, scopes=main.SCOPES)
+    http = main.PooledHttp(credentials, scheduler=main.RequestScheduler({}))
+    options = {'api_endpoint': server.url}
+    sheet = build_from_document(get_static_doc('sheets', 'v4'), http=http, client_options=options).spreadsheets()
+    gdoc = build_from_document(get_static_doc('docs', 'v1'), http=http, client_options=options)
+    main.STATE_DB_FILE = os.path.join(directory, 'sync-state.db')
+    main.run_pipeline(main.parse_args(['--full']), sheet, gdoc, None)
+
+
+def run_async(server, credentials_file, directory):
+    asyncio.run(async_engine.run_async({
+        'service_account_file': credentials_file,
+        'sheets_url': server.url,
+        'docs_url': server.url,
+        'quotas': {},
+        'state_db_file': os.path.join(directory, 'async-state.db'),
+        'full': True,
+    }))
+
+
+def measure(runner, num_rows, latency):
+    server = start_server(num_rows, latency)
+    with tempfile.TemporaryDirectory() as directory:
+        credentials_file = server.write_service_account_file(directory)
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            runner(server, credentials_file, directory)
+        elapsed = time.perf_counter() - start
+    server.close()
+    first_fill = server.first_calls['docs.batchUpdate'] - start
+    return server, elapsed, first_fill
+
+
+if __name__ == '__main__':
+    num_rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1500
+    latency = float(sys.argv[2]) if len(sys.argv) > 2 else 0.02
+    main.READ_CHUNK_ROWS = async_engine.DEFAULT_CONFIG['chunk_rows'] = 500
+    main.READ_WINDOWS_PER_CALL = async_engine.DEFAULT_CONFIG['windows_per_call'] = 1
+
+    print(f"{num_rows} rows, {latency * 1000:.0f} ms per API call, windows of 500 rows, "
+          f"{main.DOCS_MAX_WORKERS} document workers")
+    results = {}
+    for label, runner in (('sync pipeline', run_sync), ('asyncio engine', run_async)):
+        server, elapsed, first_fill = measure(runner, num_rows, latency)
+        results[label] = server
+        print(f"  {label:<15} {elapsed:6.2f}s total, first document filled after {first_fill:5.2f}s, "
+              f"{server.total_calls('api_calls')} API calls")
+
+    sync_server, async_server = results.values()
+    assert sync_server.sheets['GroupedQuotes']['rows'] == async_server.sheets['GroupedQuotes']['rows']
+    assert all(sync_server.documents[doc_id].table_values() == async_server.documents[doc_id].table_values()
+               for doc_id in sync_server.documents)
+    print("  GroupedQuotes and every document are identical.")
@@ -0,0 +1,55 @@
+"""
+Compare sequential and concurrent quote document generation against the fake Docs API.
+
+Usage: python -m benchmarks.bench_concurrent_docs [num_quotes] [latency_seconds]
+"""
+import sys
+import time
+
+import main
+from benchmarks.fake_google import FakeDocsService, FakeGoogleBackend, quote_document_blocks
+
+
+def make_entries(num_quotes, services_per_quote=3):
+    entries = []
+    for i in range(num_quotes):
+        rows = [
+            ('Translation', 'EN>FR', 'Remote', '1000', '', '0.12', f'Item {j}', '120')
+            for j in range(services_per_quote)
+        ]
+        entries.append({'Quote ID': f'Q{i:05d}', 'Document ID': f'doc-{i}', 'rows': rows})
+    # One quote points at a document that does not exist, to show failure isolation
+    entries.append({'Quote ID': 'Q-MISSING', 'Document ID': 'doc-missing', 'rows': entries[0]['rows']})
+    return entries
+
+
+def run(num_quotes, latency, max_workers):
+    backend = FakeGoogleBackend(latency=latency)
+    entries = make_entries(num_quotes)
+    for entry in entries[:-1]:
+        backend.add_document(entry['Document ID'], quote_document_blocks())
+
+    start = time.perf_counter()
+    report = main.generate_docs_for_grouped_quotes(
+        entries, FakeDocsService(backend), None, max_workers=max_workers
+    )
+    elapsed = time.perf_counter() - start
+
+    assert backend.documents['doc-0'].table_values()[1:] == main.services_to_table_rows(entries[0]['rows'])
+    return elapsed, report, backend.total_calls('docs.')
+
+
+if __name__ == '__main__':
+    num_quotes = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    latency = float(sys.argv[2]) if len(sys.argv) > 2 else 0.05
+
+    results = []
+    for workers in (1, 4, 16):
+        elapsed, report, calls = run(num_quotes, latency, workers)
+        results.append((workers, elapsed, report, calls))
+
+    print()
+    print(f"{num_quotes} quotes, {latency * 1000:.0f} ms simulated latency per call")
+    for workers, elapsed, report, calls in results:
+        print(f"  workers={workers:<3} {elapsed:7.2f}s  {calls} Docs calls  "
+              f"{len(report['succeeded'])} ok / {len(report['failed'])} failed")
@@ -0,0 +1,61 @@
+"""
+Render quote documents as local DOCX files from one process and from a process pool,
+check their content, and upload them to the fake Drive.
+
+Usage: python -m benchmarks.bench_docx [num_quotes] [processes] [latency_seconds]
+"""
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+import xml.etree.ElementTree as ElementTree
+import zipfile
+
+import main
+from benchmarks.fake_google import FakeDriveService, FakeGoogleBackend
+from benchmarks.synthetic import synthetic_quote_rows
+
+W = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}'
+
+
+def docx_table_values(path):
+    """Cell texts of the first table of a DOCX file, header row included."""
+    with zipfile.ZipFile(path) as docx:
+        root = ElementTree.fromstring(docx.read('word/document.xml'))
+    table = root.find(f'{W}body/{W}tbl')
+    return [[''.join(t.text or '' for t in cell.iter(f'{W}t')) for cell in row.findall(f'{W}tc')]
+            for row in table.findall(f'{W}tr')]
+
+
+if __name__ == '__main__':
+    num_quotes = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    processes = int(sys.argv[2]) if len(sys.argv) > 2 else os.cpu_count()
+    latency = float(sys.argv[3]) if len(sys.argv) > 3 else 0.02
+    rows = synthetic_quote_rows(num_quotes * 3)
+    grouped = main.group_rows_by_quote_id(rows, rows[0])
+
+    print(f"{len(grouped)} quotes, {os.cpu_count()} CPU(s)")
+    with tempfile.TemporaryDirectory() as directory:
+        for label, count in (('1 process', 1), (f'{processes} processes', processes)):
+            output_dir = os.path.join(directory, str(count))
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                report = main.render_quote_documents(grouped, output_dir, count)
+            elapsed = time.perf_counter() - start
+            size = sum(os.path.getsize(path) for path in report['files'].values())
+            print(f"  render, {label:<12} {elapsed:6.2f}s  {len(grouped) / elapsed:7.0f} quotes/s  "
+                  f"{size / len(grouped) / 1024:.1f} KiB per file")
+
+        for entry in grouped[:50]:
+            values = docx_table_values(report['files'][entry['Quote ID']])
+            assert values == [main.SERVICE_COLUMNS] + main.services_to_table_rows(entry['rows'])
+
+        backend = FakeGoogleBackend(latency=latency)
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            uploaded, errors = main.upload_documents(FakeDriveService(backend), report['files'])
+        elapsed = time.perf_counter() - start
+        print(f"  upload, {main.DOCS_MAX_WORKERS} threads    {elapsed:6.2f}s  {len(uploaded)} uploaded, "
+              f"{len(errors)} failed, {latency * 1000:.0f} ms per call")
@@ -0,0 +1,50 @@
+"""
+Measure the size and JSON parse time of the document reads made per quote, with the
+whole document versus the partial-response masks used by main.py.
+
+Usage: python -m benchmarks.bench_field_masks [num_quotes] [terms_paragraphs]
+"""
+import contextlib
+import io
+import json
+import sys
+import time
+
+import main
+from benchmarks.fake_google import FakeDocsService, FakeGoogleBackend, quote_document_blocks
+
+
+def measure(gdoc, doc_ids, fields):
+    """Return (bytes, parse seconds) per read, as the client receives and decodes it."""
+    total_bytes = 0
+    parse_seconds = 0.0
+    for doc_id in doc_ids:
+        payload = json.dumps(gdoc.documents().get(documentId=doc_id, fields=fields).execute()).encode('utf-8')
+        start = time.perf_counter()
+        json.loads(payload)
+        parse_seconds += time.perf_counter() - start
+        total_bytes += len(payload)
+    return total_bytes / len(doc_ids), parse_seconds / len(doc_ids)
+
+
+if __name__ == '__main__':
+    num_quotes = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    terms_paragraphs = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+
+    backend = FakeGoogleBackend()
+    gdoc = FakeDocsService(backend)
+    services = [['Translation', 'EN>FR', 'Remote', '1000', '', '0.12', f'Item {j}', '120'] for j in range(3)]
+    doc_ids = [f'doc-{i}' for i in range(num_quotes)]
+    for doc_id in doc_ids:
+        backend.add_document(doc_id, quote_document_blocks(terms_paragraphs=terms_paragraphs))
+        with contextlib.redirect_stdout(io.StringIO()):
+            main.populate_services_table(doc_id, gdoc, services)
+        assert backend.documents[doc_id].table_values()[1:] == services
+
+    print(f"{num_quotes} filled quotes, {terms_paragraphs} paragraphs of terms each; per document read:")
+    for label, fields in (
+        ('whole document', None),
+        ('DOC_TABLE_FIELDS', main.DOC_TABLE_FIELDS),
+    ):
+        size, parse = measure(gdoc, doc_ids, fields)
+        print(f"  {label:<24} {size / 1024:8.1f} KiB  {parse * 1000:7.3f} ms to parse")
@@ -0,0 +1,65 @@
+"""
+Compare writing GroupedQuotes with a Services JSON column, then formatting it cell by
+cell like injectServicesColumn (one setValue per quote), with the normalized output:
+the formatted text and a GroupedServices sheet written by the same batched requests.
+
+Usage: python -m benchmarks.bench_normalized [num_quotes] [latency_seconds]
+"""
+import contextlib
+import io
+import json
+import sys
+import time
+
+import main
+from benchmarks.fake_google import FakeGoogleBackend, FakeSheetsService
+from benchmarks.synthetic import synthetic_quote_rows
+
+
+def inject_services_column(sheet):
+    """The Apps Script loop: parse each row's Services JSON and write its text into the next free column."""
+    values = sheet.values().get(spreadsheetId='sheet', range='GroupedQuotes!A1:I').execute()['values']
+    column = main.column_letter(len(values[0]) + 1)
+    for number, row in enumerate(values[1:], start=2):
+        services = json.loads(row[values[0].index('Services')])
+        text = main.format_services_text([tuple(service[field] for field in main.SERVICE_FIELDS)
+                                          for service in services])
+        sheet.values().update(spreadsheetId='sheet', range=f'GroupedQuotes!{column}{number}',
+                              body={'values': [[text]]}).execute()
+
+
+def run(normalized, grouped, latency):
+    backend = FakeGoogleBackend(latency=latency)
+    backend.add_sheet('GroupedQuotes', [])  # GroupedServices is added by write_grouped_data
+    sheet = FakeSheetsService(backend)
+
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        main.write_grouped_data(sheet, 'sheet', 'GroupedQuotes', grouped,
+                                services_sheet_name='GroupedServices' if normalized else None)
+    write_time = time.perf_counter() - start
+    write_calls = backend.total_calls('sheets.')
+    if not normalized:
+        inject_services_column(sheet)
+    return time.perf_counter() - start, write_time, write_calls, backend.total_calls('sheets.'), backend
+
+
+if __name__ == '__main__':
+    num_quotes = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    latency = float(sys.argv[2]) if len(sys.argv) > 2 else 0.005
+    rows = synthetic_quote_rows(num_quotes * 3)
+    grouped = main.group_rows_by_quote_id(rows, rows[0])
+
+    print(f"{len(grouped)} quotes, {latency * 1000:.0f} ms per call")
+    backends = {}
+    for label, normalized in (('json + cell loop', False), ('normalized', True)):
+        elapsed, write_time, write_calls, calls, backends[label] = run(normalized, grouped, latency)
+        print(f"  {label:<17} {elapsed:6.2f}s total ({write_time:.2f}s writing)  "
+              f"{calls} Sheets calls ({write_calls} for the write)")
+
+    injected = [row[-1] for row in backends['json + cell loop'].sheets['GroupedQuotes']['rows'][1:]]
+    normalized_rows = backends['normalized'].sheets['GroupedQuotes']['rows']
+    assert [row[normalized_rows[0].index('Formatted Services')] for row in normalized_rows[1:]] == injected
+    service_rows = backends['normalized'].sheets['GroupedServices']['rows']
+    assert len(service_rows) - 1 == sum(len(main.valid_services(entry)) for entry in grouped)
+    print(f"  Formatted text identical; GroupedServices holds {len(service_rows) - 1} service rows.")
@@ -0,0 +1,150 @@
+"""
+Time the pipeline end to end on a synthetic Quotes sheet against the in-process fake
+Sheets and Docs APIs: group_rows_by_quote_id, write_grouped_data and
+generate_docs_for_grouped_quotes, and compare the timings and API call counts with
+the stored baselines.
+
+Timings are the best of `--repeat` runs. A stage is reported as a regression when it is
+more than `--tolerance` (and 50 ms) slower than its baseline, or when it makes more API
+calls; the exit status is then 1. Baselines are stored per scenario (the generator and backend
+parameters) and only mean something on the machine that recorded them: record new
+ones with --save-baseline after a deliberate change.
+
+Usage: python -m benchmarks.bench_pipeline [--rows N] [--services-per-quote N]
+       [--manual-fraction F] [--latency SECONDS] [--error-rate F] [--save-baseline]
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import time
+
+import main
+from benchmarks.fake_google import FakeDocsService, FakeGoogleBackend, FakeSheetsService, quote_document_blocks
+from benchmarks.synthetic import synthetic_quote_rows
+
+BASELINES_FILE = os.path.join(os.path.dirname(__file__), 'baselines.json')
+STAGES = ['group', 'write', 'docs']
+MIN_SLOWDOWN_SECONDS = 0.05  # Smaller slowdowns are timer noise, whatever their ratio
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--rows', type=int, default=6000, help="Service rows in the Quotes sheet")
+    parser.add_argument('--services-per-quote', type=int, default=3, help="Service rows sharing a Quote ID")
+    parser.add_argument('--manual-fraction', type=float, default=0.05, help="Fraction of rows with a 'Manual' Total")
+    parser.add_argument('--latency', type=float, default=0.002, help="Seconds per fake API call")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="Fraction of API calls answered 429")
+    parser.add_argument('--workers', type=int, default=main.DOCS_MAX_WORKERS, help="Document worker threads")
+    parser.add_argument('--seed', type=int, default=0, help="Seed of the generator and of the injected errors")
+    parser.add_argument('--repeat', type=int, default=3, help="Runs per stage; the fastest one counts")
+    parser.add_argument('--tolerance', type=float, default=0.25, help="Allowed slowdown against the baseline")
+    parser.add_argument('--baselines', default=BASELINES_FILE, help="JSON file of the stored baselines")
+    parser.add_argument('--save-baseline', action='store_true', help="Store this run as the scenario's baseline")
+    return parser.parse_args(argv)
+
+
+def scenario_key(args):
+    return (f"rows={args.rows} services={args.services_per_quote} manual={args.manual_fraction} "
+            f"latency={args.latency} errors={args.error_rate} workers={args.workers} seed={args.seed}")
+
+
+def make_backend(args, rows):
+    """Fake backend holding an empty GroupedQuotes sheet and one document per quote."""
+    scheduler = main.RequestScheduler({}, base_delay=args.latency, max_delay=args.latency * 8)
+    backend = FakeGoogleBackend(latency=args.latency, error_rate=args.error_rate, seed=args.seed,
+                                scheduler=scheduler)
+    backend.add_sheet('GroupedQuotes', [])
+    for doc_id in {main.extract_drive_file_id(row[-1]) for row in rows[1:]}:
+        backend.add_document(doc_id, quote_document_blocks())
+    return backend
+
+
+def run_once(args, rows):
+    """Run the three stages once on a fresh backend; return (seconds, api_calls, grouped, backend)."""
+    backend = make_backend(args, rows)
+    seconds, api_calls = {}, {}
+    sheet, gdoc = FakeSheetsService(backend), FakeDocsService(backend)
+    stages = [
+        ('group', lambda: main.group_rows_by_quote_id([list(row) for row in rows], rows[0])),
+        ('write', lambda: main.write_grouped_data(sheet, 'fake-sheet', 'GroupedQuotes', grouped)),
+        ('docs', lambda: main.generate_docs_for_grouped_quotes(grouped, gdoc, None, max_workers=args.workers)),
+    ]
+    grouped = None
+    for stage, run in stages:
+        calls_before = backend.total_calls() - backend.total_calls('edit.')
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            result = run()
+        seconds[stage] = time.perf_counter() - start
+        api_calls[stage] = backend.total_calls() - backend.total_calls('edit.') - calls_before
+        if stage == 'group':
+            grouped = result
+        elif stage == 'docs' and result['failed']:
+            raise RuntimeError(f"{len(result['failed'])} document(s) failed: {result['failed']}")
+    return seconds, api_calls, grouped, backend
+
+
+def check_outputs(grouped, backend):
+    """The GroupedQuotes sheet and every document must hold what the pipeline computed."""
+    written = backend.sheets['GroupedQuotes']['rows']
+    assert written == [main.row_as_read_back(row) for row in main.build_grouped_rows(grouped)]
+    for entry in grouped:
+        assert backend.documents[entry['Document ID']].table_values()[1:] == main.services_to_table_rows(entry['rows'])
+
+
+def load_baselines(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def compare(result, baseline, tolerance):
+    """Return one report line per stage and whether any of them regressed."""
+    lines, regressed = [], False
+    for stage in STAGES + ['total']:
+        seconds, calls = result['seconds'][stage], result['api_calls'].get(stage)
+        line = f"  {stage:<6} {seconds:7.3f}s"
+        line += f"  {calls:6d} API calls" if calls is not None else ' ' * 17
+        if baseline:
+            base_seconds, base_calls = baseline['seconds'][stage], baseline['api_calls'].get(stage)
+            change = seconds / base_seconds - 1 if base_seconds else 0.0
+            line += f"   baseline {base_seconds:7.3f}s ({change:+6.1%})"
+            slower = change > tolerance and seconds - base_seconds > MIN_SLOWDOWN_SECONDS
+            if slower or (calls is not None and calls > base_calls):
+                line += "  REGRESSION"
+                regressed = True
+        lines.append(line)
+    return lines, regressed
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    rows = synthetic_quote_rows(args.rows, args.services_per_quote, args.manual_fraction, args.seed)
+    key = scenario_key(args)
+
+    best, api_calls = {}, None
+    for _ in range(args.repeat):
+        seconds, api_calls, grouped, backend = run_once(args, rows)
+        check_outputs(grouped, backend)
+        best = {stage: min(seconds[stage], best.get(stage, seconds[stage])) for stage in STAGES}
+    best['total'] = sum(best.values())
+    result = {'seconds': {stage: round(value, 4) for stage, value in best.items()}, 'api_calls': api_calls}
+
+    baselines = load_baselines(args.baselines)
+    print(f"{key}: {len(grouped)} quotes, best of {args.repeat}, {backend.total_calls('errors')} call(s) answered 429")
+    lines, regressed = compare(result, None if args.save_baseline else baselines.get(key), args.tolerance)
+    print('\n'.join(lines))
+
+    if args.save_baseline:
+        baselines[key] = result
+        with open(args.baselines, 'w') as f:
+            json.dump(baselines, f, indent=2, sort_keys=True)
+            f.write('\n')
+        print(f"Baseline saved to {args.baselines}")
+    elif key not in baselines:
+        print("No baseline for this scenario; record one with --save-baseline.")
+    sys.exit(1 if regressed else 0)
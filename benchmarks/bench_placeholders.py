@@ -0,0 +1,71 @@
+"""
+Compare the Document Studio flow (Document Studio copies the template and replaces its
+placeholders, then main.py reads each document and fills its services table) with
+generating the documents from template copies, whose placeholders and services table
+are filled in a single batchUpdate. Documents are filled one at a time and the
+per-quote fill latency is the median of the 'fill' spans of main.TRACER.
+
+Usage: python -m benchmarks.bench_placeholders [num_quotes] [latency_seconds]
+"""
+import contextlib
+import io
+import sys
+import time
+
+import main
+from benchmarks.bench_template_variants import VARIANT_SIZES, make_entries
+from benchmarks.fake_google import FakeDocsService, FakeDriveService, FakeGoogleBackend, quote_document_blocks
+
+
+def document_studio_pass(drive, gdoc, entries):
+    """What Document Studio does before main.py runs: one copy and one replaceAllText batch per quote."""
+    documents = []
+    for entry in entries:
+        doc_id = drive.files().copy(fileId='template-1', body={'name': f"Quote {entry['Quote ID']}"}).execute()['id']
+        gdoc.documents().batchUpdate(documentId=doc_id, body={'requests': main.placeholder_requests(entry)}).execute()
+        documents.append({**entry, 'Document ID': doc_id})
+    return documents
+
+
+def run(mode, entries, latency):
+    backend = FakeGoogleBackend(latency=latency)
+    gdoc, drive = FakeDocsService(backend), FakeDriveService(backend)
+    variants = {size: f'template-{size}' for size in VARIANT_SIZES}
+    for size, template_id in variants.items():
+        backend.add_document(template_id, quote_document_blocks(size))
+    main.TRACER.enabled = True
+    main.TRACER.spans.clear()
+
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        if mode == 'document studio':
+            documents = document_studio_pass(drive, gdoc, entries)
+            structure_cache = None
+        else:
+            documents = main.copy_quote_documents(drive, entries, variants)
+            structure_cache = main.DocumentStructureCache()
+        # One document at a time, so the fill spans measure the latency of a single quote
+        report = main.generate_docs_for_grouped_quotes(documents, gdoc, drive, structure_cache=structure_cache)
+    elapsed = time.perf_counter() - start
+
+    for entry in documents:
+        document = backend.documents[entry['Document ID']]
+        assert document.table_values()[1:] == main.services_to_table_rows(entry['rows'])
+        assert document.paragraph_texts()[:2] == [f"Quote for {entry['Client Name']}", f"Date: {entry['Date']}"]
+    fill = main.TRACER.durations()['fill']
+    round_trips = backend.total_calls('docs.') + (backend.total_calls('drive.batch') or backend.total_calls('drive.'))
+    return elapsed, main.percentile(fill, 0.5), round_trips, len(report['succeeded'])
+
+
+if __name__ == '__main__':
+    num_quotes = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    latency = float(sys.argv[2]) if len(sys.argv) > 2 else 0.02
+    entries = [{**entry, 'Client Name': f'Client {i}', 'Date': '2025-05-01', 'Email': f'client{i}@example.com',
+                'Organization': 'Example Ltd', 'Notes': '', 'Grand Total': main.sum_service_totals(entry['rows'])}
+               for i, entry in enumerate(make_entries(num_quotes))]
+
+    print(f"{num_quotes} quotes, {latency * 1000:.0f} ms per call")
+    for mode in ('document studio', 'template generator'):
+        elapsed, fill_p50, round_trips, succeeded = run(mode, entries, latency)
+        print(f"  {mode:<19} {elapsed:6.2f}s  fill p50 {fill_p50 * 1000:5.1f} ms per quote  "
+              f"{round_trips / num_quotes:.2f} round-trips per quote  {succeeded} filled")
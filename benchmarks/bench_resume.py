@@ -0,0 +1,87 @@
+"""
+Kill a document generation run at 90% and start it again, with and without the JobQueue.
+
+The first run happens in a child process that is killed (os._exit) once 90% of the
+documents are filled. The restart then either resumes from the queue's checkpoint or,
+as before, redoes every quote.
+
+Usage: python -m benchmarks.bench_resume [num_quotes] [latency_seconds]
+"""
+import contextlib
+import io
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+import main
+from benchmarks.bench_concurrent_docs import make_entries
+from benchmarks.fake_google import FakeDocsService, FakeGoogleBackend, quote_document_blocks
+
+
+class KilledBackend(FakeGoogleBackend):
+    """Ends the process abruptly after `kill_after` documents were filled."""
+
+    def __init__(self, latency, kill_after):
+        super().__init__(latency)
+        self.kill_after = kill_after
+
+    def count(self, name):
+        super().count(name)
+        if name == 'docs.batchUpdate' and self.calls[name] >= self.kill_after:
+            os._exit(1)
+
+
+def make_backend(entries, latency, kill_after=None):
+    backend = KilledBackend(latency, kill_after) if kill_after else FakeGoogleBackend(latency)
+    for entry in entries:
+        backend.add_document(entry['Document ID'], quote_document_blocks())
+    return backend
+
+
+def interrupted_run(db_file, num_quotes, latency):
+    entries = make_entries(num_quotes)[:-1]
+    backend = make_backend(entries, latency, kill_after=int(num_quotes * 0.9))
+    jobs = main.JobQueue(db_file)
+    jobs.enqueue(entries)
+    with contextlib.redirect_stdout(io.StringIO()):
+        main.generate_docs_for_grouped_quotes(entries, FakeDocsService(backend), None,
+                                              max_workers=8, job_queue=jobs)
+
+
+def restart(entries, latency, db_file=None):
+    backend = make_backend(entries, latency)
+    start = time.perf_counter()
+    to_run, jobs = entries, None
+    if db_file:
+        jobs = main.JobQueue(db_file)
+        jobs.enqueue(entries)
+        to_run = jobs.pending(entries)
+    with contextlib.redirect_stdout(io.StringIO()):
+        report = main.generate_docs_for_grouped_quotes(to_run, FakeDocsService(backend), None,
+                                                       max_workers=8, job_queue=jobs)
+    elapsed = time.perf_counter() - start
+    states = jobs.states() if jobs else {}
+    return elapsed, len(report['succeeded']), sum(1 for state in states.values() if state == 'done')
+
+
+if __name__ == '__main__':
+    num_quotes = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    latency = float(sys.argv[2]) if len(sys.argv) > 2 else 0.002
+    entries = make_entries(num_quotes)[:-1]
+
+    with tempfile.TemporaryDirectory() as directory:
+        db_file = os.path.join(directory, 'jobs.db')
+        process = multiprocessing.get_context('spawn').Process(
+            target=interrupted_run, args=(db_file, num_quotes, latency))
+        process.start()
+        process.join()
+        states = main.JobQueue(db_file).states()
+        counts = {state: list(states.values()).count(state) for state in ('pending', 'in_progress', 'done')}
+        print(f"{num_quotes} quotes, run killed at 90% (exit code {process.exitcode}): {counts}")
+
+        for label, queue_file in (('redo everything', None), ('resume from queue', db_file)):
+            elapsed, filled, done = restart(entries, latency, queue_file)
+            print(f"  {label:<18} {elapsed:6.2f}s  {filled} document(s) filled on restart"
+                  + (f", {done} job(s) done in total" if queue_file else ''))
@@ -0,0 +1,58 @@
+"""
+Drive concurrent calls through PooledHttp against a local server that answers a share of
+them with 429, with and without the RequestScheduler's quota and retries.
+
+Usage: python -m benchmarks.bench_scheduler [num_calls] [quota_per_minute]
+"""
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from google.oauth2 import service_account
+
+import main
+from benchmarks.fake_google import FakeTokenServer
+
+
+class NoScheduling(main.RequestScheduler):
+    """Sends every call once, as the code did before the scheduler."""
+
+    def call(self, key, send, idempotent=True, cost=1, span=None):
+        self.stats['requests'] += 1
+        return send()
+
+
+def run(scheduler, num_calls, workers=8):
+    server = FakeTokenServer(latency=0.01, error_rate=0.1, retry_after=0.2)
+    with tempfile.TemporaryDirectory() as directory:
+        credentials = service_account.Credentials.from_service_account_file(
+            server.write_service_account_file(directory), scopes=main.SCOPES)
+    http = main.PooledHttp(credentials, scheduler=scheduler)
+
+    def call(i):
+        resp, _ = http.request(f'{server.url}/docs/v1/documents/doc-{i}')
+        return resp.status
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        statuses = list(executor.map(call, range(num_calls)))
+    elapsed = time.perf_counter() - start
+    server.close()
+    return elapsed, statuses
+
+
+if __name__ == '__main__':
+    num_calls = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    quota = int(sys.argv[2]) if len(sys.argv) > 2 else 3000
+
+    print(f"{num_calls} calls from 8 threads, 10% answered 429 (Retry-After 0.2s), quota {quota}/min")
+    for label, scheduler in (
+        ('unscheduled', NoScheduling({})),
+        ('scheduled', main.RequestScheduler({('docs', 'read'): quota}, base_delay=0.1, burst_seconds=1)),
+    ):
+        elapsed, statuses = run(scheduler, num_calls)
+        failed = sum(1 for status in statuses if status != 200)
+        print(f"  {label:<12} {elapsed:6.2f}s  {failed} call(s) failed, "
+              f"{scheduler.stats['requests'] / elapsed * 60:.0f} requests/min sent")
+        main.print_scheduler_report(scheduler)
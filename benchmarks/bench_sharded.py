@@ -0,0 +1,73 @@
+"""
+Fill quote documents through the local fake Docs REST server from one process and from a
+pool of shard processes, each with its own service account file.
+
+Usage: python -m benchmarks.bench_sharded [num_quotes] [num_shards] [latency_seconds]
+"""
+import contextlib
+import functools
+import io
+import os
+import sys
+import tempfile
+import time
+
+from googleapiclient.discovery import build_from_document
+from googleapiclient.discovery_cache import get_static_doc
+
+import main
+from benchmarks.bench_concurrent_docs import make_entries
+from benchmarks.fake_google import FakeTokenServer, quote_document_blocks
+
+
+@contextlib.contextmanager
+def quiet_stdout():
+    """Silence stdout at the file descriptor level, so the worker processes are quiet too."""
+    sys.stdout.flush()
+    saved = os.dup(1)
+    with open(os.devnull, 'w') as devnull:
+        os.dup2(devnull.fileno(), 1)
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            yield
+    finally:
+        os.dup2(saved, 1)
+        os.close(saved)
+
+
+def build_fake_gdoc(api_endpoint, service_account_file, scopes):
+    """Docs service of a worker process, talking to the fake server over its own PooledHttp."""
+    return build_from_document(get_static_doc('docs', 'v1'), http=main.get_shared_http(service_account_file, scopes),
+                               client_options={'api_endpoint': api_endpoint})
+
+
+if __name__ == '__main__':
+    num_quotes = int(sys.argv[1]) if len(sys.argv) > 1 else 400
+    num_shards = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    latency = float(sys.argv[3]) if len(sys.argv) > 3 else 0.02
+    entries = make_entries(num_quotes)[:-1]
+
+    print(f"{num_quotes} quotes, {latency * 1000:.0f} ms per call, {main.DOCS_MAX_WORKERS} threads per process, "
+          f"{os.cpu_count()} CPU(s)")
+    for shards in (1, num_shards):
+        server = FakeTokenServer(latency=latency)
+        for entry in entries:
+            server.add_document(entry['Document ID'], quote_document_blocks())
+        with tempfile.TemporaryDirectory() as directory:
+            files = []
+            for shard in range(shards):
+                os.mkdir(os.path.join(directory, str(shard)))
+                files.append(server.write_service_account_file(os.path.join(directory, str(shard))))
+
+            start = time.perf_counter()
+            with quiet_stdout():
+                report = main.generate_docs_sharded(entries, shards, files,
+                                                    gdoc_builder=functools.partial(build_fake_gdoc, server.url))
+            elapsed = time.perf_counter() - start
+        server.close()
+
+        assert all(server.documents[entry['Document ID']].table_values()[1:] ==
+                   main.services_to_table_rows(entry['rows']) for entry in entries)
+        sizes = sorted(counts['succeeded'] for counts in report['shards'].values())
+        print(f"  {shards} process(es) {elapsed:6.2f}s  {len(report['succeeded'])} filled, "
+              f"{server.total_calls('token_fetches')} token fetch(es), quotes per shard {sizes}")
@@ -0,0 +1,107 @@
+"""
+Startup cost of one credentials load + transport per service vs the shared PooledHttp,
+measured against a local fake token endpoint with simulated handshake and token latency.
+Then checks that Drive batches run on the shared transport: one token fetch serves the
+whole run, also when the token expires between batches sent from several threads.
+
+Usage: python -m benchmarks.bench_shared_transport [calls_per_service]
+"""
+import datetime
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+
+import google_auth_httplib2
+import googleapiclient
+import httplib2
+from google.oauth2 import service_account
+from googleapiclient.discovery import build_from_document
+
+import main
+from benchmarks.fake_google import FakeTokenServer, quote_document_blocks
+
+SERVICES = ['sheets', 'docs', 'drive']
+
+
+def per_service_transports(credentials_file, url, calls):
+    """The original authenticate_* pattern: credentials and an httplib2 connection per service."""
+    for name in SERVICES:
+        credentials = service_account.Credentials.from_service_account_file(credentials_file, scopes=main.SCOPES)
+        http = google_auth_httplib2.AuthorizedHttp(credentials, http=httplib2.Http())
+        for _ in range(calls):
+            http.request(f'{url}/{name}')
+
+
+def shared_transport(credentials_file, url, calls):
+    for name in SERVICES:
+        http = main.get_shared_http(credentials_file, main.SCOPES)
+        for _ in range(calls):
+            http.request(f'{url}/{name}')
+
+
+def run(func, calls):
+    server = FakeTokenServer(latency=0.005, handshake_latency=0.05, token_latency=0.1)
+    with tempfile.TemporaryDirectory() as directory:
+        credentials_file = server.write_service_account_file(directory)
+        main._shared_http.clear()
+        start = time.perf_counter()
+        func(credentials_file, server.url, calls)
+        elapsed = time.perf_counter() - start
+    server.close()
+    return elapsed, server.calls
+
+
+def drive_batches(calls, threads=4):
+    """
+    Copy `calls` documents in Drive batches, expire the token, then copy them again from
+    `threads` threads at once. Returns the server counters and the tokens the batched
+    sub-requests were sent with.
+    """
+    server = FakeTokenServer(latency=0.005)
+    for i in range(calls):
+        server.add_document(f'doc-{i}', quote_document_blocks())
+    # The discovery document shipped with googleapiclient, pointed at the fake server
+    with open(os.path.join(os.path.dirname(googleapiclient.__file__),
+                           'discovery_cache', 'documents', 'drive.v3.json')) as f:
+        document = json.load(f)
+    document['rootUrl'] = f'{server.url}/'
+
+    with tempfile.TemporaryDirectory() as directory:
+        credentials_file = server.write_service_account_file(directory)
+        main._shared_http.clear()
+        http = main.get_shared_http(credentials_file, main.SCOPES)
+        drive = build_from_document(document, http=http)
+        factories = {f'doc-{i}': lambda i=i: drive.files().copy(fileId=f'doc-{i}', body={'name': f'Copy {i}'})
+                     for i in range(calls)}
+        main.execute_drive_batch(drive, factories, batch_size=10)
+        fetches_before_expiry = server.calls.get('token_fetches', 0)
+
+        http.credentials.expiry = datetime.datetime.utcnow() - datetime.timedelta(seconds=1)
+        workers = [threading.Thread(target=main.execute_drive_batch, args=(drive, factories),
+                                    kwargs={'batch_size': 10}) for _ in range(threads)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+    server.close()
+    return fetches_before_expiry, server.calls, server.authorizations
+
+
+if __name__ == '__main__':
+    calls = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+
+    print(f"{len(SERVICES)} services x {calls} call(s); 50 ms handshake, 100 ms token fetch")
+    for label, func in (('per service', per_service_transports), ('shared', shared_transport)):
+        elapsed, counts = run(func, calls)
+        print(f"  {label:<12} {elapsed:6.3f}s  {counts.get('connections', 0)} connection(s), "
+              f"{counts.get('token_fetches', 0)} token fetch(es), {counts.get('api_calls', 0)} API call(s)")
+
+    before, counts, tokens = drive_batches(40)
+    print(f"Drive batches: {counts.get('drive.batch', 0)} batch(es), {counts.get('drive.files.copy', 0)} copies; "
+          f"{before} token fetch(es) before the token expired, {counts.get('token_fetches', 0)} in all, "
+          f"sub-requests sent with {len(tokens)} token(s)")
+    assert before == 1, 'each Drive batch should reuse the token of the shared transport'
+    assert counts.get('token_fetches', 0) == 2, 'one refresh should serve every thread after the token expired'
@@ -0,0 +1,55 @@
+"""
+Group a synthetic Quotes export read from CSV, JSONL and Parquet files (Parquet only when
+pyarrow is installed), with no network involved.
+
+Usage: python -m benchmarks.bench_sources [num_rows]
+"""
+import contextlib
+import csv
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+
+import main
+from benchmarks.synthetic import synthetic_quote_rows
+
+
+def write_exports(rows, directory):
+    paths = {'csv': os.path.join(directory, 'quotes.csv'), 'jsonl': os.path.join(directory, 'quotes.jsonl')}
+    with open(paths['csv'], 'w', newline='', encoding='utf-8') as f:
+        csv.writer(f).writerows(rows)
+    with open(paths['jsonl'], 'w', encoding='utf-8') as f:
+        for row in rows[1:]:
+            f.write(json.dumps(dict(zip(rows[0], row)), ensure_ascii=False) + '\n')
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        return paths
+    paths['parquet'] = os.path.join(directory, 'quotes.parquet')
+    table = pa.table({name: [row[i] for row in rows[1:]] for i, name in enumerate(rows[0])})
+    pq.write_table(table, paths['parquet'])
+    return paths
+
+
+if __name__ == '__main__':
+    num_rows = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    rows = synthetic_quote_rows(num_rows)
+    expected = main.group_rows_by_quote_id(rows, rows[0])
+
+    with tempfile.TemporaryDirectory() as directory:
+        paths = write_exports(rows, directory)
+        print(f"{num_rows} rows, {len(expected)} quotes")
+        for name, path in paths.items():
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                grouped = main.group_source_rows(iter(main.iter_source_rows(path)))
+            elapsed = time.perf_counter() - start
+            assert grouped == expected
+            print(f"  {name:<8} {os.path.getsize(path) / 2 ** 20:6.1f} MiB  {elapsed:6.2f}s  "
+                  f"{num_rows / elapsed:9,.0f} rows/s")
+        if 'parquet' not in paths:
+            print("  parquet  skipped (pyarrow is not installed)")
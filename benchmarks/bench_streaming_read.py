@@ -0,0 +1,53 @@
+"""
+Peak memory and time of reading + grouping the Quotes sheet, whole-range vs streamed.
+
+Usage: python -m benchmarks.bench_streaming_read [num_rows]
+"""
+import gc
+import itertools
+import sys
+import time
+import tracemalloc
+
+import main
+from benchmarks.fake_google import FakeGoogleBackend, FakeSheetsService
+from benchmarks.synthetic import synthetic_quote_rows
+
+
+def whole_range(sheet):
+    values = sheet.values().get(spreadsheetId='sheet-id', range=main.RANGE_NAME).execute().get('values', [])
+    return main.group_rows_by_quote_id(values, values[0])
+
+
+def streamed(sheet):
+    rows = main.iter_sheet_rows(sheet, 'sheet-id', main.RANGE_NAME)
+    header = next(rows)
+    return main.group_rows_by_quote_id(itertools.chain([header], rows), header)
+
+
+def measure(func, sheet):
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    grouped = func(sheet)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return grouped, elapsed, peak
+
+
+if __name__ == '__main__':
+    num_rows = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+
+    backend = FakeGoogleBackend()
+    backend.add_sheet('Quotes', synthetic_quote_rows(num_rows))
+    sheet = FakeSheetsService(backend)
+
+    results = {}
+    for name, func in (('whole range', whole_range), ('streamed', streamed)):
+        results[name] = measure(func, sheet)
+
+    assert results['whole range'][0] == results['streamed'][0]
+    print(f"{num_rows} rows, {len(results['streamed'][0])} quotes")
+    for name, (_, elapsed, peak) in results.items():
+        print(f"  {name:<12} {elapsed:6.2f}s  peak {peak / 1024 / 1024:7.1f} MiB")
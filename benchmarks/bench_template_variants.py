@@ -0,0 +1,88 @@
+"""
+Compare filling quote documents whose services table has a single row (the Document
+Studio output, grown with one insertTableRow per extra service) with copying the
+closest of a pool of pre-sized template variants (made by build_template_variants)
+first, with and without the DocumentStructureCache that spares reading each copy.
+
+Usage: python -m benchmarks.bench_template_variants [num_quotes] [latency_seconds]
+"""
+import contextlib
+import io
+import random
+import sys
+import time
+
+import main
+from benchmarks.fake_google import (FakeDocsService, FakeDriveService, FakeGoogleBackend,
+                                    quote_document_blocks)
+
+VARIANT_SIZES = (1, 2, 4, 8, 16)
+
+
+def make_entries(num_quotes, seed=0):
+    """Quotes with 1 to 24 services, skewed towards small quotes like real traffic."""
+    rng = random.Random(seed)
+    entries = []
+    for i in range(num_quotes):
+        num_services = min(24, int(rng.expovariate(1 / 5)) + 1)
+        rows = [
+            ('Translation', 'EN>FR', 'Remote', '1000', '', '0.12', f'Item {j}', '120')
+            for j in range(num_services)
+        ]
+        entries.append({'Quote ID': f'Q{i:05d}', 'Document ID': f'doc-{i}', 'rows': rows})
+    return entries
+
+
+def run(mode, entries, latency):
+    backend = FakeGoogleBackend(latency=latency)
+    gdoc = FakeDocsService(backend)
+    drive = FakeDriveService(backend)
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        # The pool is built once and kept in the state, so it is not part of the timing
+        backend.add_document('template', quote_document_blocks())
+        sizes = (1,) if mode in ('document studio', 'single template') else VARIANT_SIZES
+        variants = main.build_template_variants(drive, gdoc, 'template', sizes)
+    backend.calls.clear()
+
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        if mode == 'document studio':
+            for entry in entries:
+                backend.add_document(entry['Document ID'], quote_document_blocks())
+            documents = entries
+        else:
+            documents = main.copy_quote_documents(drive, entries, variants)
+        structure_cache = main.DocumentStructureCache() if mode == 'variants + cache' else None
+        report = main.generate_docs_for_grouped_quotes(documents, gdoc, drive, max_workers=8,
+                                                       structure_cache=structure_cache)
+    elapsed = time.perf_counter() - start
+
+    for entry in documents[:20]:
+        assert backend.documents[entry['Document ID']].table_values()[1:] == \
+            main.services_to_table_rows(entry['rows'])
+    structural = backend.total_calls('edit.insertTableRow') + backend.total_calls('edit.deleteTableRow')
+    return (elapsed, structural, backend.total_calls('edit.'), backend.total_calls('docs.get'),
+            len(report['succeeded']))
+
+
+def most_row_edits(entries, sizes):
+    """Largest number of row inserts/deletes a single quote needs with these variants."""
+    return max(abs(main.pick_template_variant(sizes, len(entry['rows'])) - len(entry['rows']))
+               for entry in entries)
+
+
+if __name__ == '__main__':
+    num_quotes = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+    latency = float(sys.argv[2]) if len(sys.argv) > 2 else 0.01
+    entries = make_entries(num_quotes)
+    total_services = sum(len(entry['rows']) for entry in entries)
+
+    print(f"{num_quotes} quotes, {total_services} services, {latency * 1000:.0f} ms per call, "
+          f"variants {VARIANT_SIZES}")
+    for mode, sizes in (('document studio', (1,)), ('single template', (1,)),
+                        ('pre-sized variants', VARIANT_SIZES), ('variants + cache', VARIANT_SIZES)):
+        elapsed, structural, edits, gets, succeeded = run(mode, entries, latency)
+        print(f"  {mode:<19} {elapsed:6.2f}s  {structural:5d} row inserts/deletes "
+              f"({structural / num_quotes:.2f} per doc, at most {most_row_edits(entries, sizes)})  "
+              f"{edits} edit requests  {gets} document reads  {succeeded} filled")
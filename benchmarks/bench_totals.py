@@ -0,0 +1,55 @@
+"""
+Compare Grand Total computation: float accumulation, batched Decimal, and the NumPy group-by.
+
+Usage: python -m benchmarks.bench_totals [num_rows]
+"""
+import sys
+import time
+from decimal import Decimal
+
+import main
+from benchmarks.synthetic import synthetic_quote_rows
+
+
+def float_totals(entries):
+    """The original approach: float accumulation, bad values silently dropped."""
+    sums = []
+    for entry in entries:
+        grand_total = 0.0
+        for service in entry['rows']:
+            try:
+                grand_total += float(service[main.SERVICE_TOTAL])
+            except ValueError:
+                pass
+        sums.append(grand_total)
+    return sums
+
+
+def timed(func):
+    start = time.perf_counter()
+    result = func()
+    return result, time.perf_counter() - start
+
+
+if __name__ == '__main__':
+    num_rows = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    rows = synthetic_quote_rows(num_rows, services_per_quote=50, manual_fraction=0)
+    entries = main.group_rows_by_quote_id(rows, rows[0])
+
+    floats, float_time = timed(lambda: float_totals(entries))
+    def batched_decimal():
+        main.compute_grand_totals(entries, use_numpy=False)
+        return [entry['Grand Total'] for entry in entries]
+
+    decimals, decimal_time = timed(batched_decimal)
+    numpy_sums, numpy_time = timed(lambda: main.numpy_grand_totals(entries))
+
+    drift = sum(1 for f, d in zip(floats, decimals) if Decimal(repr(f)) != d)
+    print(f"{num_rows} rows, {len(entries)} quotes")
+    print(f"  float     {float_time:6.3f}s  ({drift} quote(s) drift from the exact sum)")
+    print(f"  Decimal   {decimal_time:6.3f}s")
+    if numpy_sums is None:
+        print("  NumPy     not installed")
+    else:
+        assert numpy_sums == decimals
+        print(f"  NumPy     {numpy_time:6.3f}s")
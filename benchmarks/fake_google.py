@@ -0,0 +1,811 @@
+"""
+In-process fake of the Google Docs, Sheets and Drive APIs used by the benchmarks.
+
+Only the calls made by main.py are implemented. Every request sleeps for the
+configured latency before running, so concurrency effects are visible
+without touching the network. FakeTokenServer is a real local HTTP server
+for measuring the transport itself (connections and token fetches) and for
+serving the fake sheets and documents to clients that speak REST directly.
+"""
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import copy
+import email.parser
+import email.policy
+import json
+import os
+import random
+import re
+import socket
+import threading
+import time
+import urllib.parse
+
+import httplib2
+from googleapiclient.errors import HttpError
+
+
+# === DOCUMENT MODEL ===
+class _Text:
+    """A single text container: a body paragraph or the content of a table cell."""
+
+    def __init__(self, text=''):
+        self.text = text
+
+
+# Styles the real API returns with every paragraph, so payload sizes are realistic
+_TEXT_STYLE = {'weightedFontFamily': {'fontFamily': 'Arial', 'weight': 400},
+               'fontSize': {'magnitude': 11, 'unit': 'PT'}}
+_PARAGRAPH_STYLE = {'namedStyleType': 'NORMAL_TEXT', 'direction': 'LEFT_TO_RIGHT',
+                    'lineSpacing': 115, 'spaceAbove': {'unit': 'PT'}, 'spaceBelow': {'unit': 'PT'}}
+
+
+def _paragraph_elements(container, start):
+    """Render a text container as Docs paragraph elements starting at `start`."""
+    elements = []
+    index = start
+    for line in container.text.split('\n'):
+        end = index + len(line.encode('utf-16-le')) // 2 + 1
+        elements.append({
+            'startIndex': index,
+            'endIndex': end,
+            'paragraph': {
+                'elements': [{
+                    'startIndex': index,
+                    'endIndex': end,
+                    'textRun': {'content': line + '\n', 'textStyle': dict(_TEXT_STYLE)}
+                }],
+                'paragraphStyle': dict(_PARAGRAPH_STYLE)
+            }
+        })
+        index = end
+    return elements, index
+
+
+class FakeDocument:
+    """
+    A Google Doc made of body paragraphs and tables.
+
+    `blocks` is a list where each item is either a string (a paragraph) or a
+    list of rows, each row being a list of cell strings (a table). Indices count
+    UTF-16 code units, as in the real API.
+    """
+
+    def __init__(self, doc_id, blocks):
+        self.doc_id = doc_id
+        self.revision = 1
+        self.blocks = []
+        for block in blocks:
+            if isinstance(block, str):
+                self.blocks.append(_Text(block))
+            else:
+                self.blocks.append([[_Text(cell) for cell in row] for row in block])
+
+    # --- Rendering ---
+    def _layout(self):
+        """Return (kind, block, start, end) for each text container and table, plus the rendered content."""
+        content = [{'endIndex': 1, 'sectionBreak': {}}]
+        layout = []
+        index = 1
+        for block in self.blocks:
+            if isinstance(block, _Text):
+                elements, end = _paragraph_elements(block, index)
+                content.extend(elements)
+                layout.append(('text', block, index, end))
+                index = end
+                continue
+
+            table_start = index
+            index += 1
+            table_rows = []
+            for row in block:
+                row_start = index
+                index += 1
+                cells = []
+                for cell in row:
+                    cell_start = index
+                    elements, end = _paragraph_elements(cell, cell_start + 1)
+                    layout.append(('text', cell, cell_start + 1, end))
+                    cells.append({'startIndex': cell_start, 'endIndex': end, 'content': elements})
+                    index = end
+                table_rows.append({'startIndex': row_start, 'endIndex': index, 'tableCells': cells})
+            index += 1
+            content.append({
+                'startIndex': table_start,
+                'endIndex': index,
+                'table': {
+                    'rows': len(block),
+                    'columns': len(block[0]) if block else 0,
+                    'tableRows': table_rows
+                }
+            })
+            layout.append(('table', block, table_start, index))
+        return layout, content
+
+    def to_json(self):
+        _, content = self._layout()
+        return {
+            'documentId': self.doc_id,
+            'revisionId': f'rev-{self.revision}',
+            'body': {'content': content}
+        }
+
+    # --- Editing ---
+    def _find_text(self, index, end=None):
+        layout, _ = self._layout()
+        end = index if end is None else end
+        for kind, block, start, stop in layout:
+            # The trailing newline of a container can never be edited
+            if kind == 'text' and start <= index and end <= stop - 1:
+                return block, index - start
+        raise ValueError(f'Index {index} is not inside editable text.')
+
+    def _find_table(self, start_index):
+        layout, _ = self._layout()
+        for kind, block, start, _ in layout:
+            if kind == 'table' and start == start_index:
+                return block
+        raise ValueError(f'No table starts at index {start_index}.')
+
+    def apply(self, request):
+        if 'insertText' in request:
+            spec = request['insertText']
+            container, offset = self._find_text(spec['location']['index'])
+            text = container.text.encode('utf-16-le')
+            container.text = (text[:2 * offset] + spec['text'].encode('utf-16-le') + text[2 * offset:]).decode('utf-16-le')
+        elif 'deleteContentRange' in request:
+            spec = request['deleteContentRange']['range']
+            container, offset = self._find_text(spec['startIndex'], spec['endIndex'])
+            length = spec['endIndex'] - spec['startIndex']
+            text = container.text.encode('utf-16-le')
+            container.text = (text[:2 * offset] + text[2 * (offset + length):]).decode('utf-16-le')
+        elif 'insertTableRow' in request:
+            spec = request['insertTableRow']
+            location = spec['tableCellLocation']
+            table = self._find_table(location['tableStartLocation']['index'])
+            row_index = location['rowIndex'] + (1 if spec.get('insertBelow') else 0)
+            table.insert(row_index, [_Text() for _ in table[0]])
+        elif 'deleteTableRow' in request:
+            location = request['deleteTableRow']['tableCellLocation']
+            table = self._find_table(location['tableStartLocation']['index'])
+            del table[location['rowIndex']]
+        elif 'replaceAllText' in request:
+            spec = request['replaceAllText']
+            needle = spec['containsText']['text']
+            for kind, block, _, _ in self._layout()[0]:
+                if kind == 'text':
+                    block.text = block.text.replace(needle, spec['replaceText'])
+        else:
+            raise ValueError(f'Unsupported request: {sorted(request)}')
+
+    def paragraph_texts(self):
+        """Return the texts of the body paragraphs (outside tables), for checking results."""
+        return [block.text for block in self.blocks if isinstance(block, _Text)]
+
+    def table_values(self, table_index=0):
+        """Return the cell texts of a table, for checking results."""
+        tables = [block for block in self.blocks if isinstance(block, list)]
+        return [[cell.text for cell in row] for row in tables[table_index]]
+
+
+# === PARTIAL RESPONSES ===
+def parse_fields(mask):
+    """
+    Parse a partial-response mask such as 'revisionId,body.content(startIndex,table.rows)'
+    into a tree of nested dicts; None marks a field returned whole.
+    """
+    tree = {}
+    stack = [tree]
+    paths = [[]]  # Field names of the path being read, per nesting level
+    name = ''
+
+    def close_path():
+        nonlocal name
+        parts = paths[-1] + [name] if name else paths[-1]
+        node = stack[-1]
+        for part in parts[:-1]:
+            if part in node and node[part] is None:
+                break  # The whole field is already selected
+            node = node.setdefault(part, {})
+        else:
+            if parts:
+                node.setdefault(parts[-1], None)
+        paths[-1] = []
+        name = ''
+
+    for char in mask.replace(' ', ''):
+        if char in './':
+            paths[-1].append(name)
+            name = ''
+        elif char == '(':
+            parts = paths[-1] + [name]
+            node = stack[-1]
+            for part in parts:
+                if node.get(part) is None:
+                    node[part] = {}
+                node = node[part]
+            stack.append(node)
+            paths[-1] = []
+            paths.append([])
+            name = ''
+        elif char == ')':
+            close_path()
+            stack.pop()
+            paths.pop()
+        elif char == ',':
+            close_path()
+        else:
+            name += char
+    close_path()
+    return tree
+
+
+def _select(value, tree):
+    if tree is None:
+        return copy.deepcopy(value)
+    if isinstance(value, list):
+        return [_select(item, tree) for item in value]
+    if isinstance(value, dict):
+        return {key: _select(value[key], subtree) for key, subtree in tree.items() if key in value}
+    return value
+
+
+def apply_fields(response, fields):
+    """Return the part of `response` selected by a partial-response mask (all of it when None)."""
+    return _select(response, parse_fields(fields) if fields else None)
+
+
+# === FAKE BACKEND ===
+class FakeGoogleBackend:
+    """
+    Shared state behind the fake services: documents, latency and call counters.
+    A fraction `error_rate` of calls and of batched Drive sub-requests fails with 429.
+    With a main.RequestScheduler as `scheduler`, calls are retried by it like the ones
+    sent through PooledHttp; without one the 429 is raised as an HttpError.
+    """
+
+    def __init__(self, latency=0.0, error_rate=0.0, seed=0, scheduler=None):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.scheduler = scheduler
+        self.documents = {}
+        self.sheets = {}
+        self.permissions = {}
+        self.uploads = {}  # Files created by files().create (and updated by files().update), by ID
+        self.trashed = set()  # IDs of the files moved to the trash by files().update
+        self.calls = {}
+        self.first_calls = {}  # perf_counter() time of the first call of each name
+        self._lock = threading.Lock()
+        self._random = random.Random(seed)
+
+    def add_document(self, doc_id, blocks):
+        self.documents[doc_id] = FakeDocument(doc_id, blocks)
+        return self.documents[doc_id]
+
+    def add_sheet(self, title, rows, row_count=None):
+        """Add a sheet holding `rows`; its grid has at least 1000 rows like a new Google Sheet."""
+        self.sheets[title] = {'rows': [list(row) for row in rows],
+                              'row_count': row_count or max(len(rows), 1000)}
+        return self.sheets[title]
+
+    def count(self, name):
+        with self._lock:
+            self.calls[name] = self.calls.get(name, 0) + 1
+            self.first_calls.setdefault(name, time.perf_counter())
+
+    def total_calls(self, prefix=''):
+        return sum(n for name, n in self.calls.items() if name.startswith(prefix))
+
+    def should_fail(self):
+        with self._lock:
+            return self._random.random() < self.error_rate
+
+    def document(self, doc_id):
+        if doc_id not in self.documents:
+            raise HttpError(httplib2.Response({'status': 404}), b'{"error": {"message": "Not found"}}')
+        return self.documents[doc_id]
+
+
+_QUOTA_ERROR = b'{"error": {"code": 429, "message": "Quota exceeded"}}'
+
+
+class _FakeRequest:
+    def __init__(self, backend, name, func):
+        self._backend = backend
+        self._name = name
+        self._func = func
+
+    def _run(self):
+        time.sleep(self._backend.latency)
+        self._backend.count(self._name)
+        with self._backend._lock:
+            return self._func()
+
+    def _attempt(self):
+        """Send the request once, as (resp, result); an injected failure is a 429 response."""
+        if self._backend.should_fail():
+            time.sleep(self._backend.latency)
+            self._backend.count('errors')
+            return httplib2.Response({'status': 429}), _QUOTA_ERROR
+        return httplib2.Response({'status': 200}), self._run()
+
+    def execute(self, num_retries=0):
+        scheduler = self._backend.scheduler
+        if scheduler is None:
+            resp, content = self._attempt()
+        else:
+            resp, content = scheduler.call(self._name, self._attempt)
+        if resp.status >= 400:
+            raise HttpError(resp, content)
+        return content
+
+
+class _FakeDocuments:
+    def __init__(self, backend):
+        self._backend = backend
+
+    def get(self, documentId, fields=None, **kwargs):
+        return _FakeRequest(self._backend, 'docs.get',
+                            lambda: apply_fields(self._backend.document(documentId).to_json(), fields))
+
+    def batchUpdate(self, documentId, body):
+        def run():
+            document = self._backend.document(documentId)
+            blocks = copy.deepcopy(document.blocks)  # A failed batch changes nothing, as in the API
+            for request in body.get('requests', []):
+                # Already under the backend lock: count the request kind directly
+                kind = 'edit.' + next(iter(request))
+                self._backend.calls[kind] = self._backend.calls.get(kind, 0) + 1
+                try:
+                    document.apply(request)
+                except ValueError as e:
+                    document.blocks = blocks
+                    raise HttpError(httplib2.Response({'status': 400}),
+                                    json.dumps({'error': {'message': str(e)}}).encode('utf-8'))
+            document.revision += 1
+            return {'documentId': documentId, 'replies': [{} for _ in body.get('requests', [])]}
+        return _FakeRequest(self._backend, 'docs.batchUpdate', run)
+
+
+class FakeDocsService:
+    """Stands in for build('docs', 'v1', ...)."""
+
+    def __init__(self, backend):
+        self._backend = backend
+
+    def documents(self):
+        return _FakeDocuments(self._backend)
+
+
+_A1_RE = re.compile(r"^(?:'?(?P<title>[^!']+)'?!)?(?P<c1>[A-Z]+)(?P<r1>\d*)(?::(?P<c2>[A-Z]+)(?P<r2>\d*))?$")
+
+
+def _column_number(letters):
+    number = 0
+    for letter in letters:
+        number = number * 26 + ord(letter) - ord('A') + 1
+    return number
+
+
+def _parse_a1(range_name):
+    """Return (title, first column, first row, last column, last row) as 0-based, end-exclusive."""
+    match = _A1_RE.match(range_name)
+    if not match:
+        raise ValueError(f'Unsupported range: {range_name}')
+    c1 = _column_number(match['c1']) - 1
+    r1 = int(match['r1'] or 1) - 1
+    c2 = _column_number(match['c2'] or match['c1'])
+    r2 = int(match['r2']) if match['r2'] else None
+    if not match['c2'] and match['r1']:
+        r2 = r1 + 1
+    return match['title'], c1, r1, c2, r2
+
+
+def _trim(values):
+    """Drop trailing empty cells and rows, as the Sheets API does."""
+    rows = []
+    for row in values:
+        row = list(row)
+        while row and row[-1] == '':
+            row.pop()
+        rows.append(row)
+    while rows and not rows[-1]:
+        rows.pop()
+    return rows
+
+
+class _FakeValues:
+    def __init__(self, backend):
+        self._backend = backend
+
+    def _sheet(self, title):
+        if title not in self._backend.sheets:
+            raise HttpError(httplib2.Response({'status': 400}), b'{"error": {"message": "Unable to parse range"}}')
+        return self._backend.sheets[title]
+
+    def _read(self, range_name):
+        title, c1, r1, c2, r2 = _parse_a1(range_name)
+        rows = self._sheet(title)['rows'][r1:r2]
+        result = {'range': range_name, 'majorDimension': 'ROWS'}
+        values = _trim(row[c1:c2] for row in rows)
+        if values:
+            result['values'] = values
+        return result
+
+    def _write(self, range_name, values):
+        title, c1, r1, _, _ = _parse_a1(range_name)
+        sheet = self._sheet(title)
+        rows = sheet['rows']
+        for offset, values_row in enumerate(values):
+            while len(rows) <= r1 + offset:
+                rows.append([])
+            row = rows[r1 + offset]
+            row.extend([''] * (c1 + len(values_row) - len(row)))
+            row[c1:c1 + len(values_row)] = [str(v) if not isinstance(v, str) else v for v in values_row]
+        sheet['row_count'] = max(sheet['row_count'], len(rows))
+        return {'updatedRange': range_name, 'updatedRows': len(values)}
+
+    def _clear(self, range_name):
+        title, c1, r1, c2, r2 = _parse_a1(range_name)
+        for row in self._sheet(title)['rows'][r1:r2]:
+            for column in range(c1, min(c2, len(row))):
+                row[column] = ''
+        return range_name
+
+    def get(self, spreadsheetId, range, **kwargs):
+        return _FakeRequest(self._backend, 'sheets.values.get', lambda: self._read(range))
+
+    def batchGet(self, spreadsheetId, ranges, **kwargs):
+        return _FakeRequest(self._backend, 'sheets.values.batchGet',
+                            lambda: {'valueRanges': [self._read(r) for r in ranges]})
+
+    def update(self, spreadsheetId, range, body, valueInputOption='RAW', **kwargs):
+        return _FakeRequest(self._backend, 'sheets.values.update',
+                            lambda: self._write(range, body.get('values', [])))
+
+    def batchUpdate(self, spreadsheetId, body):
+        def run():
+            for data in body.get('data', []):
+                self._write(data['range'], data['values'])
+            return {'totalUpdatedRows': sum(len(d['values']) for d in body.get('data', []))}
+        return _FakeRequest(self._backend, 'sheets.values.batchUpdate', run)
+
+    def batchClear(self, spreadsheetId, body):
+        return _FakeRequest(self._backend, 'sheets.values.batchClear',
+                            lambda: {'clearedRanges': [self._clear(r) for r in body.get('ranges', [])]})
+
+
+class FakeSheetsService:
+    """Stands in for build('sheets', 'v4', ...).spreadsheets()."""
+
+    def __init__(self, backend):
+        self._backend = backend
+
+    def values(self):
+        return _FakeValues(self._backend)
+
+    def get(self, spreadsheetId, ranges=None, fields=None, **kwargs):
+        titles = {_parse_a1(r + '!A1' if '!' not in r else r)[0] for r in ranges or []}
+
+        def run():
+            return apply_fields({'sheets': [
+                {'properties': {'title': title,
+                                'gridProperties': {'rowCount': sheet['row_count'], 'columnCount': 26}}}
+                for title, sheet in self._backend.sheets.items() if not titles or title in titles
+            ]}, fields)
+        return _FakeRequest(self._backend, 'sheets.get', run)
+
+    def batchUpdate(self, spreadsheetId, body):
+        def run():
+            for request in body.get('requests', []):
+                title = request['addSheet']['properties']['title']
+                if title in self._backend.sheets:
+                    raise HttpError(httplib2.Response({'status': 400}),
+                                    b'{"error": {"message": "A sheet with this name already exists"}}')
+                self._backend.add_sheet(title, [])
+            return {'replies': [{} for _ in body.get('requests', [])]}
+        return _FakeRequest(self._backend, 'sheets.batchUpdate', run)
+
+
+class _FakeFiles:
+    def __init__(self, backend):
+        self._backend = backend
+
+    def copy(self, fileId, body, **kwargs):
+        def run():
+            source = self._backend.document(fileId)
+            new_id = f'{fileId}-copy-{len(self._backend.documents)}'
+            self._backend.documents[new_id] = copy.deepcopy(source)
+            self._backend.documents[new_id].doc_id = new_id
+            return {'id': new_id, 'name': body.get('name', '')}
+        return _FakeRequest(self._backend, 'drive.files.copy', run)
+
+    def create(self, body, media_body=None, **kwargs):
+        def run():
+            new_id = f"upload-{self._backend.calls['drive.files.create']}"  # Counted before it runs
+            self._backend.uploads[new_id] = {**body, 'size': media_body.size() if media_body else 0}
+            return {'id': new_id}
+        return _FakeRequest(self._backend, 'drive.files.create', run)
+
+    def update(self, fileId, body, media_body=None, **kwargs):
+        def run():
+            if fileId in self._backend.uploads:
+                self._backend.uploads[fileId].update(body, size=media_body.size() if media_body else 0)
+                return {'id': fileId}
+            self._backend.document(fileId)
+            if body.get('trashed'):
+                self._backend.trashed.add(fileId)
+            return {'id': fileId}
+        return _FakeRequest(self._backend, 'drive.files.update', run)
+
+
+class _FakePermissions:
+    def __init__(self, backend):
+        self._backend = backend
+
+    def create(self, fileId, body, **kwargs):
+        def run():
+            self._backend.document(fileId)
+            self._backend.permissions.setdefault(fileId, []).append(dict(body))
+            return {'id': f'perm-{len(self._backend.permissions[fileId])}'}
+        return _FakeRequest(self._backend, 'drive.permissions.create', run)
+
+
+class _FakeBatch:
+    """Mimics BatchHttpRequest: sub-requests run on their own, the batch is one round-trip."""
+
+    def __init__(self, backend, callback):
+        self._backend = backend
+        self._callback = callback
+        self._requests = []
+
+    def add(self, request, callback=None, request_id=None):
+        if len(self._requests) >= 1000:
+            raise ValueError('Exceeded maximum calls in a single batch')
+        self._requests.append((request, callback or self._callback, request_id))
+
+    def execute(self):
+        time.sleep(self._backend.latency)
+        self._backend.count('drive.batch')
+        for request, callback, request_id in self._requests:
+            self._backend.count(request._name)
+            response, exception = None, None
+            try:
+                if self._backend.should_fail():
+                    raise HttpError(httplib2.Response({'status': 429}),
+                                    b'{"error": {"message": "Rate limit exceeded"}}')
+                with self._backend._lock:
+                    response = request._func()
+            except HttpError as error:
+                exception = error
+            callback(request_id, response, exception)
+
+
+class FakeDriveService:
+    """Stands in for build('drive', 'v3', ...); files() and permissions() share the backend."""
+
+    def __init__(self, backend):
+        self._backend = backend
+
+    def files(self):
+        return _FakeFiles(self._backend)
+
+    def permissions(self):
+        return _FakePermissions(self._backend)
+
+    def new_batch_http_request(self, callback=None):
+        return _FakeBatch(self._backend, callback)
+
+
+# === SAMPLE DATA ===
+SERVICES_HEADER = ['Service Type', 'Language Pair', 'Modality', 'Word Count',
+                   'Duration (hrs)', 'Rate', 'Details', 'Total']
+
+
+def quote_document_blocks(data_rows=1, terms_paragraphs=1):
+    """
+    Layout of a Document Studio quote: header text, services table with `data_rows` empty
+    rows, and `terms_paragraphs` paragraphs of terms and conditions.
+    """
+    terms = ['Terms and conditions apply.'] + [
+        f'{i}. The client agrees that the services described above are delivered under the '
+        f'general terms of business in force on the date of this quote, clause {i}.'
+        for i in range(1, terms_paragraphs)
+    ]
+    return [
+        'Quote for {{Client Name}}',
+        'Date: {{Date}}',
+        [SERVICES_HEADER] + [[''] * len(SERVICES_HEADER) for _ in range(data_rows)],
+        'Grand Total: {{Grand Total}}',
+    ] + terms
+
+
+# === FAKE TOKEN / API SERVER ===
+class _TokenServerHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # Keep-alive, so connection reuse is measurable
+
+    def setup(self):
+        super().setup()
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.server.fake.count('connections')
+        time.sleep(self.server.fake.handshake_latency)  # Stands in for the TCP + TLS handshake
+
+    def log_message(self, format, *args):
+        pass
+
+    def _reply(self, payload):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _reply_error(self, status, body, retry_after=None):
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        if retry_after is not None:
+            self.send_header('Retry-After', str(retry_after))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        if self.path == '/token':
+            self.server.fake.count('token_fetches')
+            time.sleep(self.server.fake.token_latency)
+            self._reply({'access_token': f"token-{self.server.fake.calls['token_fetches']}",
+                         'expires_in': self.server.fake.token_lifetime, 'token_type': 'Bearer'})
+        elif self.path == '/batch/drive/v3':
+            self._handle_batch(body)
+        else:
+            self._handle('POST', json.loads(body) if body else {})
+
+    def do_GET(self):
+        self._handle('GET', None)
+
+    def _handle(self, method, body):
+        fake = self.server.fake
+        fake.count('api_calls')
+        if fake.should_fail():
+            time.sleep(fake.latency)
+            fake.count('errors')
+            self._reply_error(429, _QUOTA_ERROR, fake.retry_after)
+            return
+
+        request = _route_api_request(fake, method, self.path, body)
+        if request is None:
+            time.sleep(fake.latency)
+            self._reply({'path': self.path, 'authorization': self.headers.get('Authorization')})
+            return
+        try:
+            self._reply(request._run())  # Sleeps for the latency like the in-process fakes
+        except HttpError as e:
+            self._reply_error(e.resp.status, e.content)
+        except ValueError as e:
+            self._reply_error(400, json.dumps({'error': {'code': 400, 'message': str(e)}}).encode('utf-8'))
+
+    def _handle_batch(self, body):
+        """Answer a multipart/mixed Drive batch: each part is run like a call of its own."""
+        fake = self.server.fake
+        time.sleep(fake.latency)
+        fake.count('drive.batch')
+        message = email.parser.BytesParser(policy=email.policy.HTTP).parsebytes(
+            b'Content-Type: ' + self.headers['Content-Type'].encode('ascii') + b'\r\n\r\n' + body)
+        boundary = 'batch_response'
+        parts = []
+        for part in message.iter_parts():
+            head, part_body = re.split(r'\r?\n\r?\n', part.get_payload(), maxsplit=1)
+            method, path, _ = head.split(None, 2)
+            fake.record_authorization(re.search(r'(?im)^authorization: (.*)$', head).group(1).strip())
+            status, content = 200, None
+            try:
+                if fake.should_fail():
+                    fake.count('errors')
+                    status, content = 429, _QUOTA_ERROR
+                else:
+                    request = _route_api_request(fake, method, path, json.loads(part_body) if part_body.strip() else {})
+                    fake.count(request._name)
+                    with fake._lock:
+                        content = json.dumps(request._func()).encode('utf-8')
+            except HttpError as e:
+                status, content = e.resp.status, e.content
+            content_id = part['Content-ID'].strip()
+            parts.append(f'--{boundary}\r\nContent-Type: application/http\r\n'
+                         f'Content-ID: <response-{content_id[1:]}\r\n\r\n'
+                         f'HTTP/1.1 {status} {"OK" if status == 200 else "Error"}\r\n'
+                         f'Content-Type: application/json\r\n\r\n'.encode('utf-8') + content + b'\r\n')
+        reply = b''.join(parts) + f'--{boundary}--\r\n'.encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', f'multipart/mixed; boundary={boundary}')
+        self.send_header('Content-Length', str(len(reply)))
+        self.end_headers()
+        self.wfile.write(reply)
+
+
+# Sheets v4 and Docs v1 REST paths served by FakeTokenServer, as (method, pattern, handler)
+_API_ROUTES = [
+    ('GET', r'/v4/spreadsheets/([^/]+)',
+     lambda fake, query, body, sid: FakeSheetsService(fake).get(
+         sid, ranges=query.get('ranges'), fields=query.get('fields', [None])[0])),
+    ('GET', r'/v4/spreadsheets/([^/]+)/values:batchGet',
+     lambda fake, query, body, sid: FakeSheetsService(fake).values().batchGet(sid, ranges=query.get('ranges', []))),
+    ('GET', r'/v4/spreadsheets/([^/]+)/values/([^/]+)',
+     lambda fake, query, body, sid, range_name: FakeSheetsService(fake).values().get(sid, range=range_name)),
+    ('POST', r'/v4/spreadsheets/([^/]+)/values:batchUpdate',
+     lambda fake, query, body, sid: FakeSheetsService(fake).values().batchUpdate(sid, body=body)),
+    ('POST', r'/v4/spreadsheets/([^/]+)/values:batchClear',
+     lambda fake, query, body, sid: FakeSheetsService(fake).values().batchClear(sid, body=body)),
+    ('GET', r'/v1/documents/([^/:]+)',
+     lambda fake, query, body, doc_id: FakeDocsService(fake).documents().get(
+         doc_id, fields=query.get('fields', [None])[0])),
+    ('POST', r'/v1/documents/([^/:]+):batchUpdate',
+     lambda fake, query, body, doc_id: FakeDocsService(fake).documents().batchUpdate(doc_id, body=body)),
+    ('POST', r'/drive/v3/files/([^/]+)/copy',
+     lambda fake, query, body, file_id: FakeDriveService(fake).files().copy(file_id, body=body)),
+    ('POST', r'/drive/v3/files/([^/]+)/permissions',
+     lambda fake, query, body, file_id: FakeDriveService(fake).permissions().create(file_id, body=body)),
+]
+
+
+def _route_api_request(fake, method, path, body):
+    """Return the fake service request for a Sheets, Docs or Drive REST call, or None for other paths."""
+    parts = urllib.parse.urlsplit(path)
+    query = urllib.parse.parse_qs(parts.query)
+    for route_method, pattern, handler in _API_ROUTES:
+        match = re.fullmatch(pattern, parts.path)
+        if match and route_method == method:
+            return handler(fake, query, body, *map(urllib.parse.unquote, match.groups()))
+    return None
+
+
+class FakeTokenServer(FakeGoogleBackend):
+    """
+    Local HTTP server acting as the OAuth token endpoint (POST /token), as the Sheets v4
+    and Docs v1 REST APIs and the Drive v3 batch endpoint over the fake sheets and
+    documents it holds, and as a generic API endpoint (any other path). Counts
+    connections, token fetches and API calls, and records the access tokens that batched
+    sub-requests were sent with. A fraction `error_rate` of API calls is answered with
+    429, with an optional Retry-After header. Tokens expire after `token_lifetime` seconds.
+    """
+
+    def __init__(self, latency=0.0, handshake_latency=0.0, token_latency=0.0, error_rate=0.0,
+                 retry_after=None, seed=0, token_lifetime=3600):
+        super().__init__(latency, error_rate, seed)
+        self.handshake_latency = handshake_latency
+        self.token_latency = token_latency
+        self.retry_after = retry_after
+        self.token_lifetime = token_lifetime
+        self.authorizations = set()
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), _TokenServerHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.fake = self
+        self.url = f'http://127.0.0.1:{self.httpd.server_address[1]}'
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def record_authorization(self, header):
+        with self._lock:
+            self.authorizations.add(header)
+
+    def write_service_account_file(self, directory):
+        """Write a service account JSON whose token_uri points at this server."""
+        import rsa
+
+        _, private_key = rsa.newkeys(1024)
+        info = {
+            'type': 'service_account',
+            'project_id': 'fake-project',
+            'private_key_id': 'fake-key',
+            'private_key': private_key.save_pkcs1().decode('ascii'),
+            'client_email': 'quotes@fake-project.iam.gserviceaccount.com',
+            'client_id': '1',
+            'token_uri': f'{self.url}/token'
+        }
+        path = os.path.join(directory, 'fake-credentials.json')
+        with open(path, 'w') as f:
+            json.dump(info, f)
+        return path
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
@@ -0,0 +1,47 @@
+"""
+Synthetic 'Quotes' sheet generator shared by the benchmarks.
+"""
+import random
+
+
+QUOTES_HEADER = ['Quote ID', 'Date', 'Client Name', 'Email', 'Organization', 'Notes',
+                 'Service Type', 'Language Pair', 'Modality', 'Word Count', 'Duration (hrs)',
+                 'Rate', 'Details', 'Total', '[Document Studio] File Link #4zzo1e']
+
+SERVICE_TYPES = ['Translation', 'Interpretation', 'Proofreading', 'Transcription']
+LANGUAGE_PAIRS = ['English <> French', 'English <> Spanish', 'German <> English', 'Japanese <> English']
+MODALITIES = ['Remote', 'On-site', 'Written']
+
+
+def synthetic_quote_rows(num_rows, services_per_quote=3, manual_fraction=0.05, seed=0):
+    """
+    Return a Quotes sheet (header first) of `num_rows` service rows.
+
+    Consecutive rows share a Quote ID in runs of `services_per_quote`, and roughly
+    `manual_fraction` of the rows have 'Manual' as their Total, like the live sheet.
+    """
+    rng = random.Random(seed)
+    rows = [list(QUOTES_HEADER)]
+    for i in range(num_rows):
+        quote_number = i // services_per_quote
+        word_count = rng.randint(100, 5000)
+        rate = rng.choice([0.08, 0.10, 0.12, 0.15])
+        total = 'Manual' if rng.random() < manual_fraction else f'{word_count * rate:.2f}'
+        rows.append([
+            f'Q{quote_number:06d}',
+            f'2025-05-{quote_number % 28 + 1:02d}',
+            f'Client {quote_number}',
+            f'client{quote_number}@example.com',
+            f'Organization {quote_number % 97}',
+            'Rush delivery' if quote_number % 5 == 0 else '',
+            rng.choice(SERVICE_TYPES),
+            rng.choice(LANGUAGE_PAIRS),
+            rng.choice(MODALITIES),
+            str(word_count),
+            '',
+            str(rate),
+            f'Line item {i}',
+            total,
+            f'https://drive.google.com/open?id=doc-{quote_number}'
+        ])
+    return rows
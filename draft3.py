@@ -10,6 +10,8 @@ TEMPLATE_DOC_ID = '1IOjo6NyH7Q6W0Sgs_GoMX_QdhSlb7snFtOhnTynNFJs'
 NEW_DOC_NAME = 'Replicated Table Document'
 
 DUMMY_ROW = ['X'] * 8
+# Only the table and cell indices are read from the document
+TABLE_FIELDS = 'body.content(startIndex,table(tableRows(tableCells(startIndex,content(paragraph.elements.startIndex)))))'
 
 
 # === AUTHENTICATION ===
@@ -29,7 +31,7 @@ def copy_template(drive_service, template_id, new_name):
 
 # === Insert empty row after first data row ===
 def insert_empty_row_after(doc_id, docs_service, table_index=0, after_row=1):
-    doc = docs_service.documents().get(documentId=doc_id).execute()
+    doc = docs_service.documents().get(documentId=doc_id, fields='body.content(startIndex,table.rows)').execute()
     content = doc.get('body', {}).get('content', [])
 
     table_counter = 0
@@ -60,8 +62,8 @@ def insert_empty_row_after(doc_id, docs_service, table_index=0, after_row=1):
 
 # === FILL THE SECOND ROW (AFTER HEADER) ===
 def insert_row_with_same_value(doc_id, docs_service, value='X', table_index=0):
-    # Fetch the doc and locate the first table
-    doc = docs_service.documents().get(documentId=doc_id).execute()
+    # Fetch the tables of the doc (start and cell indices only) and locate the first one
+    doc = docs_service.documents().get(documentId=doc_id, fields=TABLE_FIELDS).execute()
     content = doc.get('body', {}).get('content', [])
 
     table = None
@@ -89,7 +91,7 @@ def insert_row_with_same_value(doc_id, docs_service, value='X', table_index=0):
     }).execute()
 
     # Step 2: Refresh doc to get the updated row
-    doc = docs_service.documents().get(documentId=doc_id).execute()
+    doc = docs_service.documents().get(documentId=doc_id, fields=TABLE_FIELDS).execute()
     table = doc['body']['content'][[i for i, el in enumerate(doc['body']['content']) if 'table' in el][table_index]]['table']
     new_row_cells = table['tableRows'][1]['tableCells']  # second row now
 
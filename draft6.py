@@ -1,5 +1,6 @@
 from googleapiclient.discovery import build
 from google.oauth2 import service_account
+from main import share_documents
 
 
 # Replace with your service account JSON key file and desired document ID
@@ -53,6 +54,7 @@ def share_documents_from_sheet(service_account_file, spreadsheet_id, range_name,
         print("No document links found.")
         return
 
+    doc_ids = []
     for row in values:
         if not row:
             continue
@@ -64,23 +66,7 @@ def share_documents_from_sheet(service_account_file, spreadsheet_id, range_name,
         else:
             print(f"Invalid URL format: {doc_url}")
             continue
+        doc_ids.append(doc_id)
 
-        # Build permission body
-        body = {
-            'type': 'anyone' if anyone else 'user',
-            'role': 'writer'
-        }
-        if email:
-            body['type'] = 'user'
-            body['emailAddress'] = email
-
-        # Share the doc
-        try:
-            drive_service.permissions().create(
-                fileId=doc_id,
-                body=body,
-                fields='id'
-            ).execute()
-            print(f"Shared: https://docs.google.com/document/d/{doc_id}")
-        except Exception as e:
-            print(f"Error sharing {doc_id}: {e}")
+    # Share the docs in batched requests (up to 100 per round-trip)
+    share_documents(drive_service, doc_ids, anyone=anyone, email=email)
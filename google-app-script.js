@@ -1,3 +1,11 @@
+// Name of the column holding the formatted services, and of the column right after it
+// holding a hash of the Services JSON each row was formatted from
+const FORMATTED_COLUMN_NAME = 'Formatted Services';
+const HASH_COLUMN_NAME = 'Services Hash';
+// Columns A to J belong to main.py: its GroupedQuotes header, then the Document Link of
+// --from-template. The columns above are added right of them.
+const PYTHON_COLUMNS = 10;
+
 function injectServicesColumn() {
   // Get the sheet named "GroupedQuotes"
   const sheet = SpreadsheetApp.getActiveSpreadsheet().getSheetByName('GroupedQuotes');
@@ -10,34 +18,75 @@ function injectServicesColumn() {
 
   // Find the index of the "Services" column
   const servicesColIndex = headers.indexOf('Services');
+  if (servicesColIndex === -1) {
+    Logger.log('No Services column in GroupedQuotes; nothing to format.');
+    return;
+  }
+
+  // Find the output columns by name, adding them right of main.py's columns the first time only
+  let formattedColIndex = headers.indexOf(FORMATTED_COLUMN_NAME);
+  if (formattedColIndex === -1) {
+    formattedColIndex = Math.max(headers.length, PYTHON_COLUMNS);
+    sheet.getRange(1, formattedColIndex + 1, 1, 2).setValues([[FORMATTED_COLUMN_NAME, HASH_COLUMN_NAME]]);
+  } else if (formattedColIndex < PYTHON_COLUMNS) {
+    throw new Error(`The "${FORMATTED_COLUMN_NAME}" column must be right of column J, which main.py writes: ` +
+                    'delete it and its hash column, then run again.');
+  } else if (headers[formattedColIndex + 1] !== HASH_COLUMN_NAME) {
+    throw new Error(`The "${HASH_COLUMN_NAME}" column must be right after "${FORMATTED_COLUMN_NAME}".`);
+  }
 
-  // Loop through each data row (skip the header)
+  // Build both output columns in memory, formatting only the rows whose JSON changed
+  const output = [];
+  let numChanged = 0;
   for (let i = 1; i < data.length; i++) {
     const row = data[i];
+    const rawJson = String(row[servicesColIndex]);
+    const hash = rawJson ? hashString(rawJson) : '';
 
-    // Get the raw JSON string from the "Services" cell
-    const rawJson = row[servicesColIndex];
+    // Same JSON as when this row was last formatted: keep its text
+    if (hash === row[formattedColIndex + 1]) {
+      output.push([row[formattedColIndex], hash]);
+      continue;
+    }
 
-    let parsedServices;
+    numChanged++;
+    if (!rawJson) {
+      output.push(['', '']);  // A row cleared by the Python script
+      continue;
+    }
     try {
-      // Try to parse the JSON string into an array of service objects
-      parsedServices = JSON.parse(rawJson);
+      output.push([formatServices(JSON.parse(rawJson)), hash]);
     } catch (e) {
-      // If it's not valid JSON, log a message and skip this row
+      // If it's not valid JSON, log a message and leave the row empty so the next run retries it
       Logger.log(`Invalid JSON in row ${i + 1}`);
-      continue;
+      output.push(['', '']);
     }
+  }
 
-    // Format the service data for display (e.g., one bullet per service)
-    const formatted = parsedServices.map(service => {
-      return `• ${service.Service_Type} | ${service.Language_Pair} | ${service.Modality} | ${service.Word_Count} words | ${service.Duration_hrs} hrs | ${service.Rate} USD | Total: ${service.Total} USD\n${service.Details}`;
-    }).join('\n\n'); // Separate services with two new lines
-
-    // Write the formatted text into a new column to the right of existing data
-    // If the sheet has N columns, this writes to column N+1
-    sheet.getRange(i + 1, headers.length + 1).setValue(formatted);
+  // Write the whole block with a single call, and nothing at all if no row changed
+  if (numChanged > 0) {
+    sheet.getRange(2, formattedColIndex + 1, output.length, 2).setValues(output);
   }
+  Logger.log(`Formatted ${numChanged} of ${output.length} row(s).`);
 
   // You can now add a marker like {{Formatted Services}} in your template
-  // and Document Studio will use the new column's content.
+  // and Document Studio will use the column's content.
+}
+
+// Format the service data for display (e.g., one bullet per service), as main.format_services_text
+function formatServices(services) {
+  return services.map(service => {
+    return `• ${service.Service_Type} | ${service.Language_Pair} | ${service.Modality} | ${service.Word_Count} words | ${service.Duration_hrs} hrs | ${service.Rate} USD | Total: ${service.Total} USD\n${service.Details}`;
+  }).join('\n\n'); // Separate services with two new lines
+}
+
+// 32-bit FNV-1a hash of a string; cheap enough to run on every row. The prefix keeps
+// Sheets from turning an all-digit hash into a number.
+function hashString(text) {
+  let hash = 0x811c9dc5;
+  for (let i = 0; i < text.length; i++) {
+    hash ^= text.charCodeAt(i);
+    hash = Math.imul(hash, 0x01000193);
+  }
+  return 'fnv1a:' + (hash >>> 0).toString(16).padStart(8, '0');
 }
@@ -1,7 +1,36 @@
-from googleapiclient.discovery import build  # Import the Google API client library to build service objects
+from googleapiclient.discovery import build_from_document  # Import the Google API client library to build service objects
+from googleapiclient.discovery_cache import get_static_doc
+from googleapiclient.errors import HttpError
+from googleapiclient.http import MediaFileUpload
 from google.oauth2 import service_account  # Import Google OAuth2 library to handle authentication
-from gdoctableapppy import gdoctableapp
+import google.auth.transport.requests
+from googleapiclient.version import __version__ as googleapiclient_version
+import httplib2
+import requests
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+from operator import itemgetter
+import argparse
+import contextlib
+import csv
+import functools
+import gc
+import hashlib
+import io
+import itertools
 import json
+import math
+import multiprocessing
+import os
+import re
+import sqlite3
+import email.utils
+import random
+import threading
+import time
+import urllib.parse
+import zipfile
+from xml.sax.saxutils import escape as xml_escape
 
 
 # === CONFIGURATION ===
@@ -14,37 +43,780 @@ SCOPES = [
 SPREADSHEET_ID_SOURCE = '1wiAQXkSvcOS8QdLeST2AmjsaV03_bS-1dIM3XpiNNq0'  # ID of the Google Sheet
 SPREADSHEET_ID_TARGET = ''
 TEMPLATE_DOC_ID = '18OVjzAQnTZKqhFmiaemIaHaw0QV7G8fPgMDGnwh-Wpg'
+# Empty service rows of the template variants used with --from-template. The copies of the
+# template pre-sized to these rows are made once by build_template_variants and kept in the state.
+TEMPLATE_VARIANT_SIZES = (1, 2, 4, 8, 16)
+COPY_NAME_FORMAT = 'Quote {Quote ID}'  # Name of each copied quote document, filled from its grouped entry
+# Grouped entry fields written into a template copy in place of their {{Field}} placeholder
+PLACEHOLDER_FIELDS = ['Quote ID', 'Date', 'Client Name', 'Email', 'Organization', 'Notes', 'Grand Total']
 RANGE_NAME = 'Quotes!A1:Z'  # Range of data to read from the sheet
+GROUPED_SERVICES_SHEET_NAME = 'GroupedServices'  # Sheet of one row per service written by --normalized
+DOCS_MAX_WORKERS = 8  # Number of quote documents filled concurrently (1 = one at a time)
+HTTP_POOL_SIZE = 16  # Keep-alive connections shared by all Google services (>= DOCS_MAX_WORKERS)
+HTTP_TIMEOUT = 120  # Seconds before an API request times out
+# Requests per minute allowed for one service account, after Google's default per-user quotas
+API_QUOTAS_PER_MINUTE = {
+    ('sheets', 'read'): 60,
+    ('sheets', 'write'): 60,
+    ('docs', 'read'): 300,
+    ('docs', 'write'): 60,
+    ('drive', 'read'): 12000,
+    ('drive', 'write'): 12000,
+}
+RATE_LIMIT_BURST_SECONDS = 10  # Seconds of quota that may be used at once after an idle period
+RETRY_STATUSES = (429, 500, 502, 503, 504)  # Responses retried with backoff
+RETRY_MAX_ATTEMPTS = 6  # Retries of one request before its error is raised
+RETRY_BASE_DELAY = 1.0  # Seconds before the first retry; doubled on each attempt
+RETRY_MAX_DELAY = 64.0  # Upper bound of a single backoff delay in seconds
+DRIVE_BATCH_SIZE = 100  # Calls per Drive HTTP batch request (Drive allows up to 100)
+DISCOVERY_CACHE_DIR = '.discovery-cache'  # Local copies of the Sheets/Docs/Drive discovery documents
+DISCOVERY_CACHE_TTL = 7 * 24 * 3600  # Seconds before a cached discovery document is fetched again
+DISCOVERY_FETCH_TIMEOUT = 10  # Seconds allowed for downloading a discovery document
+READ_CHUNK_ROWS = 5000  # Rows fetched per window when streaming the source sheet
+READ_WINDOWS_PER_CALL = 4  # Windows fetched together in one values().batchGet call
+WRITE_MAX_REQUEST_BYTES = 2000000  # Payload size limit of each GroupedQuotes values().batchUpdate call
+USE_NUMPY_TOTALS = False  # Sum Grand Totals with a NumPy group-by (optional dependency)
+STATE_DB_FILE = 'qas-state.db'  # Local SQLite store of the last processed content per Quote ID
+JOB_MAX_ATTEMPTS = 3  # Runs a quote document may fail in before it is moved to the dead-letter list
+RENDER_PROCESSES = None  # Processes writing the DOCX files of --render-docx (None = one per CPU)
+DRIVE_UPLOAD_FOLDER_ID = ''  # Drive folder receiving the files of --upload ('' = the account's My Drive)
+DRIVE_UPLOAD_CONVERT = True  # Convert the uploaded DOCX files to Google Docs
+# Credentials used by the worker processes of --shards, in turn; one file per shard spreads the quota
+SHARD_SERVICE_ACCOUNT_FILES = [SERVICE_ACCOUNT_FILE]
+
+
+# === INSTRUMENTATION - Timing spans of the pipeline stages and API calls ===
+PROFILE_PERCENTILES = (0.50, 0.95, 0.99)
+
+
+class Span:
+    """One timed operation: a pipeline stage, the fill of one quote or one API call."""
+
+    def __init__(self, name, attrs):
+        self.name = name
+        self.attrs = attrs
+        self.start = time.time()
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+
+class Tracer:
+    """
+    Collects the spans of a run as dicts with their 'name', 'start' (epoch seconds),
+    'duration', 'outcome' and attributes. Safe to use from several threads. The spans
+    can be written as a JSON-lines trace or as Prometheus text-format metrics, and
+    summarised per stage with print_profile. A tracer that is not `enabled` keeps
+    nothing, so a run that asked for none of these does not hold its spans in memory.
+    """
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self.spans = []
+        self._lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def span(self, name, **attrs):
+        """Time the body of the with statement; an exception sets outcome 'error'."""
+        span = Span(name, attrs)
+        started = time.perf_counter()
+        try:
+            yield span
+        except BaseException as e:
+            span.attrs.setdefault('outcome', 'error')
+            span.attrs.setdefault('error', type(e).__name__)
+            raise
+        finally:
+            self.record(name, time.perf_counter() - started, span.start, **span.attrs)
+
+    def record(self, name, duration, start=None, **attrs):
+        """Add a span measured by the caller."""
+        if not self.enabled:
+            return
+        span = {'name': name, 'start': start if start is not None else time.time() - duration,
+                'duration': duration, 'outcome': 'ok', **attrs}
+        with self._lock:
+            self.spans.append(span)
+
+    def extend(self, spans):
+        """Add the spans recorded by another process."""
+        if not self.enabled:
+            return
+        with self._lock:
+            self.spans.extend(spans)
+
+    def durations(self):
+        """Sorted span durations per stage; API calls are keyed by their bucket, e.g. 'api:docs.write'."""
+        stages = {}
+        with self._lock:
+            for span in self.spans:
+                stage = f"api:{span['api']}" if span['name'] == 'api' else span['name']
+                stages.setdefault(stage, []).append(span['duration'])
+        return {stage: sorted(values) for stage, values in stages.items()}
+
+    def write_jsonl(self, path):
+        with self._lock:
+            spans = list(self.spans)
+        with open(path, 'w', encoding='utf-8') as f:
+            for span in spans:
+                f.write(json.dumps(span) + '\n')
+        print(f"Trace of {len(spans)} span(s) written to '{path}'.")
+
+    def write_prometheus(self, path):
+        """Write the stage latencies and API call counters in the Prometheus text format."""
+        lines = ['# HELP qas_stage_duration_seconds Duration of the pipeline stages, quote fills and API calls.',
+                 '# TYPE qas_stage_duration_seconds summary']
+        for stage, values in sorted(self.durations().items()):
+            label = f'stage={json.dumps(stage)}'
+            for q in PROFILE_PERCENTILES:
+                lines.append(f'qas_stage_duration_seconds{{{label},quantile="{q}"}} {percentile(values, q):.6f}')
+            lines.append(f'qas_stage_duration_seconds_sum{{{label}}} {sum(values):.6f}')
+            lines.append(f'qas_stage_duration_seconds_count{{{label}}} {len(values)}')
+
+        calls, counters = {}, {}
+        with self._lock:
+            api_spans = [span for span in self.spans if span['name'] == 'api']
+        for span in api_spans:
+            key = (span['api'], span['outcome'])
+            calls[key] = calls.get(key, 0) + 1
+            totals = counters.setdefault(span['api'], {'retries': 0, 'request': 0, 'response': 0})
+            totals['retries'] += span.get('retries', 0)
+            totals['request'] += span.get('request_bytes', 0)
+            totals['response'] += span.get('response_bytes', 0)
+        lines += ['# HELP qas_api_requests_total API calls by quota bucket and outcome.',
+                  '# TYPE qas_api_requests_total counter']
+        lines += [f'qas_api_requests_total{{api={json.dumps(api)},outcome={json.dumps(outcome)}}} {n}'
+                  for (api, outcome), n in sorted(calls.items())]
+        lines += ['# HELP qas_api_retries_total Retries of API calls by quota bucket.',
+                  '# TYPE qas_api_retries_total counter']
+        lines += [f'qas_api_retries_total{{api={json.dumps(api)}}} {totals["retries"]}'
+                  for api, totals in sorted(counters.items())]
+        lines += ['# HELP qas_api_payload_bytes_total Bytes sent and received by API calls.',
+                  '# TYPE qas_api_payload_bytes_total counter']
+        lines += [f'qas_api_payload_bytes_total{{api={json.dumps(api)},direction="{direction}"}} {totals[direction]}'
+                  for api, totals in sorted(counters.items()) for direction in ('request', 'response')]
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write('\n'.join(lines) + '\n')
+        print(f"Metrics written to '{path}'.")
+
+    def print_profile(self):
+        """Print the count, p50/p95/p99, maximum and total latency of each stage."""
+        print(f"{'Stage':<24}{'count':>8}{'p50':>10}{'p95':>10}{'p99':>10}{'max':>10}{'total':>10}")
+        for stage, values in sorted(self.durations().items()):
+            quantiles = ''.join(f'{percentile(values, q):10.3f}' for q in PROFILE_PERCENTILES)
+            print(f"{stage:<24}{len(values):8d}{quantiles}{values[-1]:10.3f}{sum(values):10.3f}")
+
+
+class TimedRows:
+    """
+    Iterator over `rows` that records the time spent producing them (reading, not the
+    caller's work between rows) as one span, once they are exhausted.
+    """
+
+    def __init__(self, tracer, name, rows):
+        self.tracer = tracer
+        self.name = name
+        self.rows = iter(rows)
+        self.count = 0
+        self.seconds = 0.0
+        self.start = time.time()
+        self.done = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        started = time.perf_counter()
+        try:
+            row = next(self.rows)
+        except StopIteration:
+            if not self.done:
+                self.done = True
+                self.seconds += time.perf_counter() - started
+                self.tracer.record(self.name, self.seconds, self.start, rows=self.count)
+            raise
+        self.seconds += time.perf_counter() - started
+        self.count += 1
+        return row
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an ascending list."""
+    return sorted_values[max(0, math.ceil(fraction * len(sorted_values)) - 1)]
+
+
+def payload_bytes(body):
+    if body is None:
+        return 0
+    return len(body.encode('utf-8')) if isinstance(body, str) else len(body)
+
+
+TRACER = Tracer(enabled=False)  # Spans of this process's run; enabled by --trace, --metrics or --profile
+
+
+# === REQUEST SCHEDULING - Stay under the API quotas and retry throttled calls ===
+class TokenBucket:
+    """
+    Requests-per-minute limiter. Each request reserves a token; when none is left the
+    caller is told how long to wait for its turn. The rate is halved after a 429 and
+    grows back by 5% of the quota with every successful request.
+    """
+
+    def __init__(self, per_minute, burst_seconds=RATE_LIMIT_BURST_SECONDS):
+        self.max_rate = per_minute / 60
+        self.rate = self.max_rate
+        self.capacity = max(1.0, self.max_rate * burst_seconds)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def reserve(self, cost=1):
+        """Take `cost` tokens and return the number of seconds to wait before sending."""
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= cost
+        return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    def slow_down(self):
+        self.rate = max(self.max_rate / 60, self.rate / 2)
+
+    def speed_up(self):
+        self.rate = min(self.max_rate, self.rate + self.max_rate * 0.05)
+
+
+def api_bucket_key(uri, method):
+    """
+    Return the (api, 'read' | 'write') quota bucket of a request URI, e.g.
+    ('docs', 'write') for a documents().batchUpdate call.
+    """
+    parts = urllib.parse.urlsplit(uri)
+    host = parts.hostname or ''
+    if host.endswith('.googleapis.com') and not host.startswith('www.'):
+        api = host.split('.')[0]  # sheets.googleapis.com, docs.googleapis.com
+    else:
+        # www.googleapis.com/drive/v3/..., www.googleapis.com/batch/drive/v3, /upload/drive/v3/...
+        segments = [segment for segment in parts.path.split('/') if segment not in ('', 'batch', 'upload')]
+        api = segments[0] if segments else host
+    return api, 'read' if method.upper() == 'GET' else 'write'
+
+
+def request_cost(uri, body):
+    """Number of API requests a call counts for: one, or one per part of an HTTP batch."""
+    if '/batch/' not in uri or not body:
+        return 1
+    if isinstance(body, bytes):
+        body = body.decode('utf-8', 'replace')
+    return max(1, body.count('\nContent-ID: '))
+
+
+def retry_after_seconds(value):
+    """Parse a Retry-After header (seconds or HTTP date) into seconds, or None."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def jittered_backoff(attempt, base_delay=RETRY_BASE_DELAY, max_delay=RETRY_MAX_DELAY):
+    """Exponential backoff delay for a retry `attempt` (0-based), with the upper half jittered."""
+    delay = min(max_delay, base_delay * 2 ** attempt)
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+def is_retryable(resp, content):
+    """Throttling (429, or Drive's 403 rate limit reasons) and server errors are retried."""
+    if resp.status == 403:
+        return b'ratelimitexceeded' in (content or b'').lower()
+    return resp.status in RETRY_STATUSES
+
+
+class RequestScheduler:
+    """
+    Central gate for every outbound API call.
+
+    Calls wait for a token of their API's bucket (API_QUOTAS_PER_MINUTE) before being
+    sent. Throttled and failed calls are retried with jittered exponential backoff, or
+    after the delay given by a Retry-After header. Connection errors are only retried
+    for GET requests, as a write may have been applied. Counters are kept in `stats`.
+    """
+
+    def __init__(self, quotas=None, max_retries=RETRY_MAX_ATTEMPTS, base_delay=RETRY_BASE_DELAY,
+                 max_delay=RETRY_MAX_DELAY, burst_seconds=RATE_LIMIT_BURST_SECONDS):
+        quotas = API_QUOTAS_PER_MINUTE if quotas is None else quotas
+        self.buckets = {key: TokenBucket(per_minute, burst_seconds) for key, per_minute in quotas.items()}
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.queue_depth = 0
+        self.stats = {'requests': 0, 'retries': 0, 'throttled_requests': 0, 'throttle_seconds': 0.0,
+                      'backoff_seconds': 0.0, 'max_queue_depth': 0}
+        self._lock = threading.Lock()
+
+    def acquire(self, key, cost=1):
+        """Block until the bucket of `key` allows `cost` more requests."""
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            return
+        with self._lock:
+            wait = bucket.reserve(cost)
+            if wait > 0:
+                self.queue_depth += 1
+                self.stats['max_queue_depth'] = max(self.stats['max_queue_depth'], self.queue_depth)
+                self.stats['throttled_requests'] += 1
+                self.stats['throttle_seconds'] += wait
+        if wait > 0:
+            time.sleep(wait)
+            with self._lock:
+                self.queue_depth -= 1
+
+    def backoff_delay(self, attempt):
+        return jittered_backoff(attempt, self.base_delay, self.max_delay)
+
+    def call(self, key, send, idempotent=True, cost=1, span=None):
+        """
+        Run `send()` (returning (resp, content)) under the quota of `key`, retrying as needed.
+        The number of retries is set on `span` when given.
+        """
+        attempt = 0
+        while True:
+            self.acquire(key, cost)
+            with self._lock:
+                self.stats['requests'] += 1
+            try:
+                resp, content = send()
+            except (requests.ConnectionError, requests.Timeout):
+                if not idempotent or attempt >= self.max_retries:
+                    raise
+                delay = self.backoff_delay(attempt)
+            else:
+                bucket = self.buckets.get(key)
+                if not is_retryable(resp, content) or attempt >= self.max_retries:
+                    if bucket is not None and resp.status < 400:
+                        with self._lock:
+                            bucket.speed_up()
+                    return resp, content
+                if bucket is not None and resp.status in (403, 429):
+                    with self._lock:
+                        bucket.slow_down()
+                delay = retry_after_seconds(resp.get('retry-after'))
+                if delay is None:
+                    delay = self.backoff_delay(attempt)
+
+            with self._lock:
+                self.stats['retries'] += 1
+                self.stats['backoff_seconds'] += delay
+            if span is not None:
+                span.set(retries=attempt + 1)
+            time.sleep(delay)
+            attempt += 1
+
+
+def print_scheduler_report(scheduler):
+    print_request_stats(scheduler.stats)
+
+
+def print_request_stats(stats):
+    print(f"API requests: {stats['requests']} sent, {stats['retries']} retried, "
+          f"{stats['throttled_requests']} held back by quota for {stats['throttle_seconds']:.1f}s, "
+          f"{stats['backoff_seconds']:.1f}s of backoff, max queue depth {stats['max_queue_depth']}.")
 
 
 # === AUTHENTICATION ===
+class PooledHttp:
+    """
+    httplib2-compatible transport shared by the Sheets, Docs and Drive services.
+
+    Requests go through one requests session, whose connection pool keeps connections
+    alive between calls and is safe to use from several threads. The credentials are
+    refreshed under a lock, so concurrent callers share a single token fetch. Every
+    request is sent through the RequestScheduler for its quota and retries, and traced as
+    an 'api' span of TRACER.
+    """
+
+    def __init__(self, credentials, pool_size=HTTP_POOL_SIZE, timeout=HTTP_TIMEOUT, scheduler=None):
+        self.credentials = credentials
+        self.timeout = timeout
+        self.scheduler = scheduler or RequestScheduler()
+        self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=pool_size)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self._refresh_lock = threading.Lock()
+
+    def authorize(self, headers):
+        """Add a valid access token to `headers`, refreshing it once if it expired."""
+        with self._refresh_lock:
+            if not self.credentials.valid:
+                self.credentials.refresh(google.auth.transport.requests.Request(self.session))
+            self.credentials.apply(headers)
+
+    def send(self, uri, method='GET', body=None, headers=None, redirections=5):
+        """Send one request, without scheduling or retries."""
+        headers = dict(headers or {})
+        self.authorize(headers)
+        response = self.session.request(method, uri, data=body, headers=headers, timeout=self.timeout,
+                                        allow_redirects=redirections > 0)
+        info = dict(response.headers)
+        info['status'] = str(response.status_code)
+        resp = httplib2.Response(info)
+        resp.reason = response.reason
+        return resp, response.content
+
+    def execute_batch(self, batch):
+        """
+        Execute a googleapiclient BatchHttpRequest over this transport. The token is
+        refreshed here first, as googleapiclient would otherwise refresh an expired one
+        itself, on a new connection and outside the lock, once per batch.
+        """
+        self.authorize({})
+        return batch.execute(http=self)
+
+    def request(self, uri, method='GET', body=None, headers=None, redirections=5, connection_type=None):
+        key = api_bucket_key(uri, method)
+        with TRACER.span('api', api='.'.join(key), method=method, path=urllib.parse.urlsplit(uri).path,
+                         request_bytes=payload_bytes(body), retries=0) as span:
+            resp, content = self.scheduler.call(
+                key,
+                lambda: self.send(uri, method, body, headers, redirections),
+                idempotent=method.upper() == 'GET',
+                cost=request_cost(uri, body),
+                span=span
+            )
+            span.set(status=resp.status, response_bytes=len(content or b''),
+                     outcome='ok' if resp.status < 400 else 'error')
+        return resp, content
+
+
+_shared_http = {}
+_shared_http_lock = threading.Lock()
+
+
+def get_shared_http(service_account_file, scopes):
+    """
+    Return the PooledHttp for these credentials, loading the credentials file and
+    fetching a token only the first time.
+    """
+    key = (service_account_file, tuple(scopes))
+    with _shared_http_lock:
+        if key not in _shared_http:
+            credentials = service_account.Credentials.from_service_account_file(service_account_file, scopes=scopes)
+            http = PooledHttp(credentials)
+            http.authorize({})
+            _shared_http[key] = http
+        return _shared_http[key]
+
+
+_discovery_documents = {}
+
+
+def fetch_discovery_document(api, version):
+    """Download the current discovery document of an API, or return None if that fails."""
+    url = f"https://{api}.googleapis.com/$discovery/rest?version={version}"
+    try:
+        response = requests.get(url, timeout=DISCOVERY_FETCH_TIMEOUT)
+        response.raise_for_status()
+        return response.json()
+    except (requests.RequestException, ValueError) as e:
+        print(f"Could not fetch the {api} {version} discovery document: {e}")
+        return None
+
+
+def load_discovery_document(api, version, cache_dir=DISCOVERY_CACHE_DIR, ttl=DISCOVERY_CACHE_TTL):
+    """
+    Return the discovery document of an API as a dict, without network access when cached.
+
+    Documents are stored in `cache_dir` stamped with the google-api-python-client version
+    and the time they were cached, and reused until they are `ttl` seconds old or the
+    library is upgraded. A missing or expired document is fetched again; if the fetch
+    fails, the expired copy or else the document bundled with the library is used, and
+    the cache is left as it was so the next run tries again. A cache that cannot be
+    written is reported and skipped. Each document is only loaded once per process.
+    """
+    key = (api, version)
+    if key in _discovery_documents:
+        return _discovery_documents[key]
+
+    path = os.path.join(cache_dir, f"{api}.{version}.json")
+    cached = None
+    try:
+        with open(path, encoding='utf-8') as f:
+            cached = json.load(f)
+    except (OSError, ValueError):
+        pass  # No usable cache yet
+
+    if (cached and cached.get('clientVersion') == googleapiclient_version
+            and time.time() - cached.get('cachedAt', 0) < ttl):
+        document = cached['document']
+    else:
+        document = fetch_discovery_document(api, version)
+        if document is None:
+            document = cached['document'] if cached else json.loads(get_static_doc(api, version))
+        else:
+            write_discovery_cache(path, document)
+
+    _discovery_documents[key] = document
+    return document
+
+
+def write_discovery_cache(path, document):
+    """Store a fetched discovery document; a failure is reported and the run goes on without it."""
+    # Write to a temporary file first so a concurrent run never reads a partial document
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump({'clientVersion': googleapiclient_version, 'cachedAt': time.time(),
+                       'document': document}, f)
+        os.replace(temp_path, path)
+    except OSError as e:
+        print(f"Could not write the discovery cache '{path}': {e}")
+        with contextlib.suppress(OSError):
+            os.remove(temp_path)
+
+
+def build_service(api, version, http):
+    """Build an API service object from the cached discovery document."""
+    return build_from_document(load_discovery_document(api, version), http=http)
+
+
 def authenticate_gsheet(service_account_file, scopes):
-    credentials = service_account.Credentials.from_service_account_file(service_account_file, scopes=scopes)
-    return build('sheets', 'v4', credentials=credentials).spreadsheets()
+    return build_service('sheets', 'v4', get_shared_http(service_account_file, scopes)).spreadsheets()
 
 
 def authenticate_gdoc(service_account_file, scopes):
-    credentials = service_account.Credentials.from_service_account_file(service_account_file, scopes=scopes)
-    return build('docs', 'v1', credentials=credentials)
+    return build_service('docs', 'v1', get_shared_http(service_account_file, scopes))
 
 
 def authenticate_drive(service_account_file, scopes):
-    credentials = service_account.Credentials.from_service_account_file(service_account_file, scopes=scopes)
-    return build('drive', 'v3', credentials=credentials).files()
+    return build_service('drive', 'v3', get_shared_http(service_account_file, scopes))
+
+
+# === DRIVE BATCHES - Copy and share many files in few round-trips ===
+def execute_drive_batch(drive_service, request_factories, batch_size=DRIVE_BATCH_SIZE,
+                        max_retries=RETRY_MAX_ATTEMPTS):
+    """
+    Run Drive requests grouped in HTTP batch requests of at most `batch_size` calls.
+
+    `request_factories` maps a key of the caller's choice to a function building the
+    request, so a request can be built again for a retry. Each sub-request is handled on
+    its own: throttled or failed ones (see is_retryable) are retried together in a later
+    batch after a backoff, up to `max_retries` times.
+
+    Returns (results, errors): the responses and the HttpErrors, both keyed like the input.
+    """
+    results = {}
+    errors = {}
+    pending = list(request_factories)
+    http = getattr(drive_service, '_http', None)
+
+    for attempt in range(max_retries + 1):
+        retry = []
+        retry_after = 0.0
+
+        def callback(key, response, exception):
+            nonlocal retry_after
+            if exception is None:
+                results[key] = response
+                errors.pop(key, None)
+                return
+            errors[key] = exception
+            if isinstance(exception, HttpError) and is_retryable(exception.resp, exception.content):
+                retry.append(key)
+                retry_after = max(retry_after, retry_after_seconds(exception.resp.get('retry-after')) or 0.0)
+
+        for start in range(0, len(pending), batch_size):
+            batch = drive_service.new_batch_http_request(callback=callback)
+            for key in pending[start:start + batch_size]:
+                batch.add(request_factories[key](), request_id=key)
+            if isinstance(http, PooledHttp):
+                http.execute_batch(batch)
+            else:
+                batch.execute()
 
+        if not retry or attempt == max_retries:
+            break
+        time.sleep(max(retry_after, jittered_backoff(attempt)))
+        pending = retry
 
-# === COPY TEMPLATE ===
-def copy_template(drive_service, template_id, new_name):
-    copied = drive_service.files().copy(fileId=template_id, body={'name': new_name}).execute()
-    print(f"Copied template: {copied['name']}")
-    return copied['id']
+    return results, errors
+
+
+def permission_body(anyone=True, email=None):
+    """Writer permission for anyone with the link, or for one user when `email` is given."""
+    body = {
+        'type': 'anyone' if anyone else 'user',
+        'role': 'writer',
+    }
+    if email:
+        body['type'] = 'user'
+        body['emailAddress'] = email
+    return body
+
+
+def share_documents(drive_service, doc_ids, anyone=True, email=None, batch_size=DRIVE_BATCH_SIZE):
+    """
+    Grant writer access on every document in `doc_ids`, in batches.
+    Returns the IDs that could not be shared, mapped to their error.
+    """
+    body = permission_body(anyone, email)
+    results, errors = execute_drive_batch(
+        drive_service,
+        {
+            doc_id: (lambda doc_id=doc_id: drive_service.permissions().create(
+                fileId=doc_id, body=body, fields='id'))
+            for doc_id in doc_ids
+        },
+        batch_size
+    )
+    for doc_id, error in errors.items():
+        print(f"Error sharing {doc_id}: {error}")
+    print(f"Shared {len(results)} document(s).")
+    return errors
 
 
 # === STEP 1 - Fetch/Read the data from Quotes Spreadsheet ===
-def read_sheet_data(sheet, spreadsheet_id: str, range_name: str):
-    """Read data from the specified Google Sheet range."""
-    result = sheet.values().get(spreadsheetId=spreadsheet_id, range=range_name).execute()
-    return result.get('values', [])
+def split_a1_range(range_name):
+    """Split an A1 range like 'Quotes!A1:Z' into ('Quotes', 'A', 1, 'Z')."""
+    match = re.match(r"^(.+)!([A-Z]+)(\d*):([A-Z]+)\d*$", range_name)
+    if not match:
+        raise ValueError(f"Unsupported range: {range_name}")
+    sheet_name, first_col, first_row, last_col = match.groups()
+    return sheet_name, first_col, int(first_row or 1), last_col
+
+
+def iter_sheet_rows(sheet, spreadsheet_id, range_name, chunk_rows=READ_CHUNK_ROWS,
+                    windows_per_call=READ_WINDOWS_PER_CALL):
+    """
+    Yield the rows of a Google Sheet range lazily, one fixed-size window of rows at a time.
+
+    The grid size of the sheet is read first so an open-ended range such as 'Quotes!A1:Z'
+    can be split into windows, which are then fetched `windows_per_call` at a time with
+    values().batchGet. Only one batch of windows is held in memory. As with values().get,
+    blank rows at the end of the sheet are not yielded.
+    """
+    sheet_name = split_a1_range(range_name)[0]
+    metadata = sheet.get(
+        spreadsheetId=spreadsheet_id,
+        ranges=[sheet_name],
+        fields='sheets.properties.gridProperties.rowCount'
+    ).execute()
+    row_count = metadata['sheets'][0]['properties']['gridProperties']['rowCount']
+
+    windows = sheet_window_ranges(range_name, row_count, chunk_rows)
+    pending_blank = 0  # Blank rows are only yielded once a later row proves they are not trailing
+    for i in range(0, len(windows), windows_per_call):
+        result = sheet.values().batchGet(spreadsheetId=spreadsheet_id,
+                                         ranges=windows[i:i + windows_per_call]).execute()
+        for value_range in result.get('valueRanges', []):
+            rows, pending_blank = window_rows(value_range.get('values', []), chunk_rows, pending_blank)
+            yield from rows
+        del result  # Release this batch before the next one is fetched
+
+
+def sheet_window_ranges(range_name, row_count, chunk_rows):
+    """Split an open-ended A1 range into ranges of `chunk_rows` rows covering a grid of `row_count` rows."""
+    sheet_name, first_col, first_row, last_col = split_a1_range(range_name)
+    return [
+        f"{sheet_name}!{first_col}{start}:{last_col}{min(start + chunk_rows - 1, row_count)}"
+        for start in range(first_row, row_count + 1, chunk_rows)
+    ]
+
+
+def window_rows(values, chunk_rows, pending_blank):
+    """
+    Return the rows of one window and the number of blank rows still held back.
+    Blank rows are only returned once a later row proves they are not trailing.
+    """
+    rows = []
+    for row in values:
+        if row:
+            rows.extend(itertools.repeat([], pending_blank))
+            pending_blank = 0
+            rows.append(row)
+        else:
+            pending_blank += 1
+    return rows, pending_blank + chunk_rows - len(values)
+
+
+def cell_text(value):
+    """A value from a file export as the Sheets API would return it: a string, '' for nothing."""
+    if value is None:
+        return ''
+    if isinstance(value, bool):
+        return 'TRUE' if value else 'FALSE'
+    return value if isinstance(value, str) else str(value)
+
+
+def iter_csv_rows(path, encoding='utf-8-sig'):
+    """Yield the rows of a CSV export (header first), one line at a time."""
+    with open(path, newline='', encoding=encoding) as f:
+        yield from csv.reader(f)
+
+
+def iter_jsonl_rows(path):
+    """
+    Yield the rows of a JSON Lines export (header first), one line at a time.
+
+    Each line is either an object keyed by column name, the header being the keys of the
+    first object, or an array of cells, the first array being the header.
+    """
+    header = None
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if isinstance(record, dict):
+                if header is None:
+                    header = list(record)
+                    yield header
+                yield [cell_text(record.get(name)) for name in header]
+            else:
+                if header is None:
+                    header = [cell_text(value) for value in record]
+                    yield header
+                    continue
+                yield [cell_text(value) for value in record]
+
+
+def iter_parquet_rows(path, batch_rows=READ_CHUNK_ROWS):
+    """Yield the rows of a Parquet export (header first), `batch_rows` rows in memory at a time."""
+    try:
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise ImportError("Reading Parquet exports needs pyarrow (pip install pyarrow).") from e
+
+    parquet_file = pq.ParquetFile(path)
+    yield list(parquet_file.schema_arrow.names)
+    for batch in parquet_file.iter_batches(batch_size=batch_rows):
+        columns = [[cell_text(value) for value in column.to_pylist()] for column in batch.columns]
+        yield from map(list, zip(*columns))
+
+
+ROW_SOURCE_READERS = {
+    '.csv': iter_csv_rows,
+    '.jsonl': iter_jsonl_rows,
+    '.ndjson': iter_jsonl_rows,
+    '.parquet': iter_parquet_rows,
+}
+
+
+def iter_source_rows(path):
+    """
+    Stream the rows of a local quotes export (header first), in the same shape as
+    iter_sheet_rows, picking the reader from the file extension.
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension not in ROW_SOURCE_READERS:
+        raise ValueError(f"Unsupported export format '{extension}': use one of "
+                         f"{', '.join(sorted(ROW_SOURCE_READERS))}.")
+    return ROW_SOURCE_READERS[extension](path)
 
 
 def extract_drive_file_id(url):
@@ -55,95 +827,342 @@ def extract_drive_file_id(url):
 
 
 # === STEP 2 - Group the fetched data per Quote-ID ===
-def group_rows_by_quote_id(data, header):
-    """Group rows by Quote ID, skipping rows with Total == 'Manual' and removing empty groups."""
+# Source column of each field of a service row, in services table order
+SERVICE_COLUMNS = ['Service Type', 'Language Pair', 'Modality', 'Word Count', 'Duration (hrs)',
+                   'Rate', 'Details', 'Total']
+# Field names of a service row, as stored in the Services JSON of GroupedQuotes
+SERVICE_FIELDS = ['Service_Type', 'Language_Pair', 'Modality', 'Word_Count', 'Duration_hrs',
+                  'Rate', 'Details', 'Total']
+SERVICE_TOTAL = SERVICE_FIELDS.index('Total')
+# Currency symbols, codes and spaces allowed around amounts in the Total column
+MONEY_NOISE_RE = re.compile(r"[$€£¥\s]|\b(?:USD|EUR|GBP|CAD)\b")
+DECIMAL_COMMA_RE = re.compile(r"-?\d*,\d{1,2}")  # '12,50' or '1,5': the comma is the decimal separator
+THOUSANDS_COMMA_RE = re.compile(r"-?\d{1,3}(?:,\d{3})+")  # '1,234' or '12,345,678'
+CENT = Decimal('0.01')
+QUOTE_COLUMNS = ['Quote ID', 'Date', 'Client Name', 'Email', 'Organization', 'Notes',
+                 '[Document Studio] File Link #4zzo1e']
+
+
+def service_to_dict(service):
+    """Turn a service tuple from group_rows_by_quote_id into a dict keyed by SERVICE_FIELDS."""
+    return dict(zip(SERVICE_FIELDS, service))
+
+
+def parse_money(value):
+    """
+    Parse a money cell such as '1,234.50', '$ 99', '120 USD', '1.234,50' or '12,50' into a
+    Decimal. Returns None when the cell is not an amount, or when a lone comma is neither
+    a decimal comma (one or two digits after it) nor a thousands separator.
+    """
+    text = MONEY_NOISE_RE.sub('', str(value))
+    negative = text.startswith('(') and text.endswith(')')  # Accounting style negatives
+    if negative:
+        text = text[1:-1]
+    if ',' in text:
+        if '.' in text:
+            if text.rfind(',') > text.rfind('.'):
+                text = text.replace('.', '').replace(',', '.')  # Comma used as the decimal separator
+            else:
+                text = text.replace(',', '')  # Thousands separators
+        elif DECIMAL_COMMA_RE.fullmatch(text):
+            text = text.replace(',', '.')
+        elif THOUSANDS_COMMA_RE.fullmatch(text):
+            text = text.replace(',', '')
+        else:
+            return None
+    try:
+        amount = Decimal(text)
+    except InvalidOperation:
+        return None
+    if not amount.is_finite():
+        return None
+    return -amount if negative else amount
+
+
+def format_money(amount):
+    """Format a Decimal amount with two decimals, rounding halves up."""
+    return str(amount.quantize(CENT, rounding=ROUND_HALF_UP))
+
+
+def sum_service_totals(services, invalid=None):
+    """
+    Sum the Total of service tuples exactly, as a Decimal. Blank totals count as zero.
+    Totals that are not amounts are skipped and appended to the `invalid` list if given.
+    """
+    totals = [service[SERVICE_TOTAL] or '0' for service in services]
+
+    # Fast path: plain numbers only
+    try:
+        grand_total = sum(map(Decimal, totals), Decimal(0))
+        if grand_total.is_finite():
+            return grand_total
+    except InvalidOperation:
+        pass
+
+    grand_total = Decimal(0)
+    for total in totals:
+        amount = parse_money(total)
+        if amount is None:
+            if invalid is not None:
+                invalid.append(total)
+        else:
+            grand_total += amount
+    return grand_total
+
+
+def numpy_grand_totals(entries):
+    """
+    Per-quote sums of the service totals computed with a NumPy group-by in integer cents.
+
+    Returns the list of Decimal sums, or None when NumPy is not installed or when a total
+    is not a plain amount in whole cents, so the caller can use the Decimal path instead.
+    """
+    try:
+        import numpy as np
+    except ImportError:
+        return None
+
+    sizes = [len(entry['rows']) for entry in entries]
+    if not sizes or 0 in sizes:
+        return None
+    totals = (service[SERVICE_TOTAL] or '0' for entry in entries for service in entry['rows'])
+    try:
+        amounts = np.fromiter(map(float, totals), dtype=np.float64, count=sum(sizes))
+    except ValueError:
+        return None  # Currency symbols or bad values: let the Decimal path parse and report them
+
+    cents = np.rint(amounts * 100)
+    if not np.isfinite(amounts).all() or np.abs(amounts * 100 - cents).max() > 1e-6:
+        return None  # Not whole cents: only the Decimal path is exact
+
+    starts = np.concatenate(([0], np.cumsum(sizes)[:-1]))
+    sums = np.add.reduceat(cents.astype(np.int64), starts)
+    return [Decimal(total).scaleb(-2) for total in sums.tolist()]
+
+
+def compute_grand_totals(entries, invalid_totals=None, use_numpy=USE_NUMPY_TOTALS):
+    """
+    Set the 'Grand Total' of every grouped entry as an exact Decimal.
+
+    All totals are parsed in one batch and summed per quote. If any of them is not a plain
+    number, each quote is summed on its own with parse_money: the totals that still cannot
+    be parsed are left out and, when `invalid_totals` is a list, reported in it as
+    (Quote ID, value) pairs. `use_numpy` sums with numpy_grand_totals when possible.
+    """
+    grand_totals = numpy_grand_totals(entries) if use_numpy else None
+
+    if grand_totals is None:
+        totals = [service[SERVICE_TOTAL] or '0' for entry in entries for service in entry['rows']]
+        try:
+            amounts = iter(list(map(Decimal, totals)))
+            zero = Decimal(0)
+            grand_totals = [sum(itertools.islice(amounts, len(entry['rows'])), zero) for entry in entries]
+            if not all(grand_total.is_finite() for grand_total in grand_totals):
+                grand_totals = None
+        except InvalidOperation:
+            grand_totals = None
+
+    if grand_totals is not None:
+        for entry, grand_total in zip(entries, grand_totals):
+            entry['Grand Total'] = grand_total
+        return
+
+    for entry in entries:
+        invalid = []
+        entry['Grand Total'] = sum_service_totals(entry['rows'], invalid)
+        if invalid_totals is not None:
+            invalid_totals.extend((entry['Quote ID'], value) for value in invalid)
+
+
+@contextlib.contextmanager
+def gc_paused():
+    """
+    Pause the cyclic garbage collector. Grouping allocates a tuple per row and a dict per
+    quote but no reference cycles, and each automatic collection would rescan every row
+    read so far, which took about 40% of the grouping time.
+    """
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+
+@gc_paused()
+def group_rows_by_quote_id(data, header, invalid_totals=None):
+    """
+    Group rows by Quote ID, skipping rows with Total == 'Manual' and removing empty groups.
+
+    Column positions are resolved from the header once and every row is read by index;
+    the rows themselves are left untouched. Each service is stored as a tuple of its
+    fields in SERVICE_FIELDS order. Unparseable totals are reported in `invalid_totals`
+    (see compute_grand_totals).
+    """
     grouped = {}
 
-    for row in data[1:]:  # Skip header row
-        row += [''] * (len(header) - len(row))  # Pad short rows with empty strings
-        row_data = dict(zip(header, row))
-
-        quote_id = row_data.get("Quote ID", "").strip()
-        if not quote_id:
-            continue  # Skip rows without a Quote ID
-
-        # Extract document link and ID
-        doc_url = row_data.get("[Document Studio] File Link #4zzo1e", "").strip()
-        doc_id = extract_drive_file_id(doc_url)
-
-        # Initialize a new group if this Quote ID is new
-        if quote_id not in grouped:
-            grouped[quote_id] = {
-                'Quote ID': quote_id,
-                'Date': row_data.get('Date', ''),
-                'Client Name': row_data.get('Client Name', ''),
-                'Email': row_data.get('Email', ''),
-                'Organization': row_data.get('Organization', ''),
-                'Notes': row_data.get('Notes', ''),
-                'Document ID': doc_id,
-                'rows': [],  # Will hold valid service rows
-                'Grand Total': 0.0,
-                'Num Services': 0
-            }
+    # Resolve column positions once. A column missing from the header reads from a blank
+    # cell put right after the header's columns; cells of unlabeled columns past the header
+    # (Sheets drops blank trailing header cells) are cut off so they are never read instead.
+    positions = {name: index for index, name in enumerate(header)}
+    width = len(header)
+    missing = width
+    has_missing = any(name not in positions for name in SERVICE_COLUMNS + QUOTE_COLUMNS)
+    if has_missing:
+        width += 1
+    quote_id_col, date_col, client_col, email_col, org_col, notes_col, link_col = [
+        positions.get(name, missing) for name in QUOTE_COLUMNS
+    ]
+    total_col = positions.get('Total', missing)
+    service_cols = [positions.get(name, missing) for name in SERVICE_COLUMNS]
+    read_service = itemgetter(*service_cols)
+    padding = [''] * width
+    # Cells read from every row; the quote's own fields are only read when a quote starts,
+    # so rows missing only trailing cells past these (e.g. the File Link) need no copy
+    row_width = max(quote_id_col, total_col, *service_cols) + 1
 
-        # Skip this row if the Total field is 'Manual'
-        if row_data.get('Total', '').strip().lower() == 'manual':
+    last_raw_id = None
+    services = None
+    rows = iter(data)  # Works on a list or on a stream of rows such as iter_sheet_rows
+    next(rows, None)  # Skip header row
+    for row in rows:
+        # Padded copies of the rows; the input is not mutated
+        if has_missing:
+            row = row[:missing] + padding[min(len(row), missing):]
+        elif len(row) < row_width:
+            row = row + padding[len(row):]
+
+        # Rows of a quote are usually consecutive: only look the group up when the ID changes
+        raw_id = row[quote_id_col]
+        if raw_id != last_raw_id:
+            last_raw_id = raw_id
+            quote_id = raw_id.strip()
+            if not quote_id:
+                services = None  # Skip rows without a Quote ID
+                continue
+
+            # Initialize a new group if this Quote ID is new
+            entry = grouped.get(quote_id)
+            if entry is None:
+                cells = row if len(row) >= width else row + padding[len(row):]
+                entry = grouped[quote_id] = {
+                    'Quote ID': quote_id,
+                    'Date': cells[date_col],
+                    'Client Name': cells[client_col],
+                    'Email': cells[email_col],
+                    'Organization': cells[org_col],
+                    'Notes': cells[notes_col],
+                    'Document ID': extract_drive_file_id(cells[link_col].strip()),
+                    'rows': [],  # Will hold valid service rows
+                    'Grand Total': Decimal(0),
+                    'Num Services': 0
+                }
+            services = entry['rows']
+        elif services is None:
             continue
 
-        # Collect and normalize service data
-        service_data = {
-            'Service_Type': row_data.get('Service Type', ''),
-            'Language_Pair': row_data.get('Language Pair', ''),
-            'Modality': row_data.get('Modality', ''),
-            'Word_Count': row_data.get('Word Count', ''),
-            'Duration_hrs': row_data.get('Duration (hrs)', ''),
-            'Rate': row_data.get('Rate', ''),
-            'Details': row_data.get('Details', ''),
-            'Total': row_data.get('Total', '')
-        }
+        # Skip this row if the Total field is 'Manual'
+        total = row[total_col].strip()
+        if total.lower() == 'manual':
+            continue
 
         # Skip service rows where all fields are empty
-        if not any(str(value).strip() for value in service_data.values()):
+        service = read_service(row)
+        if not total and not ''.join(map(str, service)).strip():
             continue
 
-        # Add valid row to the group
-        grouped[quote_id]['rows'].append(service_data)
-        grouped[quote_id]['Num Services'] += 1
-
-        # Try adding the Total to the Grand Total
-        try:
-            grouped[quote_id]['Grand Total'] += float(row_data.get('Total', '0'))
-        except ValueError:
-            pass  # Ignore totals that are not numeric
+        services.append(service)
 
     # Remove groups that have no valid rows (i.e., only "Manual" rows were skipped)
-    return [entry for entry in grouped.values() if entry['rows']]
+    result = []
+    for entry in grouped.values():
+        if entry['rows']:
+            entry['Num Services'] = len(entry['rows'])
+            result.append(entry)
+
+    compute_grand_totals(result, invalid_totals)
+    return result
 
 
 # === STEP 3 - Write the grouped data to GroupedQuotes Spreadsheet ===
-def write_grouped_data(sheet, spreadsheet_id, target_sheet_name, grouped_data):
+# Header of the GroupedQuotes sheet
+GROUPED_HEADER = ['Quote ID', 'Date', 'Client Name', 'Email', 'Organization', 'Notes', 'Services',
+                  'Grand Total', 'Num Services']
+# Column J, right after the header, links each quote to its document with --from-template.
+# google-app-script.js keeps its own columns right of it.
+DOCUMENT_LINK_COLUMN = 'Document Link'
+# With --normalized, columns K and L hold the display text of the services and the hash of
+# the Services JSON it was made from, as injectServicesColumn writes them; services also
+# get their own sheet
+FORMATTED_SERVICES_COLUMN = 'Formatted Services'
+SERVICES_HASH_COLUMN = 'Services Hash'
+GROUPED_NORMALIZED_HEADER = GROUPED_HEADER + [DOCUMENT_LINK_COLUMN, FORMATTED_SERVICES_COLUMN, SERVICES_HASH_COLUMN]
+GROUPED_SERVICES_HEADER = ['Quote ID', 'Service #'] + SERVICE_COLUMNS
+
+
+def column_letter(number):
+    """Convert a 1-based column number to its A1 letters (1 -> 'A', 27 -> 'AA')."""
+    letters = ''
+    while number:
+        number, remainder = divmod(number - 1, 26)
+        letters = chr(ord('A') + remainder) + letters
+    return letters
+
+
+def valid_services(entry):
+    """The services of an entry, without those whose Total is 'Manual' (as a double safety check)."""
+    return [row for row in entry['rows'] if str(row[SERVICE_TOTAL]).strip().lower() != 'manual']
+
+
+def format_services_text(services):
+    """Display text of services, one bullet each, as injectServicesColumn formats them."""
+    return '\n\n'.join(
+        f"• {service['Service_Type']} | {service['Language_Pair']} | {service['Modality']} | "
+        f"{service['Word_Count']} words | {service['Duration_hrs']} hrs | {service['Rate']} USD | "
+        f"Total: {service['Total']} USD\n{service['Details']}"
+        for service in map(service_to_dict, services)
+    )
+
+
+def services_hash(services_json):
     """
-    Write grouped quotes to an existing sheet starting at cell A1,
-    ensuring that rows with 'Total' == 'Manual' are excluded.
+    Hash of a Services JSON cell as hashString in google-app-script.js computes it (32-bit
+    FNV-1a over UTF-16 code units), so the script finds rows written by --normalized done.
     """
+    value = 0x811c9dc5
+    for unit in memoryview(services_json.encode('utf-16-le')).cast('H'):
+        value = ((value ^ unit) * 0x01000193) & 0xFFFFFFFF
+    return f'fnv1a:{value:08x}'
 
-    # Define the header for the GroupedQuotes sheet
-    header = ['Quote ID', 'Date', 'Client Name', 'Email', 'Organization', 'Notes', 'Services',
-              'Grand Total', 'Num Services']
-    rows_to_write = [header]
 
-    for entry in grouped_data:
-        # Filter out any service rows where Total is 'Manual' (as a double safety check)
-        filtered_rows = [
-            row for row in entry['rows']
-            if str(row.get('Total', '')).strip().lower() != 'manual'
-        ]
+def document_link(doc_id):
+    """URL of a Google Doc."""
+    return f"https://docs.google.com/document/d/{doc_id}/edit"
+
+
+def build_grouped_rows(grouped_data, normalized=False, document_ids=None):
+    """
+    Build the GroupedQuotes rows (header first),
+    ensuring that rows with 'Total' == 'Manual' are excluded.
+    With `document_ids` (Quote ID -> document ID), the Document Link column J holds the
+    link of each quote's document. With `normalized`, columns K and L also hold the
+    display text of format_services_text and its services_hash, next to the Services JSON
+    (see build_grouped_service_rows).
+    """
+    if normalized:
+        rows_to_write = [GROUPED_NORMALIZED_HEADER]
+    else:
+        rows_to_write = [GROUPED_HEADER + [DOCUMENT_LINK_COLUMN] if document_ids is not None else GROUPED_HEADER]
 
+    for entry in grouped_data:
+        filtered_rows = valid_services(entry)
         if not filtered_rows:
             continue  # Skip this entry if it contains no valid rows
 
         # Convert the filtered service rows into a compact JSON string for storage
-        rows_json = json.dumps(filtered_rows, ensure_ascii=False, separators=(',', ':'))
+        rows_json = json.dumps([service_to_dict(row) for row in filtered_rows],
+                               ensure_ascii=False, separators=(',', ':'))
 
         # Add the processed entry to the output
         rows_to_write.append([
@@ -154,180 +1173,1424 @@ def write_grouped_data(sheet, spreadsheet_id, target_sheet_name, grouped_data):
             entry['Organization'],
             entry['Notes'],
             rows_json,
-            f"{entry['Grand Total']:.2f}",
+            format_money(entry['Grand Total']),
             entry['Num Services']
         ])
+        if document_ids is not None or normalized:
+            doc_id = (document_ids or {}).get(entry['Quote ID'])
+            rows_to_write[-1].append(document_link(doc_id) if doc_id else '')
+        if normalized:
+            rows_to_write[-1] += [format_services_text(filtered_rows), services_hash(rows_json)]
+
+    return rows_to_write
 
-    # Write all collected rows to the target sheet
-    sheet.values().update(
-        spreadsheetId=spreadsheet_id,
-        range=f"{target_sheet_name}!A1",
-        valueInputOption='RAW',
-        body={"values": rows_to_write}
-    ).execute()
 
-    print(f"Grouped data written to existing sheet '{target_sheet_name}'.")
+def build_grouped_service_rows(grouped_data):
+    """Build the GroupedServices rows (header first): one row per service, keyed by Quote ID."""
+    rows_to_write = [GROUPED_SERVICES_HEADER]
+    for entry in grouped_data:
+        rows_to_write.extend(
+            [entry['Quote ID'], number, *service]
+            for number, service in enumerate(valid_services(entry), start=1)
+        )
+    return rows_to_write
 
 
-# === STEP 4 - Generate the Quotes documents and add the right number of empty rows ===
-def insert_empty_row_after(doc_id, docs_service, entry, table_index=0, after_row=1):
+def row_as_read_back(row):
+    """A row as values().get would return it once written RAW: strings, trailing blanks dropped."""
+    cells = [str(cell) for cell in row]
+    while cells and cells[-1] == '':
+        cells.pop()
+    return cells
+
+
+def chunk_row_updates(sheet_name, changed_rows, num_columns, max_request_bytes):
     """
-    Inserts (number of services - 1) empty rows into the specified table of a Google Doc.
+    Group (row number, values) pairs into batchUpdate `data` lists of at most
+    `max_request_bytes` of JSON each. Consecutive rows share one range.
     """
-    num_services = len(entry.get('rows', []))
+    last_column = column_letter(num_columns)
+    chunks = []
+    data = []
+    size = 0
+    for row_number, values in changed_rows:
+        row_size = len(json.dumps(values, ensure_ascii=False)) + 1
+        if data and size + row_size > max_request_bytes:
+            chunks.append(data)
+            data, size = [], 0
 
-    # No need to insert if only one service (the template already includes one row)
-    if num_services <= 1:
-        return
+        previous = data[-1] if data else None
+        if previous and previous['end'] == row_number - 1:
+            previous['values'].append(values)
+            previous['end'] = row_number
+        else:
+            data.append({'start': row_number, 'end': row_number, 'values': [values]})
+            row_size += 50  # Range and keys of a new data entry
+        size += row_size
+    if data:
+        chunks.append(data)
+
+    return [
+        [
+            {'range': f"{sheet_name}!A{d['start']}:{last_column}{d['end']}", 'values': d['values']}
+            for d in chunk
+        ]
+        for chunk in chunks
+    ]
+
+
+def pack_row_updates(chunks, max_request_bytes):
+    """
+    Join batchUpdate `data` lists from chunk_row_updates, of one or several sheets, into as
+    few lists as fit in `max_request_bytes` of JSON each.
+    """
+    packed = []
+    size = 0
+    for data in chunks:
+        data_size = len(json.dumps(data, ensure_ascii=False))
+        if packed and size + data_size <= max_request_bytes:
+            packed[-1].extend(data)
+            size += data_size
+        else:
+            packed.append(list(data))
+            size = data_size
+    return packed
+
+
+def check_document_link_column(sheet_name, existing_header, header):
+    """
+    Raise a ValueError if the Document Link column is taken by another column, such as the
+    Formatted Services that an older google-app-script.js added right after the data.
+    """
+    index = header.index(DOCUMENT_LINK_COLUMN)
+    found = existing_header[index] if index < len(existing_header) else ''
+    if found not in ('', DOCUMENT_LINK_COLUMN):
+        raise ValueError(f"Column {column_letter(index + 1)} of '{sheet_name}' holds '{found}', where "
+                         f"main.py writes '{DOCUMENT_LINK_COLUMN}'. Delete that column and "
+                         f"run injectServicesColumn again: it now adds its columns right of it.")
+
+
+def add_missing_sheets(sheet, spreadsheet_id, titles):
+    """Add the sheets of `titles` the spreadsheet does not have, in one batchUpdate; returns their titles."""
+    spreadsheet = sheet.get(spreadsheetId=spreadsheet_id, fields='sheets.properties.title').execute()
+    existing = {s['properties']['title'] for s in spreadsheet.get('sheets', [])}
+    missing = [title for title in titles if title not in existing]
+    if missing:
+        sheet.batchUpdate(
+            spreadsheetId=spreadsheet_id,
+            body={'requests': [{'addSheet': {'properties': {'title': title}}} for title in missing]}
+        ).execute()
+        print(f"Added the missing sheet(s) {', '.join(missing)}.")
+    return missing
+
+
+def write_grouped_data(sheet, spreadsheet_id, target_sheet_name, grouped_data,
+                       max_request_bytes=WRITE_MAX_REQUEST_BYTES, services_sheet_name=None,
+                       document_ids=None):
+    """
+    Write grouped quotes to an existing sheet starting at cell A1,
+    ensuring that rows with 'Total' == 'Manual' are excluded.
+
+    The current content of the sheet is read first and compared row by row: only rows that
+    differ are sent, with values().batchUpdate requests of at most `max_request_bytes`,
+    and rows left over from a previous, longer run are cleared.
+
+    With a `services_sheet_name` the output is normalized: the display text of the services
+    is added next to their JSON, and that sheet, created if missing, gets one row per
+    service (build_grouped_service_rows). Both sheets are read with one batchGet and
+    written by the same batchUpdate requests. `document_ids` adds the Document Link
+    column (see build_grouped_rows).
+    """
+    sheets = [(target_sheet_name, build_grouped_rows(grouped_data, normalized=bool(services_sheet_name),
+                                                     document_ids=document_ids))]
+    if services_sheet_name:
+        sheets.append((services_sheet_name, build_grouped_service_rows(grouped_data)))
 
-    # Retrieve the document structure
-    doc = docs_service.documents().get(documentId=doc_id).execute()
-    content = doc.get('body', {}).get('content', [])
+    ranges = [f"{name}!A1:{column_letter(len(rows[0]))}" for name, rows in sheets]
+    try:
+        result = sheet.values().batchGet(spreadsheetId=spreadsheet_id, ranges=ranges).execute()
+    except HttpError as e:
+        # A range of a missing sheet cannot be parsed: add the sheet, then read again
+        if e.resp.status != 400 or not add_missing_sheets(sheet, spreadsheet_id, [name for name, _ in sheets]):
+            raise
+        result = sheet.values().batchGet(spreadsheetId=spreadsheet_id, ranges=ranges).execute()
 
-    # Locate the start index of the desired table
+    chunks, clear_ranges, written = [], [], []
+    for (name, rows_to_write), value_range in zip(sheets, result.get('valueRanges', [])):
+        existing = value_range.get('values', [])
+        if name == target_sheet_name and DOCUMENT_LINK_COLUMN in rows_to_write[0]:
+            check_document_link_column(name, existing[0] if existing else [], rows_to_write[0])
+        changed_rows = [
+            (number, row) for number, row in enumerate(rows_to_write, start=1)
+            if number > len(existing) or row_as_read_back(row) != existing[number - 1]
+        ]
+        chunks.extend(chunk_row_updates(name, changed_rows, len(rows_to_write[0]), max_request_bytes))
+
+        # Clear the rows of quotes (or services) that are gone
+        num_cleared = len(existing) - len(rows_to_write)
+        if num_cleared > 0:
+            clear_ranges.append(f"{name}!A{len(rows_to_write) + 1}:"
+                                f"{column_letter(len(rows_to_write[0]))}{len(existing)}")
+        written.append(f"'{name}': {len(changed_rows)} row(s) updated, {max(num_cleared, 0)} row(s) cleared")
+
+    requests = pack_row_updates(chunks, max_request_bytes)
+    for data in requests:
+        sheet.values().batchUpdate(
+            spreadsheetId=spreadsheet_id,
+            body={'valueInputOption': 'RAW', 'data': data}
+        ).execute()
+
+    if clear_ranges:
+        sheet.values().batchClear(
+            spreadsheetId=spreadsheet_id,
+            body={'ranges': clear_ranges}
+        ).execute()
+
+    print(f"Grouped data written to existing sheet(s) {'; '.join(written)}; "
+          f"{len(requests)} write request(s).")
+
+
+# === STEP 4 - Generate the Quotes documents and add the right number of empty rows ===
+# Partial-response masks for document reads: only the indices and cell texts of tables
+DOC_TABLE_FIELDS = ('body.content(startIndex,table(columns,tableRows(endIndex,'
+                    'tableCells(content(startIndex,paragraph.elements.textRun.content)))))')
+
+
+def find_table(content, table_index=0):
+    """Return the structural element of the table at `table_index` in a document body, or None."""
     table_counter = 0
     for element in content:
         if 'table' in element:
             if table_counter == table_index:
-                table_start_index = element['startIndex']
-                break
+                return element
             table_counter += 1
-    else:
-        print("Table not found.")
-        return
+    return None
 
-    # Prepare insertion requests for (num_services - 1) rows
-    requests = []
-    for i in range(num_services - 1):
-        requests.append({
-            'insertTableRow': {
-                'tableCellLocation': {
-                    'tableStartLocation': {'index': table_start_index},
-                    'rowIndex': after_row + i
-                },
-                'insertBelow': True
-            }
-        })
-
-    # Send requests to Google Docs API
-    if requests:
-        docs_service.documents().batchUpdate(
-            documentId=doc_id,
-            body={'requests': requests}
-        ).execute()
-        print(f"{len(requests)} empty row(s) inserted for Quote ID {entry['Quote ID']}.")
-    else:
-        print(f"No insert requests created for Quote ID {entry['Quote ID']}.")
+
+def read_cell_text(cell):
+    """Return the text of a table cell, without the newline that ends its last paragraph."""
+    text = ''.join(
+        element.get('textRun', {}).get('content', '')
+        for block in cell.get('content', [])
+        for element in block.get('paragraph', {}).get('elements', [])
+    )
+    return text[:-1] if text.endswith('\n') else text
 
 
-def fill_services_table(doc_id, creds, services, table_index=0, start_row=1, start_col=0):
+def utf16_length(text):
+    """Length of `text` in UTF-16 code units, the unit of Docs indices (an emoji counts twice)."""
+    return len(text.encode('utf-16-le')) // 2
+
+
+def build_services_table_requests(table_element, services, start_row=1, start_col=0):
     """
-    Fills the services table in a Google Doc using gdoctableapp.
+    Builds the batchUpdate requests that turn the data rows of a table into `services`.
 
-    Args:
-        doc_id (str): ID of the target Google Doc.
-        creds: Authenticated service account credentials.
-        services (list): A list of lists representing service rows.
-        table_index (int): Index of the table in the document (default: 0).
-        start_row (int): Row to start filling from (default: 1 = after header).
-        start_col (int): Column to start filling from (default: 0).
+    The table is diffed against the wanted values, so only what differs is sent and a
+    table that is already correct yields no request at all:
+    - missing rows are inserted, and surplus rows deleted, at the bottom of the table;
+    - cells whose text differs are cleared and rewritten.
+
+    Row changes come first and never move the rows kept above them. The indices of
+    inserted rows are computed locally: an inserted row takes one index for the row plus
+    two per empty cell (cell start and its paragraph newline). Cell edits are then sorted
+    from the highest index down, so no edit shifts one still to come.
     """
-    resource = {
-        "service_account": creds,
-        "documentId": doc_id,
-        "tableIndex": table_index,
-        "values": [
-            {
-                "values": services,
-                "range": {
-                    "startRowIndex": start_row,
-                    "startColumnIndex": start_col
+    table = table_element['table']
+    table_start_index = table_element['startIndex']
+    num_columns = table['columns']
+    table_rows = table['tableRows']
+    num_current = len(table_rows) - start_row
+    num_wanted = len(services)
+
+    # (content start index, current text) of every cell, as [row][column], from `start_row`
+    rows = [
+        [(cell['content'][0]['startIndex'], read_cell_text(cell)) for cell in row['tableCells']]
+        for row in table_rows[start_row:]
+    ]
+
+    requests = []
+    if num_wanted < num_current:
+        # Delete surplus rows from the bottom up so the remaining row indices stay valid
+        for row_index in range(len(table_rows) - 1, start_row + num_wanted - 1, -1):
+            requests.append({
+                'deleteTableRow': {
+                    'tableCellLocation': {
+                        'tableStartLocation': {'index': table_start_index},
+                        'rowIndex': row_index
+                    }
                 }
-            }
-        ]
-    }
+            })
+        rows = rows[:num_wanted]
+    elif num_wanted > num_current:
+        last_row = len(table_rows) - 1
+        row_length = 1 + 2 * num_columns
+        next_row_start = table_rows[last_row]['endIndex']
+        for i in range(num_wanted - num_current):
+            requests.append({
+                'insertTableRow': {
+                    'tableCellLocation': {
+                        'tableStartLocation': {'index': table_start_index},
+                        'rowIndex': last_row + i
+                    },
+                    'insertBelow': True
+                }
+            })
+            row_start = next_row_start + i * row_length
+            rows.append([(row_start + 2 + 2 * col, '') for col in range(num_columns)])
+
+    edits = []
+    for cells, values in zip(rows, services):
+        for col_offset, value in enumerate(values):
+            index, current = cells[start_col + col_offset]
+            wanted = str(value)
+            if current != wanted:
+                edits.append((index, current, wanted))
+
+    for index, current, wanted in sorted(edits, key=lambda edit: edit[0], reverse=True):
+        if current:
+            requests.append({
+                'deleteContentRange': {'range': {'startIndex': index, 'endIndex': index + utf16_length(current)}}
+            })
+        if wanted:  # The Docs API rejects empty insertText requests
+            requests.append({'insertText': {'location': {'index': index}, 'text': wanted}})
 
-    res = gdoctableapp.SetValues(resource)
-    print(f"Filled {len(services)} service row(s) in document {doc_id}.")
-    return res
+    return requests
 
 
-def generate_docs_for_grouped_quotes(grouped_data, gdoc, gdrive, creds):
+def populate_services_table(doc_id, docs_service, services, table_index=0, start_row=1, start_col=0,
+                            table=None, extra_requests=()):
+    """
+    Brings the services table in line with `services` with one get and at most one batchUpdate.
+    Running it again on an already filled document sends nothing.
+
+    When the table element is already known (see DocumentStructureCache), pass it as
+    `table` and the get is skipped. `extra_requests` that do not depend on indices, such
+    as the replaceAllText of placeholder_requests, are sent after the table edits in
+    the same batchUpdate.
+    """
+    if table is None:
+        doc = docs_service.documents().get(documentId=doc_id, fields=DOC_TABLE_FIELDS).execute()
+        table = find_table(doc.get('body', {}).get('content', []), table_index)
+        if table is None:
+            raise ValueError(f"Table {table_index} not found in document {doc_id}.")
+
+    requests = build_services_table_requests(table, services, start_row, start_col) + list(extra_requests)
+    if not requests:
+        print(f"Services table already up to date in document {doc_id}.")
+        return
+
+    docs_service.documents().batchUpdate(
+        documentId=doc_id,
+        body={'requests': requests}
+    ).execute()
+    print(f"Filled {len(services)} service row(s) in document {doc_id} ({len(requests)} change(s)).")
+
+
+def placeholder_requests(entry, fields=PLACEHOLDER_FIELDS):
+    """replaceAllText requests putting the fields of a grouped entry in place of their {{Field}} placeholder."""
+    values = {field: entry.get(field, '') for field in fields}
+    if 'Grand Total' in values:
+        values['Grand Total'] = format_money(Decimal(values['Grand Total'] or 0))
+    return [
+        {'replaceAllText': {'containsText': {'text': '{{' + field + '}}', 'matchCase': True},
+                            'replaceText': str(value)}}
+        for field, value in values.items()
+    ]
+
+
+def services_to_table_rows(rows):
+    """Transform the service tuples of a grouped entry into a list of lists, in table column order."""
+    return [list(service) for service in rows]
+
+
+def generate_doc_for_entry(entry, gdoc, structure_cache=None):
+    """
+    Inserts rows and fills the service table of a single Document Studio-generated doc.
+
+    A copy of a template (an entry marked 'From Template') also gets its header
+    placeholders replaced, in the same batchUpdate as the table. The table layout of a
+    new copy (an entry with a 'Template ID') comes from `structure_cache` when given, so
+    the document itself is not fetched. If the copy turns out not to match it, the layout
+    is dropped and the document is read instead.
+    """
+    doc_id = entry["Document ID"]
+    services = services_to_table_rows(entry["rows"])
+    extra_requests = placeholder_requests(entry) if entry.get("From Template") else ()
+
+    # # Share the document before modifying
+    # share_document(gdrive, doc_id)
+
+    table = None
+    if structure_cache is not None and entry.get("Template ID"):
+        table = structure_cache.table(gdoc, entry["Template ID"])
+
+    # Insert the correct number of rows and fill the service table in one round-trip
+    try:
+        populate_services_table(doc_id=doc_id, docs_service=gdoc, services=services, table=table,
+                                extra_requests=extra_requests)
+    except HttpError as e:
+        if table is None or e.resp.status != 400:
+            raise
+        print(f"Cached layout of template {entry['Template ID']} does not fit document {doc_id}; reading it.")
+        structure_cache.invalidate(entry["Template ID"])
+        populate_services_table(doc_id=doc_id, docs_service=gdoc, services=services,
+                                extra_requests=extra_requests)
+
+    print(f"Document filled: {document_link(doc_id)}")
+
+
+def print_generation_summary(report):
+    """Print how many quote documents succeeded, failed or were skipped."""
+    print(f"Documents generated: {len(report['succeeded'])} succeeded, "
+          f"{len(report['failed'])} failed, {len(report['skipped'])} skipped.")
+    for quote_id, error in report['failed'].items():
+        print(f"  Quote ID {quote_id} failed: {error}")
+
+
+def generate_docs_for_grouped_quotes(grouped_data, gdoc, gdrive, max_workers=1, structure_cache=None,
+                                     job_queue=None):
     """
     Opens each Document Studio-generated doc by its ID, inserts rows, and fills service table.
+
+    Quotes are processed by a pool of `max_workers` threads. A failure on one quote is
+    recorded and does not stop the others. Services built by authenticate_gdoc share a
+    thread-safe PooledHttp.
+    `structure_cache` is passed on to generate_doc_for_entry. With a `job_queue`, the state
+    of each quote's job is recorded as soon as it changes.
+
+    Returns a report dict with the 'succeeded', 'failed' (Quote ID -> error) and
+    'skipped' Quote IDs.
     """
+    report = {'succeeded': [], 'failed': {}, 'skipped': []}
+
+    def process(entry):
+        if job_queue is not None:
+            job_queue.start(entry['Quote ID'])
+        try:
+            with TRACER.span('fill', quote_id=entry['Quote ID']):
+                generate_doc_for_entry(entry, gdoc, structure_cache)
+        except Exception as e:
+            print(f"Failed to fill document for Quote ID {entry['Quote ID']}: {e}")
+            if job_queue is not None:
+                job_queue.fail(entry['Quote ID'], e)
+            return entry['Quote ID'], e
+        if job_queue is not None:
+            job_queue.finish(entry['Quote ID'])
+        return entry['Quote ID'], None
+
+    to_process = []
     for entry in grouped_data:
-        doc_id = entry.get("Document ID")
-        if not doc_id:
+        if not entry.get("Document ID"):
             print(f"Skipping Quote ID {entry['Quote ID']} (no doc ID found).")
+            report['skipped'].append(entry['Quote ID'])
+            if job_queue is not None:
+                job_queue.finish(entry['Quote ID'])  # Nothing to do for this quote
             continue
+        to_process.append(entry)
 
-        # # Share the document before modifying
-        # share_document(gdrive, doc_id)
-
-        # Step 1: Insert correct number of empty rows
-        insert_empty_row_after(doc_id, gdoc, entry)
-
-        # Step 2: Transform entry["rows"] into a list of lists
-        services = [
-            [
-                s.get('Service_Type', ''),
-                s.get('Language_Pair', ''),
-                s.get('Modality', ''),
-                s.get('Word_Count', ''),
-                s.get('Duration_hrs', ''),
-                s.get('Rate', ''),
-                s.get('Details', ''),
-                s.get('Total', '')
-            ]
-            for s in entry["rows"]
-        ]
+    if max_workers <= 1:
+        results = [process(entry) for entry in to_process]
+    else:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            results = list(executor.map(process, to_process))
 
-        # Step 3: Fill the service table
-        fill_services_table(
-            doc_id=doc_id,
-            creds=creds,
-            services=services
-        )
+    for quote_id, error in results:
+        if error is None:
+            report['succeeded'].append(quote_id)
+        else:
+            report['failed'][quote_id] = str(error)
+
+    print_generation_summary(report)
+    return report
+
+
+# === TEMPLATE VARIANTS - Copy the template whose table already has the right size ===
+def pick_template_variant(variants, num_rows):
+    """
+    Return the row count of the variant needing the fewest row inserts or deletes to hold
+    `num_rows` services. On a tie the larger variant wins, as deleting rows is cheaper.
+    """
+    return min(variants, key=lambda size: (abs(size - num_rows), -size))
 
-        print(f"Document filled: https://docs.google.com/document/d/{doc_id}")
 
+def build_template_variants(drive_service, docs_service, template_id=TEMPLATE_DOC_ID,
+                            sizes=TEMPLATE_VARIANT_SIZES, built=None, batch_size=DRIVE_BATCH_SIZE):
+    """
+    Return the pool of template variants, as {empty service rows: document ID}.
+
+    `built` is the pool of an earlier run (see load_template_variants); only the sizes it
+    lacks are made, by copying the template and growing or shrinking its services table
+    to that many empty rows. The template itself stands for the size it already has.
+    """
+    variants = dict(built or {})
+    if all(size in variants for size in sizes) and template_id in variants.values():
+        return variants
 
-def main():
-    # Step 1: Authenticate all Google services
-    sheet = authenticate_gsheet(SERVICE_ACCOUNT_FILE, SCOPES)
-    gdoc = authenticate_gdoc(SERVICE_ACCOUNT_FILE, SCOPES)
-    gdrive = authenticate_drive(SERVICE_ACCOUNT_FILE, SCOPES)
+    doc = docs_service.documents().get(documentId=template_id, fields=DOC_TABLE_FIELDS).execute()
+    table = find_table(doc.get('body', {}).get('content', []))
+    if table is None:
+        raise ValueError(f"Table 0 not found in template {template_id}.")
+    variants[len(table['table']['tableRows']) - 1] = template_id
+    missing = [size for size in sizes if size not in variants]
+    if not missing:
+        return variants
 
-    # Step 2: Create credentials object for gdoctableapp
-    creds = service_account.Credentials.from_service_account_file(
-        SERVICE_ACCOUNT_FILE, scopes=SCOPES
+    results, errors = execute_drive_batch(
+        drive_service,
+        {
+            size: (lambda size=size: drive_service.files().copy(
+                fileId=template_id, body={'name': f'Quote template ({size} rows)'}, fields='id'))
+            for size in missing
+        },
+        batch_size
     )
+    for size, error in errors.items():
+        print(f"Could not copy the template for the {size}-row variant: {error}")
+    for size, created in results.items():
+        blank_rows = [[''] * table['table']['columns'] for _ in range(size)]
+        try:
+            populate_services_table(created['id'], docs_service, blank_rows)
+        except (HttpError, ValueError) as e:
+            print(f"Could not size the {size}-row template variant {created['id']}: {e}")
+            continue
+        variants[size] = created['id']
+    print(f"Template variants: {len(variants)} size(s), {len(results) - len(errors)} new.")
+    return variants
 
-    # Step 3: Read data from the source spreadsheet
-    values = read_sheet_data(sheet, SPREADSHEET_ID_SOURCE, RANGE_NAME)
-    if not values:
-        print("No data found in the source sheet.")
-        return
 
-    # Step 4: Group the rows by Quote ID
-    header = values[0]
-    grouped_data = group_rows_by_quote_id(values, header)
+def placeholders_hash(entry, fields=PLACEHOLDER_FIELDS):
+    """Hash of the values the placeholders of an entry's template copy are replaced with."""
+    return hash_grouped_entry({field: entry.get(field, '') for field in fields})
+
+
+def copy_quote_documents(drive_service, entries, variants=None,
+                         name_format=COPY_NAME_FORMAT, batch_size=DRIVE_BATCH_SIZE, copied=None):
+    """
+    Copy, for each grouped entry, the template variant closest to its number of services,
+    so filling the table afterwards needs few or no structural edits. `variants` is the
+    pool of build_template_variants; without it the template alone is copied.
+
+    `copied` maps Quote IDs to the (document ID, placeholders_hash) of their earlier copy
+    (see load_quote_documents). That document is filled again, through the table diff,
+    as long as the placeholder values are the same; otherwise it is replaced by a new
+    copy and moved to the Drive trash.
 
-    write_grouped_data(
-        sheet=sheet,
-        spreadsheet_id=SPREADSHEET_ID_SOURCE,
-        target_sheet_name="GroupedQuotes",
-        grouped_data=grouped_data
+    Returns copies of the entries whose 'Document ID' points at their document, all marked
+    'From Template'; new copies also get the 'Template ID' they were copied from. Entries
+    whose copy failed are reported and left out.
+    """
+    variants = variants or {1: TEMPLATE_DOC_ID}
+    copied = copied or {}
+    documents = {}
+    to_copy = []
+    for entry in entries:
+        document_id, values_hash = copied.get(entry['Quote ID'], (None, None))
+        if document_id and values_hash == placeholders_hash(entry):
+            documents[entry['Quote ID']] = {**entry, 'Document ID': document_id, 'From Template': True}
+        else:
+            to_copy.append(entry)
+
+    sizes = {entry['Quote ID']: pick_template_variant(variants, len(entry['rows'])) for entry in to_copy}
+    results, errors = execute_drive_batch(
+        drive_service,
+        {
+            entry['Quote ID']: (lambda entry=entry: drive_service.files().copy(
+                fileId=variants[sizes[entry['Quote ID']]],
+                body={'name': name_format.format(**entry)},
+                fields='id'))
+            for entry in to_copy
+        },
+        batch_size
     )
+    for quote_id, error in errors.items():
+        print(f"Could not copy a template for Quote ID {quote_id}: {error}")
+    for entry in to_copy:
+        if entry['Quote ID'] in results:
+            documents[entry['Quote ID']] = {**entry, 'Document ID': results[entry['Quote ID']]['id'],
+                                            'Template ID': variants[sizes[entry['Quote ID']]],
+                                            'From Template': True}
+
+    used = {}
+    for size in sizes.values():
+        used[size] = used.get(size, 0) + 1
+    print(f"Copied {len(results)} template(s)" +
+          "".join(f", {count} with {size} row(s)" for size, count in sorted(used.items())) +
+          f"; {len(entries) - len(to_copy)} earlier copy(ies) reused.")
+
+    # The earlier copies of quotes whose header changed: their placeholders are gone
+    replaced = [copied[quote_id][0] for quote_id in results if quote_id in copied]
+    if replaced:
+        _, trash_errors = execute_drive_batch(
+            drive_service,
+            {
+                document_id: (lambda document_id=document_id: drive_service.files().update(
+                    fileId=document_id, body={'trashed': True}, fields='id'))
+                for document_id in replaced
+            },
+            batch_size
+        )
+        for document_id, error in trash_errors.items():
+            print(f"Could not move replaced document {document_id} to the trash: {error}")
+        print(f"Moved {len(replaced) - len(trash_errors)} replaced document(s) to the trash.")
+
+    return [documents[entry['Quote ID']] for entry in entries if entry['Quote ID'] in documents]
+
+
+class DocumentStructureCache:
+    """
+    Services table layouts of template documents, keyed by (template ID, revisionId).
+
+    A fresh copy of a template has the same layout as the template, so its table start
+    index and cell indices can be taken from here instead of fetching the copy. The
+    template's revisionId is checked the first time it is asked for (and again after
+    invalidate); a new revision means the layout is read again.
+    """
+
+    def __init__(self, table_index=0):
+        self.table_index = table_index
+        self.tables = {}
+        self.revisions = {}
+        self.stats = {'hits': 0, 'misses': 0, 'invalidations': 0}
+        self._lock = threading.Lock()
+
+    def table(self, docs_service, template_id):
+        """Return the table element of `template_id`, reading the template only when needed."""
+        with self._lock:
+            revision = self.revisions.get(template_id)
+            if revision is None:
+                doc = docs_service.documents().get(documentId=template_id, fields='revisionId').execute()
+                revision = self.revisions[template_id] = doc['revisionId']
+
+            key = (template_id, revision)
+            if key in self.tables:
+                self.stats['hits'] += 1
+                return self.tables[key]
+
+            self.stats['misses'] += 1
+            doc = docs_service.documents().get(documentId=template_id,
+                                               fields='revisionId,' + DOC_TABLE_FIELDS).execute()
+            table = find_table(doc.get('body', {}).get('content', []), self.table_index)
+            if table is None:
+                raise ValueError(f"Table {self.table_index} not found in template {template_id}.")
+            self.revisions[template_id] = doc['revisionId']
+            self.tables[(template_id, doc['revisionId'])] = table
+            return table
 
-    # Step 5: Generate quote documents from grouped data
-    generate_docs_for_grouped_quotes(
-        grouped_data=grouped_data,
+    def invalidate(self, template_id):
+        """Forget the layouts of `template_id` so its revision is checked again."""
+        with self._lock:
+            self.revisions.pop(template_id, None)
+            for key in [key for key in self.tables if key[0] == template_id]:
+                del self.tables[key]
+            self.stats['invalidations'] += 1
+
+
+# === SHARDED RUNS - Spread a large backlog over several processes ===
+def shard_of(quote_id, num_shards):
+    """
+    Shard number of a Quote ID. Based on a SHA-256 of the ID, so a quote stays in the same
+    shard from one run (and one machine) to the next and a failed shard can be re-run alone.
+    """
+    return int(hashlib.sha256(quote_id.encode('utf-8')).hexdigest()[:12], 16) % num_shards
+
+
+def run_shard(shard, entries, service_account_file, scopes, max_workers,
+              gdoc_builder=None, use_structure_cache=False, job_db_file=None, trace=False):
+    """
+    Fill the documents of one shard; runs in a worker process with its own credentials.
+    `gdoc_builder(service_account_file, scopes)` builds the Docs service (authenticate_gdoc
+    by default). Job states go to the JobQueue at `job_db_file` when given.
+    Returns the shard number, its report (with the worker's trace under 'spans', when
+    `trace` is set) and its request counters.
+    """
+    TRACER.enabled = trace
+    # A worker process may run several shards: only this shard's spans are sent back
+    first_span = len(TRACER.spans)
+    gdoc = (gdoc_builder or authenticate_gdoc)(service_account_file, scopes)
+    job_queue = JobQueue(job_db_file) if job_db_file else None
+    print(f"Shard {shard}: {len(entries)} quote(s) with {service_account_file}.")
+    report = generate_docs_for_grouped_quotes(
+        grouped_data=entries,
         gdoc=gdoc,
-        gdrive=gdrive,
-        creds=creds
+        gdrive=None,
+        max_workers=max_workers,
+        structure_cache=DocumentStructureCache() if use_structure_cache else None,
+        job_queue=job_queue
     )
+    if job_queue is not None:
+        job_queue.close()
+    http = getattr(gdoc, '_http', None)
+    stats = dict(http.scheduler.stats) if isinstance(http, PooledHttp) else {}
+    report['spans'] = TRACER.spans[first_span:]
+    return shard, report, stats
+
+
+def merge_shard_reports(results):
+    """Merge the (shard, report, stats) results of run_shard into one report and summed stats."""
+    report = {'succeeded': [], 'failed': {}, 'skipped': [], 'shards': {}}
+    stats = {}
+    for shard, shard_report, shard_stats in sorted(results, key=itemgetter(0)):
+        report['succeeded'].extend(shard_report['succeeded'])
+        report['failed'].update(shard_report['failed'])
+        report['skipped'].extend(shard_report['skipped'])
+        report['shards'][shard] = {key: len(shard_report[key]) for key in ('succeeded', 'failed', 'skipped')}
+        for key, value in shard_stats.items():
+            stats[key] = max(stats.get(key, 0), value) if key == 'max_queue_depth' else stats.get(key, 0) + value
+    return report, stats
+
+
+def generate_docs_sharded(grouped_data, num_shards, service_account_files=None, scopes=SCOPES,
+                          only_shards=None, max_workers=DOCS_MAX_WORKERS, gdoc_builder=None,
+                          use_structure_cache=False, job_db_file=None):
+    """
+    Fill the quote documents with one worker process per shard, quotes being assigned to
+    shards by shard_of. Shard i uses service_account_files[i % len(files)], so each worker
+    can run under its own quota. `only_shards` limits the run to some shard numbers, e.g.
+    to re-run the one that failed. A shard whose process dies has all its quotes failed.
+    Each worker records its job states in the JobQueue at `job_db_file` when given, and
+    traces its spans when TRACER is enabled.
+
+    Returns the merged report, with a per-shard count of succeeded, failed and skipped
+    quotes under 'shards'.
+    """
+    service_account_files = service_account_files or SHARD_SERVICE_ACCOUNT_FILES
+    shards = {shard: [] for shard in range(num_shards) if only_shards is None or shard in only_shards}
+    for entry in grouped_data:
+        shard = shard_of(entry['Quote ID'], num_shards)
+        if shard in shards:
+            shards[shard].append(entry)
+
+    results = []
+    # Spawned workers start clean instead of inheriting this process's open connections
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=max(1, len(shards)), mp_context=context) as executor:
+        futures = {
+            shard: executor.submit(run_shard, shard, entries,
+                                   service_account_files[shard % len(service_account_files)],
+                                   scopes, max_workers, gdoc_builder, use_structure_cache, job_db_file,
+                                   TRACER.enabled)
+            for shard, entries in shards.items() if entries
+        }
+        for shard, future in futures.items():
+            try:
+                results.append(future.result())
+                TRACER.extend(results[-1][1].pop('spans', []))
+            except Exception as e:
+                print(f"Shard {shard} failed: {e}")
+                failed = {entry['Quote ID']: f"Shard {shard} failed: {e}" for entry in shards[shard]}
+                results.append((shard, {'succeeded': [], 'failed': failed, 'skipped': []}, {}))
+
+    report, stats = merge_shard_reports(results)
+    for shard, counts in report['shards'].items():
+        print(f"  Shard {shard}: {counts['succeeded']} succeeded, {counts['failed']} failed, "
+              f"{counts['skipped']} skipped.")
+    print_generation_summary(report)
+    if stats:
+        print_request_stats(stats)
+    return report
+
+
+# === LOCAL RENDERING - Write the quote documents as DOCX files, without the Docs API ===
+# The DOCX files copy the layout of TEMPLATE_DOC_ID as plain text (header fields, services
+# table, Grand Total) without its styles; render_docx must follow any change to the template.
+DOCX_MIME_TYPE = 'application/vnd.openxmlformats-officedocument.wordprocessingml.document'
+GOOGLE_DOC_MIME_TYPE = 'application/vnd.google-apps.document'
+DOCX_STATIC_PARTS = {
+    '[Content_Types].xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/word/document.xml" ContentType="application/vnd.openxmlformats-'
+        'officedocument.wordprocessingml.document.main+xml"/>'
+        '</Types>'
+    ),
+    '_rels/.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/'
+        'relationships/officeDocument" Target="word/document.xml"/>'
+        '</Relationships>'
+    ),
+}
+XML_INVALID_CHARS_RE = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')  # Control characters XML cannot hold
+DOCX_TABLE_BORDERS = ''.join(f'<w:{side} w:val="single" w:sz="4" w:space="0" w:color="999999"/>'
+                             for side in ('top', 'left', 'bottom', 'right', 'insideH', 'insideV'))
+
+
+def docx_paragraph(text, bold=False, size=None):
+    """WordprocessingML paragraph of `text`; line breaks in the text are kept."""
+    properties = ('<w:b/>' if bold else '') + (f'<w:sz w:val="{size * 2}"/>' if size else '')
+    run_properties = f'<w:rPr>{properties}</w:rPr>' if properties else ''
+    text = XML_INVALID_CHARS_RE.sub('', str(text))
+    lines = '<w:br/>'.join(f'<w:t xml:space="preserve">{xml_escape(line)}</w:t>' for line in text.split('\n'))
+    return f'<w:p><w:r>{run_properties}{lines}</w:r></w:p>'
+
+
+def docx_table(header, rows):
+    """WordprocessingML table of full page width with a bold header row."""
+    def table_row(cells, bold=False):
+        return '<w:tr>' + ''.join(f'<w:tc>{docx_paragraph(cell, bold)}</w:tc>' for cell in cells) + '</w:tr>'
+
+    return (f'<w:tbl><w:tblPr><w:tblW w:w="5000" w:type="pct"/><w:tblBorders>{DOCX_TABLE_BORDERS}'
+            f'</w:tblBorders></w:tblPr><w:tblGrid>{"<w:gridCol/>" * len(header)}</w:tblGrid>'
+            + table_row(header, bold=True) + ''.join(table_row(row) for row in rows) + '</w:tbl>')
+
+
+def render_docx(entry):
+    """
+    Return the DOCX file of a grouped entry: the header fields of the template, the
+    services table (one row per service, SERVICE_COLUMNS wide) and the Grand Total.
+    This is a fixed copy of the template's layout, not an export of it.
+    """
+    paragraphs = [
+        docx_paragraph(f"Quote {entry['Quote ID']}", bold=True, size=16),
+        docx_paragraph(f"Quote for {entry.get('Client Name', '')}"),
+        docx_paragraph(f"Date: {entry.get('Date', '')}"),
+        docx_paragraph(f"Email: {entry.get('Email', '')}"),
+        docx_paragraph(f"Organization: {entry.get('Organization', '')}"),
+    ]
+    if entry.get('Notes'):
+        paragraphs.append(docx_paragraph(f"Notes: {entry['Notes']}"))
+    body = ''.join(paragraphs) + docx_table(SERVICE_COLUMNS, services_to_table_rows(entry['rows'])) + \
+        docx_paragraph(f"Grand Total: {format_money(Decimal(entry.get('Grand Total') or 0))}", bold=True)
+    document = ('<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                '<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main">'
+                f'<w:body>{body}<w:sectPr/></w:body></w:document>')
+
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as docx:
+        # A fixed timestamp, so the same quote always renders to the same bytes
+        for name, content in [*DOCX_STATIC_PARTS.items(), ('word/document.xml', document)]:
+            docx.writestr(zipfile.ZipInfo(name, date_time=(1980, 1, 1, 0, 0, 0)), content,
+                          compress_type=zipfile.ZIP_DEFLATED)
+    return buffer.getvalue()
+
+
+def docx_file_name(quote_id):
+    """
+    File name of a quote's DOCX. An ID with characters unsafe in file names also gets a
+    short hash of itself, so IDs such as 'Q/1' and 'Q:1' do not share 'Q_1.docx'.
+    """
+    name = re.sub(r'[^\w.-]', '_', quote_id)
+    if name != quote_id:
+        name += '-' + hashlib.sha256(quote_id.encode('utf-8')).hexdigest()[:8]
+    return name + '.docx'
+
+
+def write_docx(entry, output_dir):
+    """Render one entry to `output_dir`; returns (Quote ID, path, error) so one bad quote fails alone."""
+    try:
+        path = os.path.join(output_dir, docx_file_name(entry['Quote ID']))
+        with open(path, 'wb') as f:
+            f.write(render_docx(entry))
+        return entry['Quote ID'], path, None
+    except Exception as e:
+        return entry['Quote ID'], None, f"{type(e).__name__}: {e}"
+
+
+def render_quote_documents(grouped_data, output_dir, processes=RENDER_PROCESSES):
+    """
+    Write a DOCX file per grouped entry to `output_dir`, spread over a pool of `processes`
+    worker processes (one per CPU by default). Returns a report like the one of
+    generate_docs_for_grouped_quotes, with the path of each file under 'files'.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    processes = processes or os.cpu_count() or 1
+    render = functools.partial(write_docx, output_dir=output_dir)
+    if processes <= 1 or len(grouped_data) < 2:
+        results = [render(entry) for entry in grouped_data]
+    else:
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=processes, mp_context=context) as executor:
+            results = list(executor.map(render, grouped_data,
+                                        chunksize=max(1, len(grouped_data) // (processes * 4))))
+
+    report = {'succeeded': [], 'failed': {}, 'skipped': [], 'files': {}}
+    for quote_id, path, error in results:
+        if error is None:
+            report['succeeded'].append(quote_id)
+            report['files'][quote_id] = path
+        else:
+            report['failed'][quote_id] = error
+    print(f"Rendered {len(report['files'])} DOCX file(s) to '{output_dir}' with {processes} process(es).")
+    return report
+
+
+def upload_documents(drive_service, files, names=None, folder_id=DRIVE_UPLOAD_FOLDER_ID,
+                     convert=DRIVE_UPLOAD_CONVERT, max_workers=DOCS_MAX_WORKERS, uploaded_before=None):
+    """
+    Upload rendered files (Quote ID -> path) to Drive from a pool of `max_workers` threads,
+    as Google Docs when `convert` is set, named from `names` (Quote ID -> name) or else
+    after the file. Drive batches cannot carry uploads, so each file is one request.
+
+    A quote in `uploaded_before` (Quote ID -> file ID, see load_quote_uploads) has the
+    content of that file replaced, so its link stays the same; the file is created again
+    only if it was deleted. Returns (Quote ID -> file ID, Quote ID -> error).
+    """
+    names = names or {}
+    uploaded_before = uploaded_before or {}
+
+    def upload(item):
+        quote_id, path = item
+        body = {'name': names.get(quote_id) or os.path.splitext(os.path.basename(path))[0]}
+        try:
+            if quote_id in uploaded_before:
+                try:
+                    updated = drive_service.files().update(
+                        fileId=uploaded_before[quote_id], body=body,
+                        media_body=MediaFileUpload(path, mimetype=DOCX_MIME_TYPE), fields='id'
+                    ).execute()
+                    return quote_id, updated['id'], None
+                except HttpError as e:
+                    if e.resp.status != 404:
+                        raise
+            body['mimeType'] = GOOGLE_DOC_MIME_TYPE if convert else DOCX_MIME_TYPE
+            if folder_id:
+                body['parents'] = [folder_id]
+            created = drive_service.files().create(
+                body=body, media_body=MediaFileUpload(path, mimetype=DOCX_MIME_TYPE), fields='id'
+            ).execute()
+        except Exception as e:
+            return quote_id, None, e
+        return quote_id, created['id'], None
+
+    uploaded, errors = {}, {}
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        for quote_id, file_id, error in executor.map(upload, files.items()):
+            if error is None:
+                uploaded[quote_id] = file_id
+            else:
+                errors[quote_id] = str(error)
+                print(f"Could not upload the document of Quote ID {quote_id}: {error}")
+    print(f"Uploaded {len(uploaded)} document(s) to Drive.")
+    return uploaded, errors
+
+
+def generate_docx_documents(grouped_data, output_dir, drive_service=None, job_queue=None,
+                            processes=RENDER_PROCESSES, uploaded_before=None):
+    """
+    Render the quote documents locally and, given a `drive_service`, upload them under
+    COPY_NAME_FORMAT names, replacing the files of `uploaded_before` (see
+    upload_documents). A quote's job in `job_queue` is done once its file is written
+    (and uploaded). Returns the report of render_quote_documents, with the Drive file
+    IDs under 'uploaded' after an upload.
+    """
+    report = render_quote_documents(grouped_data, output_dir, processes)
+    if drive_service is not None:
+        names = {entry['Quote ID']: COPY_NAME_FORMAT.format(**entry) for entry in grouped_data}
+        report['uploaded'], errors = upload_documents(drive_service, report['files'], names,
+                                                      uploaded_before=uploaded_before)
+        report['failed'].update(errors)
+        report['succeeded'] = [quote_id for quote_id in report['succeeded'] if quote_id not in errors]
+    if job_queue is not None:
+        for quote_id in report['succeeded']:
+            job_queue.finish(quote_id)
+        for quote_id, error in report['failed'].items():
+            job_queue.fail(quote_id, error)
+    print_generation_summary(report)
+    return report
+
+
+# === INCREMENTAL RUNS - Remember what was already processed per Quote ID ===
+def open_state_store(path):
+    """
+    Open (and create if needed) the SQLite store holding one content hash per Quote ID,
+    with --from-template the document copied for each Quote ID and the pool of template
+    variants, and with --upload the Drive file of each Quote ID.
+    """
+    conn = sqlite3.connect(path)
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS quote_state ("
+        "quote_id TEXT PRIMARY KEY, content_hash TEXT NOT NULL, updated_at TEXT NOT NULL)"
+    )
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS quote_documents ("
+        "quote_id TEXT PRIMARY KEY, document_id TEXT NOT NULL, placeholders_hash TEXT NOT NULL, "
+        "updated_at TEXT NOT NULL)"
+    )
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS template_variants ("
+        "template_id TEXT NOT NULL, size INTEGER NOT NULL, document_id TEXT NOT NULL, "
+        "PRIMARY KEY (template_id, size))"
+    )
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS quote_uploads ("
+        "quote_id TEXT PRIMARY KEY, file_id TEXT NOT NULL, updated_at TEXT NOT NULL)"
+    )
+    return conn
+
+
+def hash_grouped_entry(entry, output=None):
+    """
+    Stable hash of everything a grouped entry contributes to the sheet and its document.
+    `output` names where they go (see output_mode), so a quote is done again in a new mode.
+    """
+    payload = json.dumps(entry if output is None else [output, entry],
+                         sort_keys=True, ensure_ascii=False, separators=(',', ':'), default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def select_changed_entries(conn, grouped_data, output=None):
+    """
+    Compare grouped entries with the stored hashes, made for the `output` of this run.
+
+    Returns the entries that are new or whose content changed, and the set of stored
+    Quote IDs that are no longer in the grouped data.
+    """
+    stored = dict(conn.execute("SELECT quote_id, content_hash FROM quote_state"))
+    changed = [
+        entry for entry in grouped_data
+        if stored.get(entry['Quote ID']) != hash_grouped_entry(entry, output)
+    ]
+    removed = set(stored) - {entry['Quote ID'] for entry in grouped_data}
+    return changed, removed
+
+
+def record_processed_entries(conn, entries, current_quote_ids, output=None):
+    """
+    Store the hashes of processed entries and forget Quote IDs that left the sheet, with
+    their template copy and uploaded file, so they are processed again if they ever come back.
+    """
+    with conn:
+        conn.executemany(
+            "INSERT OR REPLACE INTO quote_state (quote_id, content_hash, updated_at) "
+            "VALUES (?, ?, datetime('now'))",
+            [(entry['Quote ID'], hash_grouped_entry(entry, output)) for entry in entries]
+        )
+        stored_ids = [row[0] for row in conn.execute("SELECT quote_id FROM quote_state")]
+        conn.executemany(
+            "DELETE FROM quote_state WHERE quote_id = ?",
+            [(quote_id,) for quote_id in stored_ids if quote_id not in current_quote_ids]
+        )
+        for table in ('quote_documents', 'quote_uploads'):
+            table_ids = [row[0] for row in conn.execute(f"SELECT quote_id FROM {table}")]
+            conn.executemany(
+                f"DELETE FROM {table} WHERE quote_id = ?",
+                [(quote_id,) for quote_id in table_ids if quote_id not in current_quote_ids]
+            )
+
+
+def load_quote_documents(conn):
+    """Return the (document ID, placeholders_hash) of the template copy of each Quote ID."""
+    return {quote_id: (document_id, values_hash) for quote_id, document_id, values_hash in
+            conn.execute("SELECT quote_id, document_id, placeholders_hash FROM quote_documents")}
+
+
+def record_quote_documents(conn, entries):
+    """
+    Store the documents of entries returned by copy_quote_documents, before they are
+    filled, so a later or resumed run fills the same documents instead of copying again.
+    """
+    with conn:
+        conn.executemany(
+            "INSERT OR REPLACE INTO quote_documents (quote_id, document_id, placeholders_hash, updated_at) "
+            "VALUES (?, ?, ?, datetime('now'))",
+            [(entry['Quote ID'], entry['Document ID'], placeholders_hash(entry)) for entry in entries]
+        )
+
+
+def load_template_variants(conn, template_id):
+    """Return the template variants built earlier from `template_id`, as {size: document ID}."""
+    return dict(conn.execute("SELECT size, document_id FROM template_variants WHERE template_id = ?",
+                             (template_id,)))
+
+
+def record_template_variants(conn, template_id, variants):
+    """Store the pool returned by build_template_variants, so later runs reuse its copies."""
+    with conn:
+        conn.executemany(
+            "INSERT OR REPLACE INTO template_variants (template_id, size, document_id) VALUES (?, ?, ?)",
+            [(template_id, size, document_id) for size, document_id in variants.items()]
+        )
+
+
+def load_quote_uploads(conn):
+    """Return the Drive file ID of the uploaded document of each Quote ID."""
+    return dict(conn.execute("SELECT quote_id, file_id FROM quote_uploads"))
+
+
+def record_quote_uploads(conn, uploaded):
+    """Store the Drive file IDs (Quote ID -> file ID) returned by upload_documents."""
+    with conn:
+        conn.executemany(
+            "INSERT OR REPLACE INTO quote_uploads (quote_id, file_id, updated_at) "
+            "VALUES (?, ?, datetime('now'))",
+            list(uploaded.items())
+        )
+
+
+class JobQueue:
+    """
+    Durable per-quote document jobs, kept in the state store (SQLite in WAL mode).
+
+    A job is 'pending' until a worker starts it ('in_progress'), then 'done', or back to
+    'pending' after a failure. Each state change is committed at once, so after a crash
+    or a kill only the unfinished jobs are run again: jobs left 'in_progress' are pending
+    once more. A job that failed JOB_MAX_ATTEMPTS times is 'failed' and stays in the
+    dead-letter list until its quote changes or retry_failed is called. Safe to use from
+    several threads, and from several processes each opening its own JobQueue. Jobs are
+    hashed for `output` (see output_mode), so a job done in another mode runs again.
+    """
+
+    def __init__(self, path, max_attempts=JOB_MAX_ATTEMPTS, output=None):
+        self.max_attempts = max_attempts
+        self.output = output
+        self.conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")  # Durable across crashes of this process
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS quote_jobs ("
+            "quote_id TEXT PRIMARY KEY, content_hash TEXT NOT NULL, state TEXT NOT NULL, "
+            "attempts INTEGER NOT NULL DEFAULT 0, last_error TEXT, updated_at TEXT NOT NULL)"
+        )
+        self._lock = threading.Lock()
+
+    def enqueue(self, entries):
+        """
+        Add a job per entry. A job for the same content keeps its state and attempts (a
+        job left 'in_progress' becomes 'pending'); new or changed content starts afresh.
+        """
+        with self._lock, self.conn:
+            stored = dict(self.conn.execute("SELECT quote_id, content_hash FROM quote_jobs"))
+            jobs = [(entry['Quote ID'], hash_grouped_entry(entry, self.output)) for entry in entries]
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO quote_jobs (quote_id, content_hash, state, attempts, updated_at) "
+                "VALUES (?, ?, 'pending', 0, datetime('now'))",
+                [job for job in jobs if stored.get(job[0]) != job[1]]
+            )
+            self.conn.execute(
+                "UPDATE quote_jobs SET state = 'pending', updated_at = datetime('now') "
+                "WHERE state = 'in_progress'"
+            )
+
+    def states(self):
+        """Return the state of every job, by Quote ID."""
+        with self._lock:
+            return dict(self.conn.execute("SELECT quote_id, state FROM quote_jobs"))
+
+    def pending(self, entries):
+        """Return the entries whose job still has to run."""
+        states = self.states()
+        return [entry for entry in entries if states.get(entry['Quote ID']) == 'pending']
+
+    def _set(self, sql, params):
+        with self._lock, self.conn:
+            self.conn.execute(sql, params)
+
+    def start(self, quote_id):
+        self._set("UPDATE quote_jobs SET state = 'in_progress', updated_at = datetime('now') "
+                  "WHERE quote_id = ?", (quote_id,))
+
+    def finish(self, quote_id):
+        self._set("UPDATE quote_jobs SET state = 'done', last_error = NULL, updated_at = datetime('now') "
+                  "WHERE quote_id = ?", (quote_id,))
+
+    def fail(self, quote_id, error):
+        """Count a failed attempt; the job is retried on the next run until its budget is spent."""
+        self._set("UPDATE quote_jobs SET attempts = attempts + 1, last_error = ?, "
+                  "state = CASE WHEN attempts + 1 >= ? THEN 'failed' ELSE 'pending' END, "
+                  "updated_at = datetime('now') WHERE quote_id = ?",
+                  (str(error), self.max_attempts, quote_id))
+
+    def dead_letters(self):
+        """Return (Quote ID, attempts, last error) of every job that used up its retries."""
+        with self._lock:
+            return list(self.conn.execute(
+                "SELECT quote_id, attempts, last_error FROM quote_jobs WHERE state = 'failed' ORDER BY quote_id"))
+
+    def retry_failed(self):
+        """Give the jobs of the dead-letter list a new retry budget."""
+        self._set("UPDATE quote_jobs SET state = 'pending', attempts = 0, updated_at = datetime('now') "
+                  "WHERE state = 'failed'", ())
+
+    def prune(self, current_quote_ids):
+        """
+        Drop the finished jobs, once their quotes are recorded in the state store, and the
+        jobs of quotes that left the sheet.
+        """
+        with self._lock, self.conn:
+            self.conn.execute("DELETE FROM quote_jobs WHERE state = 'done'")
+            stored_ids = [row[0] for row in self.conn.execute("SELECT quote_id FROM quote_jobs")]
+            self.conn.executemany(
+                "DELETE FROM quote_jobs WHERE quote_id = ?",
+                [(quote_id,) for quote_id in stored_ids if quote_id not in current_quote_ids]
+            )
+
+    def close(self):
+        self.conn.close()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Group quotes and fill their documents.")
+    parser.add_argument('--source', metavar='PATH',
+                        help="Read the quotes from a CSV, JSONL or Parquet export instead of "
+                             "the Quotes sheet.")
+    parser.add_argument('--grouped-csv', metavar='PATH',
+                        help="With --source, only group the export and write the GroupedQuotes "
+                             "rows to this CSV file, without any Google API call.")
+    parser.add_argument('--normalized', action='store_true',
+                        help="Also write the services of each quote as display text, next to "
+                             "their JSON, and one row per service to the GroupedServices sheet "
+                             "(created if missing).")
+    parser.add_argument('--full', action='store_true',
+                        help="Ignore the local state and rebuild every quote.")
+    parser.add_argument('--from-template', action='store_true',
+                        help="Generate each quote document from a copy of the closest-sized "
+                             "template variant, with its placeholders and services table "
+                             "filled in one batchUpdate, instead of filling the Document "
+                             "Studio documents. The File Link column is then not needed: "
+                             "GroupedQuotes gets a Document Link column instead. Copies are "
+                             "kept in the local state and filled again by later runs.")
+    parser.add_argument('--shards', type=int, default=1,
+                        help="Fill the documents with this many worker processes, quotes being "
+                             "split by a hash of their Quote ID.")
+    parser.add_argument('--retry-failed', action='store_true',
+                        help="Give the quotes of the dead-letter list a new retry budget.")
+    parser.add_argument('--only-shard', type=int, action='append', metavar='SHARD',
+                        help="With --shards, only process this shard (repeatable), e.g. to "
+                             "re-run a shard that failed.")
+    parser.add_argument('--render-docx', metavar='DIR',
+                        help="Write the quote documents as DOCX files to this directory, from a "
+                             "pool of processes, instead of filling Google Docs. Their layout "
+                             "is a fixed, unstyled copy of the template's (see render_docx).")
+    parser.add_argument('--upload', action='store_true',
+                        help="With --render-docx, upload the files to Drive afterwards "
+                             "(DRIVE_UPLOAD_FOLDER_ID). A quote uploaded by an earlier run has "
+                             "its file updated in place.")
+    parser.add_argument('--profile', action='store_true',
+                        help="Print the p50/p95/p99 latency of each stage and API at the end.")
+    parser.add_argument('--trace', metavar='PATH',
+                        help="Write a timing span per stage, quote fill and API call to this "
+                             "JSON-lines file.")
+    parser.add_argument('--metrics', metavar='PATH',
+                        help="Write the stage latencies and API call counters to this file in "
+                             "the Prometheus text format.")
+    args = parser.parse_args(argv)
+    if args.grouped_csv and not args.source:
+        parser.error("--grouped-csv needs --source.")
+    if args.upload and (not args.render_docx or args.grouped_csv):
+        parser.error("--upload needs --render-docx, and cannot be used with --grouped-csv.")
+    if args.render_docx and args.from_template:
+        parser.error("--render-docx and --from-template are different ways of making the documents.")
+    if args.shards < 1:
+        parser.error("--shards must be at least 1.")
+    for shard in args.only_shard or ():
+        if not 0 <= shard < args.shards:
+            parser.error(f"--only-shard {shard} is not a shard of --shards {args.shards} "
+                         f"(0 to {args.shards - 1}).")
+    return args
+
+
+def output_mode(args):
+    """
+    Name of what a run produces besides GroupedQuotes, folded into the state hashes so that
+    switching modes does every quote again. None for the default fill of the Document
+    Studio documents, whose hashes are those of earlier runs.
+    """
+    modes = []
+    if args.from_template:
+        modes.append('template')
+    if args.render_docx:
+        modes.append('docx')
+    if args.upload:
+        modes.append('upload')
+    return '+'.join(modes) or None
+
+
+def group_source_rows(rows):
+    """
+    Group a stream of rows (header first) by Quote ID, reporting unparseable totals.
+    Reading the rows and grouping them are traced as the 'read' and 'group' stages.
+    """
+    rows = TimedRows(TRACER, 'read', rows)
+    started = time.perf_counter()
+    header = next(rows, None)
+    if header is None:
+        return None
+
+    invalid_totals = []
+    grouped_data = group_rows_by_quote_id(itertools.chain([header], rows), header, invalid_totals)
+    TRACER.record('group', time.perf_counter() - started - rows.seconds, quotes=len(grouped_data))
+    if invalid_totals:
+        print(f"{len(invalid_totals)} Total value(s) could not be parsed and were left out of Grand Total:")
+        for quote_id, value in invalid_totals:
+            print(f"  Quote ID {quote_id}: {value!r}")
+    return grouped_data
+
+
+def write_grouped_csv(path, grouped_data, normalized=False):
+    """
+    Write the GroupedQuotes rows (header first) to a local CSV file. With `normalized`, the
+    GroupedServices rows go to a second file named after it, e.g. grouped.services.csv.
+    """
+    rows = build_grouped_rows(grouped_data, normalized)
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        csv.writer(f).writerows(rows)
+    print(f"Grouped data written to '{path}': {len(rows) - 1} quote(s).")
+    if normalized:
+        services_path = os.path.splitext(path)[0] + '.services.csv'
+        service_rows = build_grouped_service_rows(grouped_data)
+        with open(services_path, 'w', newline='', encoding='utf-8') as f:
+            csv.writer(f).writerows(service_rows)
+        print(f"Grouped services written to '{services_path}': {len(service_rows) - 1} service(s).")
+
+
+def run_offline(args):
+    """
+    Group a local export into a GroupedQuotes CSV file, and with --render-docx render its
+    quote documents, without any Google API call.
+    """
+    grouped_data = group_source_rows(iter(iter_source_rows(args.source)))
+    if grouped_data is None:
+        print(f"No data found in '{args.source}'.")
+        return
+    with TRACER.span('write', quotes=len(grouped_data)):
+        write_grouped_csv(args.grouped_csv, grouped_data, args.normalized)
+    if args.render_docx:
+        with TRACER.span('render', quotes=len(grouped_data)):
+            generate_docx_documents(grouped_data, args.render_docx)
+
+
+def run_pipeline(args, sheet, gdoc, gdrive):
+    """Read, group, write and fill the quote documents with already built services."""
+    # Step 2: Stream the rows of the source spreadsheet, or of a local export with --source
+    if args.source:
+        rows = iter(iter_source_rows(args.source))
+    else:
+        rows = iter_sheet_rows(sheet, SPREADSHEET_ID_SOURCE, RANGE_NAME)
+
+    # Step 3: Group the rows by Quote ID as they arrive
+    grouped_data = group_source_rows(rows)
+    if grouped_data is None:
+        print("No data found in the source.")
+        return
+
+    # Step 4: Keep only the quotes that changed since the last run (all of them with --full)
+    state = open_state_store(STATE_DB_FILE)
+    output = output_mode(args)
+    changed, removed = select_changed_entries(state, grouped_data, output)
+    if args.full:
+        changed = grouped_data
+    if args.only_shard:
+        changed = [entry for entry in changed if shard_of(entry['Quote ID'], args.shards) in args.only_shard]
+    print(f"{len(changed)} of {len(grouped_data)} quote(s) changed and {len(removed)} removed "
+          f"since the last run.")
+    # The --normalized sheets are compared with the grouped data on every run instead, as
+    # they may have been written without it
+    if not changed and not removed and not args.normalized:
+        state.close()
+        return
+
+    # Step 5: Pick the quote documents to generate, resuming an interrupted run
+    jobs = JobQueue(STATE_DB_FILE, output=output)
+    if args.retry_failed:
+        jobs.retry_failed()
+    jobs.enqueue(changed)
+    to_run = jobs.pending(changed)
+    if len(to_run) < len(changed):
+        print(f"{len(changed) - len(to_run)} of them already done or in the dead-letter list; "
+              f"{len(to_run)} to run.")
+
+    # With --from-template, copy the documents first so GroupedQuotes can link to them
+    documents = to_run
+    structure_cache = None
+    document_ids = None
+    if args.from_template:
+        with TRACER.span('copy', quotes=len(to_run)):
+            variants = build_template_variants(gdrive, gdoc, built=load_template_variants(state, TEMPLATE_DOC_ID))
+            record_template_variants(state, TEMPLATE_DOC_ID, variants)
+            documents = copy_quote_documents(gdrive, to_run, variants, copied=load_quote_documents(state))
+        record_quote_documents(state, documents)
+        document_ids = {quote_id: document_id for quote_id, (document_id, _) in load_quote_documents(state).items()}
+        structure_cache = DocumentStructureCache()
+
+    with TRACER.span('write', quotes=len(grouped_data)):
+        write_grouped_data(
+            sheet=sheet,
+            spreadsheet_id=SPREADSHEET_ID_SOURCE,
+            target_sheet_name="GroupedQuotes",
+            grouped_data=grouped_data,
+            services_sheet_name=GROUPED_SERVICES_SHEET_NAME if args.normalized else None,
+            document_ids=document_ids
+        )
+
+    # Step 6: Generate the quote documents
+    if args.render_docx:
+        with TRACER.span('render', quotes=len(documents)):
+            report = generate_docx_documents(documents, args.render_docx, gdrive if args.upload else None, jobs,
+                                             uploaded_before=load_quote_uploads(state))
+        record_quote_uploads(state, report.get('uploaded', {}))
+    elif args.shards > 1:
+        generate_docs_sharded(
+            grouped_data=documents,
+            num_shards=args.shards,
+            only_shards=args.only_shard,
+            use_structure_cache=structure_cache is not None,
+            job_db_file=STATE_DB_FILE
+        )
+    else:
+        generate_docs_for_grouped_quotes(
+            grouped_data=documents,
+            gdoc=gdoc,
+            gdrive=gdrive,
+            max_workers=DOCS_MAX_WORKERS,
+            structure_cache=structure_cache,
+            job_queue=jobs
+        )
+    if structure_cache is not None and args.shards <= 1:
+        print(f"Template layouts: {structure_cache.stats['hits']} cache hit(s), "
+              f"{structure_cache.stats['misses']} read(s), "
+              f"{structure_cache.stats['invalidations']} invalidation(s).")
+
+    # Step 7: Remember the quotes that are done; failed ones are retried next run
+    job_states = jobs.states()
+    current_quote_ids = {entry['Quote ID'] for entry in grouped_data}
+    record_processed_entries(
+        state,
+        [entry for entry in changed if job_states.get(entry['Quote ID']) == 'done'],
+        current_quote_ids,
+        output
+    )
+    jobs.prune(current_quote_ids)
+    dead_letters = jobs.dead_letters()
+    if dead_letters:
+        print(f"{len(dead_letters)} quote(s) in the dead-letter list (run with --retry-failed to retry):")
+        for quote_id, attempts, error in dead_letters:
+            print(f"  Quote ID {quote_id} failed {attempts} time(s): {error}")
+    jobs.close()
+    state.close()
+
+
+def report_trace(args, tracer=TRACER):
+    """Write and print what --trace, --metrics and --profile asked for."""
+    if args.trace:
+        tracer.write_jsonl(args.trace)
+    if args.metrics:
+        tracer.write_prometheus(args.metrics)
+    if args.profile:
+        tracer.print_profile()
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    TRACER.enabled = bool(args.trace or args.metrics or args.profile)
+    try:
+        if args.grouped_csv:
+            run_offline(args)
+            return
+
+        # Step 1: Authenticate all Google services
+        sheet = authenticate_gsheet(SERVICE_ACCOUNT_FILE, SCOPES)
+        gdoc = authenticate_gdoc(SERVICE_ACCOUNT_FILE, SCOPES)
+        gdrive = authenticate_drive(SERVICE_ACCOUNT_FILE, SCOPES)
+
+        run_pipeline(args, sheet, gdoc, gdrive)
+        print_scheduler_report(get_shared_http(SERVICE_ACCOUNT_FILE, SCOPES).scheduler)
+    finally:
+        # Also for a failed run, to see where it stopped
+        report_trace(args)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,37 @@
+import json
+
+import main
+
+
+def test_consecutive_rows_share_one_range():
+    rows = [(2, ['a', '1']), (3, ['b', '2']), (4, ['c', '3']), (7, ['d', '4'])]
+    [chunk] = main.chunk_row_updates('GroupedQuotes', rows, 2, 10_000)
+    assert chunk == [
+        {'range': 'GroupedQuotes!A2:B4', 'values': [['a', '1'], ['b', '2'], ['c', '3']]},
+        {'range': 'GroupedQuotes!A7:B7', 'values': [['d', '4']]},
+    ]
+
+
+def test_chunks_stay_under_the_request_size():
+    rows = [(number, ['x' * 200, str(number)]) for number in range(2, 202)]
+    chunks = main.chunk_row_updates('GroupedQuotes', rows, 2, 5_000)
+    assert len(chunks) > 1
+    for chunk in chunks:
+        assert len(json.dumps(chunk)) <= 5_000
+    written = [values for chunk in chunks for data in chunk for values in data['values']]
+    assert written == [values for _, values in rows]
+
+
+def test_a_row_larger_than_the_limit_gets_a_chunk_of_its_own():
+    rows = [(2, ['small']), (3, ['y' * 500]), (4, ['small'])]
+    chunks = main.chunk_row_updates('S', rows, 1, 100)
+    assert [[data['range'] for data in chunk] for chunk in chunks] == [['S!A2:A2'], ['S!A3:A3'], ['S!A4:A4']]
+
+
+def test_ranges_end_at_the_last_column():
+    [chunk] = main.chunk_row_updates('S', [(5, ['v'] * 28)], 28, 10_000)
+    assert chunk[0]['range'] == 'S!A5:AB5'
+
+
+def test_no_rows_no_chunks():
+    assert main.chunk_row_updates('S', [], 3, 1_000) == []
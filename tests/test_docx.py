@@ -0,0 +1,12 @@
+import main
+
+
+def test_file_names_of_unsafe_ids_do_not_collide():
+    names = {main.docx_file_name(quote_id) for quote_id in ('Q/1', 'Q:1', 'Q 1', 'Q_1')}
+    assert len(names) == 4
+    assert 'Q_1.docx' in names
+
+
+def test_file_names_of_safe_ids_are_kept():
+    assert main.docx_file_name('Q-0001') == 'Q-0001.docx'
+    assert main.docx_file_name('Q/1') == main.docx_file_name('Q/1')
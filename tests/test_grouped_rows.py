@@ -0,0 +1,37 @@
+import json
+
+import pytest
+
+import main
+
+
+# Values of hashString in google-app-script.js for the same text
+@pytest.mark.parametrize('text, expected', [
+    ('', 'fnv1a:811c9dc5'),
+    ('[{"Total":"120"}]', 'fnv1a:b4f34e98'),
+    ('é — 😀', 'fnv1a:98fcc8ed'),
+])
+def test_services_hash_matches_the_apps_script(text, expected):
+    assert main.services_hash(text) == expected
+
+
+def grouped(details='Line 1'):
+    header = ['Quote ID', 'Date', 'Client Name', 'Email', 'Organization', 'Notes'] + main.SERVICE_COLUMNS
+    row = ['Q-1', '2025-05-01', 'Client', 'c@example.com', 'Org', '',
+           'Translation', 'EN>FR', 'Written', '1000', '', '0.12', details, '120']
+    return main.group_rows_by_quote_id([header, row], header)
+
+
+def test_normalized_rows_keep_the_services_json():
+    header, row = main.build_grouped_rows(grouped(), normalized=True)
+    assert header[:len(main.GROUPED_HEADER)] == main.GROUPED_HEADER
+    assert header[9:] == ['Document Link', 'Formatted Services', 'Services Hash']
+    services_json = row[header.index('Services')]
+    assert json.loads(services_json)[0]['Details'] == 'Line 1'
+    assert row[9:] == ['', main.format_services_text(grouped()[0]['rows']), main.services_hash(services_json)]
+
+
+def test_document_link_is_column_j():
+    header, row = main.build_grouped_rows(grouped(), document_ids={'Q-1': 'doc-1'})
+    assert main.column_letter(header.index('Document Link') + 1) == 'J'
+    assert row[9] == main.document_link('doc-1')
@@ -0,0 +1,93 @@
+import pytest
+
+import main
+
+
+def entry(quote_id, total='10'):
+    return {'Quote ID': quote_id, 'Grand Total': total, 'rows': []}
+
+
+@pytest.fixture
+def db_file(tmp_path):
+    return str(tmp_path / 'state.db')
+
+
+@pytest.fixture
+def jobs(db_file):
+    queue = main.JobQueue(db_file, max_attempts=2)
+    yield queue
+    queue.close()
+
+
+def test_jobs_move_from_pending_to_done(jobs):
+    entries = [entry('Q1'), entry('Q2')]
+    jobs.enqueue(entries)
+    assert jobs.states() == {'Q1': 'pending', 'Q2': 'pending'}
+
+    jobs.start('Q1')
+    assert jobs.states()['Q1'] == 'in_progress'
+    jobs.finish('Q1')
+    assert jobs.states()['Q1'] == 'done'
+    assert jobs.pending(entries) == [entry('Q2')]
+
+
+def test_failed_jobs_are_retried_then_dead_lettered(jobs):
+    jobs.enqueue([entry('Q1')])
+    jobs.start('Q1')
+    jobs.fail('Q1', 'boom')
+    assert jobs.states()['Q1'] == 'pending'
+    assert jobs.dead_letters() == []
+
+    jobs.start('Q1')
+    jobs.fail('Q1', 'boom again')
+    assert jobs.states()['Q1'] == 'failed'
+    assert jobs.dead_letters() == [('Q1', 2, 'boom again')]
+
+    jobs.retry_failed()
+    assert jobs.states()['Q1'] == 'pending'
+    assert jobs.dead_letters() == []
+
+
+def test_an_interrupted_run_resumes_only_unfinished_jobs(db_file):
+    entries = [entry('Q1'), entry('Q2'), entry('Q3')]
+    first = main.JobQueue(db_file)
+    first.enqueue(entries)
+    first.start('Q1')
+    first.finish('Q1')
+    first.start('Q2')  # Killed while Q2 was being filled
+    first.close()
+
+    second = main.JobQueue(db_file)
+    second.enqueue(entries)
+    assert second.states() == {'Q1': 'done', 'Q2': 'pending', 'Q3': 'pending'}
+    assert [e['Quote ID'] for e in second.pending(entries)] == ['Q2', 'Q3']
+    second.close()
+
+
+def test_changed_content_starts_a_fresh_job(jobs):
+    jobs.enqueue([entry('Q1')])
+    jobs.start('Q1')
+    jobs.fail('Q1', 'boom')
+    jobs.start('Q1')
+    jobs.fail('Q1', 'boom')
+    assert jobs.states()['Q1'] == 'failed'
+
+    jobs.enqueue([entry('Q1', total='20')])
+    assert jobs.states()['Q1'] == 'pending'
+    assert jobs.dead_letters() == []
+
+
+def test_same_content_keeps_its_state(jobs):
+    jobs.enqueue([entry('Q1')])
+    jobs.start('Q1')
+    jobs.finish('Q1')
+    jobs.enqueue([entry('Q1')])
+    assert jobs.states()['Q1'] == 'done'
+
+
+def test_prune_drops_done_jobs_and_removed_quotes(jobs):
+    jobs.enqueue([entry('Q1'), entry('Q2'), entry('Q3')])
+    jobs.start('Q1')
+    jobs.finish('Q1')
+    jobs.prune({'Q1', 'Q2'})
+    assert jobs.states() == {'Q2': 'pending'}
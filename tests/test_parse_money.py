@@ -0,0 +1,34 @@
+from decimal import Decimal
+
+import pytest
+
+import main
+
+
+@pytest.mark.parametrize('value, expected', [
+    ('120', Decimal('120')),
+    ('1,234.50', Decimal('1234.50')),
+    ('$ 99', Decimal('99')),
+    ('120 USD', Decimal('120')),
+    ('€1.234,50', Decimal('1234.50')),
+    ('12,50', Decimal('12.50')),
+    ('1,5', Decimal('1.5')),
+    ('12,345,678', Decimal('12345678')),
+    ('(45.10)', Decimal('-45.10')),
+    ('-3', Decimal('-3')),
+    (' 7 ', Decimal('7')),
+])
+def test_parses_amounts(value, expected):
+    assert main.parse_money(value) == expected
+
+
+@pytest.mark.parametrize('value', ['', 'n/a', 'TBD', '1,2345', '12,34,5', 'NaN', 'Infinity'])
+def test_rejects_what_is_not_an_amount(value):
+    assert main.parse_money(value) is None
+
+
+def test_invalid_totals_are_reported_and_left_out():
+    invalid = []
+    services = [('', '', '', '', '', '', '', total) for total in ('10', 'n/a', '1,5', '')]
+    assert main.sum_service_totals(services, invalid) == Decimal('11.5')
+    assert invalid == ['n/a']
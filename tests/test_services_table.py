@@ -0,0 +1,68 @@
+import pytest
+
+import main
+from benchmarks.fake_google import FakeDocument, SERVICES_HEADER, quote_document_blocks
+
+
+def fill(document, services):
+    """Apply the requests for `services` like a batchUpdate; returns how many were sent."""
+    table = main.find_table(document.to_json()['body']['content'])
+    requests = main.build_services_table_requests(table, services)
+    for request in requests:
+        document.apply(request)
+    return len(requests)
+
+
+def service(detail, total='10'):
+    return ['Translation', 'EN>FR', 'Remote', '1000', '', '0.12', detail, total]
+
+
+@pytest.mark.parametrize('data_rows', [1, 3, 8])
+@pytest.mark.parametrize('num_services', [0, 1, 3, 8])
+def test_table_holds_the_services_whatever_its_size(data_rows, num_services):
+    document = FakeDocument('doc', quote_document_blocks(data_rows))
+    services = [service(f'Item {i}') for i in range(num_services)]
+    fill(document, services)
+    assert document.table_values() == [SERVICES_HEADER] + services
+
+
+def test_emoji_and_other_astral_characters_count_two_utf16_units():
+    # Text after a cell holding emoji is only found at the right index if they count twice
+    document = FakeDocument('doc', quote_document_blocks(2))
+    fill(document, [service('😀 first 🎉'), service('𝄞 clef')])
+    services = [service('👍 still'), service('after 😀😀 emoji', total='12'), service('new 🚀')]
+    fill(document, services)
+    assert document.table_values()[1:] == services
+    assert document.paragraph_texts()[-1] == 'Terms and conditions apply.'
+
+
+def test_multi_line_cells_are_written_and_replaced_whole():
+    document = FakeDocument('doc', quote_document_blocks(1))
+    services = [service('Line one\nLine two\nLine three'), service('Single')]
+    fill(document, services)
+    assert document.table_values()[1:] == services
+
+    services = [service('Single'), service('Two\nlines')]
+    fill(document, services)
+    assert document.table_values()[1:] == services
+
+
+def test_only_changed_cells_are_rewritten():
+    document = FakeDocument('doc', quote_document_blocks(3))
+    services = [service('A'), service('B 😀'), service('C')]
+    fill(document, services)
+
+    services[1] = service('B changed')
+    table = main.find_table(document.to_json()['body']['content'])
+    requests = main.build_services_table_requests(table, services)
+    assert [next(iter(request)) for request in requests] == ['deleteContentRange', 'insertText']
+    # 'B 😀' is 4 UTF-16 code units long
+    span = requests[0]['deleteContentRange']['range']
+    assert span['endIndex'] - span['startIndex'] == 4
+
+
+def test_filled_table_needs_no_request():
+    document = FakeDocument('doc', quote_document_blocks(2))
+    services = [service('😀'), service('multi\nline')]
+    fill(document, services)
+    assert fill(document, services) == 0
@@ -0,0 +1,51 @@
+import os
+import subprocess
+import sys
+from collections import Counter
+
+import pytest
+
+import main
+
+QUOTE_IDS = ['Q-0001', 'Q-0002', 'QUOTE-42', 'Ünïcode-7']
+
+
+def test_shards_do_not_change_between_releases():
+    assert [main.shard_of(quote_id, 8) for quote_id in QUOTE_IDS] == [3, 4, 6, 5]
+
+
+def test_shards_do_not_depend_on_the_process_hash_seed():
+    # Python's own hash() of a str changes with PYTHONHASHSEED; shard_of must not
+    code = f"import main; print([main.shard_of(q, 8) for q in {QUOTE_IDS!r}])"
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    for seed in ('1', '2'):
+        output = subprocess.run([sys.executable, '-c', code], cwd=root, capture_output=True, text=True,
+                                env={**os.environ, 'PYTHONHASHSEED': seed}, check=True).stdout
+        assert output.strip() == '[3, 4, 6, 5]'
+
+
+def test_shards_are_in_range_and_balanced():
+    counts = Counter(main.shard_of(f'Q{i:05d}', 4) for i in range(4000))
+    assert set(counts) == {0, 1, 2, 3}
+    assert min(counts.values()) > 900
+
+
+def test_one_shard_holds_everything():
+    assert {main.shard_of(quote_id, 1) for quote_id in QUOTE_IDS} == {0}
+
+
+@pytest.mark.parametrize('argv', [
+    ['--only-shard', '1'],
+    ['--shards', '4', '--only-shard', '4'],
+    ['--shards', '4', '--only-shard', '1', '--only-shard', '-1'],
+    ['--shards', '0'],
+])
+def test_only_shard_must_be_a_shard_of_the_run(argv, capsys):
+    with pytest.raises(SystemExit):
+        main.parse_args(argv)
+    assert '--' in capsys.readouterr().err
+
+
+def test_only_shard_within_the_run_is_accepted():
+    args = main.parse_args(['--shards', '4', '--only-shard', '0', '--only-shard', '3'])
+    assert args.only_shard == [0, 3]
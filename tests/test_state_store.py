@@ -0,0 +1,32 @@
+import pytest
+
+import main
+
+
+def entry(quote_id, total='10'):
+    return {'Quote ID': quote_id, 'Grand Total': total, 'rows': []}
+
+
+@pytest.fixture
+def state(tmp_path):
+    conn = main.open_state_store(str(tmp_path / 'state.db'))
+    yield conn
+    conn.close()
+
+
+def test_only_changed_and_removed_quotes_are_selected(state):
+    main.record_processed_entries(state, [entry('Q1'), entry('Q2')], {'Q1', 'Q2'})
+    changed, removed = main.select_changed_entries(state, [entry('Q1'), entry('Q3', '5')])
+    assert changed == [entry('Q3', '5')]
+    assert removed == {'Q2'}
+
+
+def test_a_new_output_mode_selects_every_quote_again(state):
+    entries = [entry('Q1'), entry('Q2')]
+    main.record_processed_entries(state, entries, {'Q1', 'Q2'})
+    assert main.select_changed_entries(state, entries)[0] == []
+    assert main.select_changed_entries(state, entries, 'template')[0] == entries
+
+    main.record_processed_entries(state, entries, {'Q1', 'Q2'}, 'template')
+    assert main.select_changed_entries(state, entries, 'template')[0] == []
+    assert main.select_changed_entries(state, entries)[0] == entries